@@ -0,0 +1,238 @@
+"""
+卡牌列表页/详情页 HTML 解析（BeautifulSoup）
+
+与 scraper_v2 中 Selenium 执行的 JavaScript 提取逻辑一一对应，输出相同结构的字典，
+因此 HTTP 抓取的页面和浏览器渲染的页面可以走同一套 Card 组装流程。
+也可以直接解析 save_page_html.py 保存的 HTML 文件。
+"""
+import re
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+# 卡牌列表项的候选选择器（按顺序尝试，与 JS 版本一致）
+CARD_ITEM_SELECTORS = [
+    '.image_lists li',
+    '.cardlist_item',
+    '.card-item',
+    'ul.image_lists > li',
+    '.cardlist li',
+    'li[data-card-no]',
+]
+
+# 卡号：BT24-001, P-194, EX10-071, ST-18, BT24-TOKEN
+CARD_NO_PATTERN = re.compile(r'([A-Z]{1,3}\d{0,2}-[A-Z0-9]{1,5}[A-Z]?)')
+
+URL_CARD_NO_PATTERNS = [
+    re.compile(r'card_no=([A-Za-z0-9-]+)'),
+    re.compile(r'cardno=([A-Za-z0-9-]+)', re.IGNORECASE),
+    re.compile(r'card[_-]?id=([A-Za-z0-9-]+)', re.IGNORECASE),
+    re.compile(r'/([A-Z]{1,3}\d{0,2}-[A-Z0-9]{1,5}[A-Z]?)$'),
+    re.compile(r'/([A-Z]{1,3}\d{0,2}-[A-Z0-9]{1,5}[A-Z]?)/'),
+]
+
+NUMBER_PATTERN = re.compile(r'\d+')
+
+
+def make_soup(html: str) -> BeautifulSoup:
+    return BeautifulSoup(html, 'html.parser')
+
+
+def _text(element) -> str:
+    return element.get_text().strip() if element is not None else ''
+
+
+def _first_int(text: str) -> Optional[int]:
+    match = NUMBER_PATTERN.search(text or '')
+    return int(match.group()) if match else None
+
+
+def _last_int(text: str) -> Optional[int]:
+    numbers = NUMBER_PATTERN.findall(text or '')
+    return int(numbers[-1]) if numbers else None
+
+
+def _next_element(element):
+    """JS 的 nextElementSibling"""
+    return element.find_next_sibling() if element is not None else None
+
+
+def _find_dt(detail, predicate):
+    return next((dt for dt in detail.select('dt') if predicate(_text(dt))), None)
+
+
+def _span_colors(element) -> List[str]:
+    return [_text(span) for span in element.select('span[class*="cardColor_"]') if _text(span)]
+
+
+def parse_card_detail_div(detail) -> Dict:
+    """列表页中隐藏的卡牌详情 div → 详情字典"""
+    details = {}
+
+    type_el = detail.select_one('.cardType')
+    if type_el is not None:
+        details['card_type'] = _text(type_el)
+
+    rarity_el = detail.select_one('.cardRarity')
+    if rarity_el is not None:
+        details['rarity'] = _text(rarity_el)
+
+    lv_el = detail.select_one('.cardLv')
+    if lv_el is not None and _first_int(_text(lv_el)) is not None:
+        details['level'] = _first_int(_text(lv_el))
+
+    colors = [_text(span) for span in detail.select('.cardColor span') if _text(span)]
+    if colors:
+        details['color'] = colors[0]
+        if len(colors) > 1:
+            details['color2'] = colors[1]
+
+    # 费用（不是進化コスト）
+    cost_dt = _find_dt(detail, lambda t: t == 'コスト' or '登場コスト' in t)
+    cost = _first_int(_text(_next_element(cost_dt)))
+    if cost is not None:
+        details['cost'] = cost
+
+    dp = _first_int(_text(_next_element(_find_dt(detail, lambda t: 'DP' in t))))
+    if dp is not None:
+        details['dp'] = dp
+
+    for field, label in (('form', '形態'), ('attribute', '属性'), ('digimon_type', 'タイプ')):
+        dd = _next_element(_find_dt(detail, lambda t, label=label: label in t))
+        if dd is not None:
+            details[field] = _text(dd)
+
+    effect_title = next((el for el in detail.select('.cardInfoTitMedium, .cardInfoTitSmall')
+                         if '効果' in _text(el)), None)
+    effect_dd = _next_element(effect_title)
+    if effect_dd is not None:
+        details['effect'] = _text(effect_dd)
+
+    inherited_title = next((el for el in detail.select('.cardInfoTitSmall') if '進化元' in _text(el)), None)
+    inherited_dd = _next_element(inherited_title)
+    if inherited_dd is not None:
+        details['inherited_effect'] = _text(inherited_dd)
+
+    # 进化条件：最后一个数字为进化费用
+    evolve_dts = [dt for dt in detail.select('dt') if '進化条件' in _text(dt)]
+    for i, dt in enumerate(evolve_dts[:2], 1):
+        dd = _next_element(dt)
+        if dd is None:
+            continue
+        cost = _last_int(dd.get_text())
+        if cost is not None:
+            details[f'digivolve_cost{i}'] = cost
+        colors = _span_colors(dd)
+        if colors:
+            details[f'digivolve_color{i}'] = '/'.join(colors)
+
+    return details
+
+
+def parse_card_list(html: str, page_url: str) -> Tuple[List[Dict], Dict]:
+    """
+    卡包卡牌列表页 → (卡牌数据列表, 调试信息)
+    卡牌数据字段: url, detail_id, card_no, data_no, image_url, card_name, details, missing_details
+    """
+    soup = make_soup(html)
+    debug_info = {'foundSelector': '', 'itemCount': 0, 'sampleHtml': ''}
+
+    items = []
+    for selector in CARD_ITEM_SELECTORS:
+        items = soup.select(selector)
+        if items:
+            debug_info.update(foundSelector=selector, itemCount=len(items), sampleHtml=str(items[0])[:300])
+            break
+
+    cards = []
+    for item in items:
+        card = {}
+
+        link = item.find('a')
+        if link is not None:
+            card['url'] = urljoin(page_url, link.get('href', ''))
+
+            # data-src 指向详情内容的 ID
+            data_src = link.get('data-src')
+            if data_src:
+                card['detail_id'] = data_src.replace('#', '')
+                if CARD_NO_PATTERN.search(data_src):
+                    card['card_no'] = data_src.replace('#', '')
+
+            for pattern in URL_CARD_NO_PATTERNS:
+                match = pattern.search(card['url'])
+                if match:
+                    card['card_no'] = match.group(1)
+                    break
+
+            if not card.get('card_no'):
+                match = CARD_NO_PATTERN.search(link.get_text())
+                if match:
+                    card['card_no'] = match.group(1)
+
+        img = item.find('img')
+        if img is not None:
+            card['image_url'] = urljoin(page_url, img.get('src', ''))
+            card['card_name'] = img.get('alt', '')
+            if not card.get('card_no'):
+                match = CARD_NO_PATTERN.search(card['image_url'])
+                if match:
+                    card['card_no'] = match.group(1)
+
+        data_no = item.get('data-no') or item.get('data-card-no') or item.get('data-cardno') or ''
+        if data_no:
+            card['card_no'] = card.get('card_no') or data_no
+            card['data_no'] = data_no
+
+        if card.get('detail_id'):
+            detail = soup.find(id=card['detail_id'])
+            if detail is not None:
+                card['details'] = parse_card_detail_div(detail)
+            else:
+                card['missing_details'] = True
+
+        if card.get('card_no') or card.get('image_url'):
+            cards.append(card)
+
+    return cards, debug_info
+
+
+def parse_pack_options(html: str) -> List[Dict[str, str]]:
+    """卡牌列表首页的卡包下拉框 → [{"id", "name"}]"""
+    select = make_soup(html).select_one('select[name="category"]')
+    if select is None:
+        return []
+    packs = []
+    for option in select.select('option'):
+        value, text = option.get('value', ''), _text(option)
+        if value and text:
+            packs.append({'id': value, 'name': text})
+    return packs
+
+
+def parse_page_title(html: str) -> str:
+    title = make_soup(html).title
+    return title.get_text().strip() if title is not None else ''
+
+
+def parse_detail_page(html: str) -> Dict:
+    """卡牌详情页 → 详情字典（与 _parse_detail_page 的 JS 版本一致）"""
+    soup = make_soup(html)
+    data = {}
+
+    for field, selector in (('card_name', '.card_name, .cardname, h1.name'),
+                            ('card_type', '.cardtype, [class*="type"]'),
+                            ('color', '.color, [class*="color"]'),
+                            ('effect', '.effect, .card_effect'),
+                            ('rarity', '.rarity, [class*="rarity"]')):
+        element = soup.select_one(selector)
+        if element is not None:
+            data[field] = _text(element)
+
+    for field, selector in (('level', '.lv, .level'), ('cost', '.cost, .play_cost'), ('dp', '.dp')):
+        value = _first_int(_text(soup.select_one(selector)))
+        if value is not None:
+            data[field] = value
+
+    return data
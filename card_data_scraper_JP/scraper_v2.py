@@ -1,30 +1,30 @@
 """
 数码宝贝卡牌爬虫脚本 v2
 优化版：直接从列表页提取数据，避免逐个打开详情页
+默认通过 HTTP 并发抓取页面并解析 HTML（card_parser.py），只有需要 JS 渲染的页面才启动浏览器
+HTTP 模式下增量抓取：页面缓存 + 条件请求，未变化的卡包沿用已保存数据，只有新增/变化的卡牌才获取详情
 """
 import json
 import time
 import re
 import os
+import sys
+from pathlib import Path
 from typing import List, Dict, Optional
 from dataclasses import asdict
 from datetime import datetime
+from urllib.parse import urlsplit
 
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-
-try:
-    from webdriver_manager.chrome import ChromeDriverManager
-    USE_WEBDRIVER_MANAGER = True
-except ImportError:
-    USE_WEBDRIVER_MANAGER = False
+# 爬虫共用工具（仓库根目录的 scraper_common）
+sys.path.append(str(Path(__file__).parent.parent))
+from scraper_common.browser_driver import PageWaits, build_chrome_options, create_chrome_driver
+from scraper_common.browser_pool import BrowserWorkerPool
+from scraper_common.incremental import NEW, CHANGED, UNCHANGED, HashIndex
 
 from models import Card, CardPack
+from card_parser import CARD_ITEM_SELECTORS, parse_card_list, parse_detail_page, parse_pack_options, parse_page_title
+from scraper_common.http_fetcher import fetch_pages
+from scraper_common.page_cache import PageCache
 
 
 class DigimonCardScraper:
@@ -33,35 +33,45 @@ class DigimonCardScraper:
     BASE_URL = "https://digimoncard.com"
     CARDLIST_URL = f"{BASE_URL}/cards/"
     
-    def __init__(self, headless: bool = True, output_dir: str = "output", chrome_driver_path: str = None):
+    def __init__(self, headless: bool = True, output_dir: str = "output", chrome_driver_path: str = None,
+                 fetch_mode: str = "http", concurrency: int = 8, request_delay: float = 0.5,
+                 workers: int = 1, per_host: int = None, use_cache: bool = True):
+        """
+        fetch_mode: "http" 并发 HTTP 抓取 + HTML 解析（需要 JS 的页面回退到 Selenium）；
+                    "selenium" 全部通过浏览器
+        workers: 需要浏览器的卡包由几个无头浏览器并行处理；per_host 限制同时访问官网的浏览器数
+        use_cache: HTTP 模式的页面缓存和卡牌内容哈希（output_dir 下），False 时完整刷新
+        """
         self.output_dir = output_dir
         os.makedirs(output_dir, exist_ok=True)
-        
-        chrome_options = Options()
-        if headless:
-            chrome_options.add_argument("--headless=new")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--window-size=1920,1080")
-        chrome_options.add_argument("--lang=ja")
-        chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36")
-        
-        service = None
-        if chrome_driver_path:
-            service = Service(executable_path=chrome_driver_path)
-        elif USE_WEBDRIVER_MANAGER:
-            try:
-                service = Service(ChromeDriverManager().install())
-            except:
-                pass
-        
-        if service:
-            self.driver = webdriver.Chrome(service=service, options=chrome_options)
-        else:
-            self.driver = webdriver.Chrome(options=chrome_options)
-            
-        self.wait = WebDriverWait(self.driver, 20)
+        self.headless = headless
+        self.chrome_driver_path = chrome_driver_path
+        self.fetch_mode = fetch_mode
+        self.concurrency = concurrency
+        self.request_delay = request_delay
+        self.workers = workers
+        self.per_host = per_host
+        self._driver = None
+        self.waits = PageWaits(timeout=20)
+        self.page_cache = PageCache(os.path.join(output_dir, ".page_cache")) if use_cache else None
+        self.card_hashes = HashIndex(os.path.join(output_dir, ".card_hashes.json")) if use_cache else None
+        self.unchanged_packs = set()    # 沿用已保存数据、不需要重新保存的卡包
+        self.reused_cards = set()       # (pack_id, 卡牌序号键)：内容未变，沿用已保存的卡牌（含详情）
+        self.detail_failures = set()    # 获取详情失败的卡牌，下次仍视为变化
+        self._pending_hashes = {}       # pack_id → {哈希键: 内容}，卡包保存后写入 card_hashes
+
+    @property
+    def driver(self):
+        """浏览器在第一次需要时才启动（HTTP 模式下通常不需要）"""
+        if self._driver is None:
+            options = build_chrome_options(self.headless, [
+                "--disable-gpu",
+                "--lang=ja",
+                "user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+            ])
+            # 列表页/详情页都通过 JS 读取 textContent 和属性，CSS 也一并屏蔽
+            self._driver = create_chrome_driver(options, self.chrome_driver_path, block_stylesheets=True)
+        return self._driver
         
     def __enter__(self):
         return self
@@ -70,22 +80,175 @@ class DigimonCardScraper:
         self.close()
         
     def close(self):
-        if self.driver:
-            self.driver.quit()
+        if self._driver:
+            self._driver.quit()
+            self._driver = None
+        if self.page_cache:
+            self.page_cache.save()
+
+    def _fetch(self, urls: List[str]) -> Dict[str, Optional[str]]:
+        return fetch_pages(urls, self.concurrency, self.request_delay, self.page_cache)
 
     def get_cards_from_pack(self, pack: CardPack) -> List[Card]:
         """从卡包页面批量提取卡牌信息"""
+        return self.get_cards_from_packs([pack])[pack.pack_id]
+
+    def get_cards_from_packs(self, packs: List[CardPack], pages: Dict[str, str] = None,
+                             get_details: bool = False) -> Dict[str, List[Card]]:
+        """
+        批量提取多个卡包的卡牌 {pack_id: 卡牌列表}
+        HTTP 模式下并发抓取全部列表页（pages 为已抓取的 {url: html}）；
+        页面抓取失败或解析不到卡牌（需要 JS 渲染）的卡包回退到 Selenium
+        启用缓存时页面未变化的卡包直接沿用已保存的卡牌，其余卡包中内容未变的卡牌也沿用已保存数据
+        （get_details 不同的两次运行互不沿用）
+        """
+        if self.fetch_mode != "http":
+            return self._get_cards_from_packs_selenium(packs)
+
+        pages = dict(pages or {})
+        missing = [pack.pack_url for pack in packs if pack.pack_url not in pages]
+        if missing:
+            print(f"\n并发抓取 {len(missing)} 个卡包页面...")
+            pages.update(self._fetch(missing))
+
+        results, fallback = {}, []
+        for pack in packs:
+            html = pages.get(pack.pack_url)
+            if html and self.card_hashes:
+                saved = self._load_saved_cards(pack)
+                page_sha = self.page_cache.index.get(pack.pack_url, {}).get("sha256")
+                page_record = {"sha256": page_sha, "details": get_details}
+                if (saved and pack.pack_url in self.page_cache.unchanged
+                        and self.card_hashes.status(f"pack/{pack.pack_id}", page_record) == UNCHANGED):
+                    print(f"\n⏭ {pack.pack_name or pack.pack_id}: 页面未变化，沿用已保存的 {len(saved)} 张卡牌")
+                    for key in saved:
+                        self.reused_cards.add((pack.pack_id, key))
+                    self.unchanged_packs.add(pack.pack_id)
+                    pack.card_count = len(saved)
+                    results[pack.pack_id] = list(saved.values())
+                    continue
+            card_data_list, debug_info = parse_card_list(html, pack.pack_url) if html else ([], {})
+            if not card_data_list:
+                print(f"\n⚠️ {pack.pack_name or pack.pack_id}: HTTP 页面中没有卡牌列表，改用浏览器")
+                fallback.append(pack)
+                continue
+            print(f"\n正在解析卡包: {pack.pack_name}")
+            cards = self._build_cards(pack, card_data_list, debug_info)
+            if self.card_hashes:
+                cards = self._reuse_unchanged_cards(pack, cards, card_data_list, saved, page_record)
+            results[pack.pack_id] = cards
+        if fallback:
+            results.update(self._get_cards_from_packs_selenium(fallback))
+        return results
+
+    @staticmethod
+    def _card_keys(cards: List[Card]) -> List[str]:
+        """卡包内卡牌的键：卡号 + 第几次出现（平行卡卡号相同）"""
+        seen, keys = {}, []
+        for card in cards:
+            seen[card.card_no] = seen.get(card.card_no, 0) + 1
+            keys.append(f"{card.card_no}#{seen[card.card_no]}")
+        return keys
+
+    def _load_saved_cards(self, pack: CardPack) -> Dict[str, Card]:
+        """上次保存的卡包卡牌 {卡牌键: Card}，没有保存过返回空"""
+        cards_file = os.path.join(self.output_dir, f"{self._pack_file_prefix(pack)}_cards.json")
+        if not os.path.exists(cards_file):
+            return {}
+        try:
+            with open(cards_file, 'r', encoding='utf-8') as f:
+                cards = [Card(**data) for data in json.load(f)]
+        except (OSError, ValueError, TypeError) as e:
+            print(f"  ⚠️ 读取已保存的卡牌失败，重新处理: {e}")
+            return {}
+        return dict(zip(self._card_keys(cards), cards))
+
+    def _reuse_unchanged_cards(self, pack: CardPack, cards: List[Card], card_data_list: List[Dict],
+                               saved: Dict[str, Card], page_record: Dict) -> List[Card]:
+        """
+        按列表页数据的内容哈希区分新增/变化/未变的卡牌，未变的沿用已保存的卡牌（含详情）；
+        卡包没有任何新增或变化时不再重新保存
+        """
+        raw_list = [data for data in card_data_list if data.get('card_no') or data.get('data_no')]
+        pending = {f"pack/{pack.pack_id}": page_record}
+        counts = {NEW: 0, CHANGED: 0, UNCHANGED: 0}
+        result = []
+        for key, card, data in zip(self._card_keys(cards), cards, raw_list):
+            record = dict(data, with_details=page_record["details"])
+            status = self.card_hashes.status(f"{pack.pack_id}/{key}", record)
+            if status == UNCHANGED and key not in saved:
+                status = CHANGED
+            counts[status] += 1
+            pending[f"{pack.pack_id}/{key}"] = record
+            if status == UNCHANGED:
+                self.reused_cards.add((pack.pack_id, key))
+                card = saved[key]
+            result.append(card)
+
+        print(f"  增量: 新增 {counts[NEW]} 张, 变化 {counts[CHANGED]} 张, 未变 {counts[UNCHANGED]} 张")
+        if not counts[NEW] and not counts[CHANGED] and len(result) == len(saved):
+            self.unchanged_packs.add(pack.pack_id)
+        self._pending_hashes[pack.pack_id] = pending
+        return result
+
+    def _get_cards_from_packs_selenium(self, packs: List[CardPack], get_details: bool = False,
+                                       save: bool = False) -> Dict[str, List[Card]]:
+        """
+        通过浏览器提取多个卡包的卡牌 {pack_id: 卡牌列表}
+        workers > 1 时由浏览器工作池并行处理（每个工作线程一个无头浏览器），失败的卡包换浏览器重试
+        """
+        def scrape_pack(scraper, pack):
+            cards = scraper._get_cards_from_pack_selenium(pack)
+            if not cards:
+                raise RuntimeError("未提取到卡牌")
+            if get_details:
+                cards = scraper.get_card_details_batch(cards)
+            return cards
+
+        if self.workers <= 1 or len(packs) <= 1:
+            results = {}
+            for pack in packs:
+                cards = self._get_cards_from_pack_selenium(pack)
+                if get_details and cards:
+                    cards = self.get_card_details_batch(cards)
+                if save:
+                    self.save_pack_to_json(pack, cards)
+                results[pack.pack_id] = cards
+            return results
+
+        def create_worker():
+            worker = DigimonCardScraper(headless=True, output_dir=self.output_dir,
+                                        chrome_driver_path=self.chrome_driver_path, fetch_mode="selenium",
+                                        use_cache=False)
+            worker.waits = self.waits
+            return worker
+
+        print(f"\n使用 {self.workers} 个浏览器并行处理 {len(packs)} 个卡包")
+        pool = BrowserWorkerPool(create_worker, lambda worker: worker.close(),
+                                 workers=self.workers, per_host=self.per_host)
+        cards_list, failed = pool.run(
+            packs, scrape_pack,
+            host_of=lambda pack: urlsplit(pack.pack_url).netloc,
+            on_result=self.save_pack_to_json if save else None,
+            label=lambda pack: pack.pack_name or pack.pack_id,
+        )
+        for pack in failed:
+            print(f"  ⚠️ {pack.pack_name or pack.pack_id}: 重试后仍失败")
+            pack.card_count = 0
+            if save:
+                self.save_pack_to_json(pack, [])
+        return {pack.pack_id: cards or [] for pack, cards in zip(packs, cards_list)}
+
+    def _get_cards_from_pack_selenium(self, pack: CardPack) -> List[Card]:
+        """通过浏览器打开卡包页面提取卡牌信息"""
         cards = []
         
         try:
             print(f"\n正在爬取卡包: {pack.pack_name}")
             self.driver.get(pack.pack_url)
-            time.sleep(4)
             
-            # 等待卡牌列表加载 - 尝试多个可能的选择器
-            try:
-                self.wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, ".image_lists, .cardlist, ul.image_lists")))
-            except TimeoutException:
+            # 等待卡牌列表项加载 - 与提取脚本使用相同的选择器
+            if not self.waits.present(self.driver, ", ".join(CARD_ITEM_SELECTORS), "卡牌列表页"):
                 print("  警告: 标准选择器未找到，尝试查找任何卡牌元素...")
             
             # 先检查页面状态
@@ -374,71 +537,7 @@ class DigimonCardScraper:
             
             debug_info = card_data_list.get('debug', {})
             card_data_list = card_data_list.get('cards', [])
-            
-            if debug_info:
-                print(f"  调试信息: 使用选择器 '{debug_info.get('foundSelector', 'unknown')}' 找到 {debug_info.get('itemCount', 0)} 个元素")
-                if debug_info.get('sampleHtml'):
-                    print(f"  示例HTML: {debug_info['sampleHtml'][:200]}...")
-            
-            print(f"发现 {len(card_data_list)} 张卡牌，开始处理...")
-            
-            # 批量处理卡牌
-            skipped_count = 0
-            missing_details_count = 0
-            for idx, data in enumerate(card_data_list):
-                card_no = data.get('card_no') or data.get('data_no') or ''
-                card_name = data.get('card_name', '')
-                image_url = data.get('image_url', '')
-                card_url = data.get('url', '')
-                details = data.get('details', {})
-                missing_details = data.get('missing_details', False)
-                
-                if not card_no:
-                    skipped_count += 1
-                    if skipped_count <= 3:  # 只打印前3个被跳过的卡牌
-                        print(f"  警告: 跳过卡牌 (无卡号) - 卡名: {card_name[:30]}, 图片: {image_url[:60] if image_url else 'N/A'}")
-                    continue
-                
-                if missing_details:
-                    missing_details_count += 1
-                
-                card = Card(
-                    card_no=card_no,
-                    card_name=card_name,
-                    card_name_ruby=None,
-                    card_type=details.get('card_type', ''),
-                    color=details.get('color', ''),
-                    color2=details.get('color2'),
-                    level=details.get('level'),
-                    cost=details.get('cost'),
-                    dp=details.get('dp'),
-                    digivolve_cost1=details.get('digivolve_cost1'),
-                    digivolve_cost2=details.get('digivolve_cost2'),
-                    digivolve_color1=details.get('digivolve_color1'),
-                    digivolve_color2=details.get('digivolve_color2'),
-                    form=details.get('form'),
-                    attribute=details.get('attribute'),
-                    digimon_type=details.get('digimon_type'),
-                    effect=details.get('effect'),
-                    inherited_effect=details.get('inherited_effect'),
-                    security_effect=None,
-                    rarity=details.get('rarity', ''),
-                    image_url=image_url,
-                    parallel_id=None,
-                    pack_id=pack.pack_id,
-                    pack_name=pack.pack_name,
-                    card_url=card_url
-                )
-                cards.append(card)
-                
-                if (idx + 1) % 100 == 0:
-                    print(f"  已处理 {idx + 1}/{len(card_data_list)} 张卡牌")
-            
-            if skipped_count > 0:
-                print(f"  跳过了 {skipped_count} 张卡牌（无法提取卡号）")
-            if missing_details_count > 0:
-                print(f"  警告: {missing_details_count} 张卡牌缺少详情（可能是其他卡包的重印卡）")
-            print(f"  完成! 共 {len(cards)} 张卡牌")
+            cards = self._build_cards(pack, card_data_list, debug_info)
             
         except Exception as e:
             print(f"获取卡牌失败: {e}")
@@ -448,47 +547,139 @@ class DigimonCardScraper:
         pack.card_count = len(cards)
         return cards
     
+    def _build_cards(self, pack: CardPack, card_data_list: List[Dict], debug_info: Dict) -> List[Card]:
+        """列表页提取结果（浏览器 JS 或 card_parser 解析）→ Card 列表"""
+        cards = []
+        
+        if debug_info:
+            print(f"  调试信息: 使用选择器 '{debug_info.get('foundSelector', 'unknown')}' 找到 {debug_info.get('itemCount', 0)} 个元素")
+            if debug_info.get('sampleHtml'):
+                print(f"  示例HTML: {debug_info['sampleHtml'][:200]}...")
+        
+        print(f"发现 {len(card_data_list)} 张卡牌，开始处理...")
+        
+        # 批量处理卡牌
+        skipped_count = 0
+        missing_details_count = 0
+        for idx, data in enumerate(card_data_list):
+            card_no = data.get('card_no') or data.get('data_no') or ''
+            card_name = data.get('card_name', '')
+            image_url = data.get('image_url', '')
+            card_url = data.get('url', '')
+            details = data.get('details', {})
+            missing_details = data.get('missing_details', False)
+            
+            if not card_no:
+                skipped_count += 1
+                if skipped_count <= 3:  # 只打印前3个被跳过的卡牌
+                    print(f"  警告: 跳过卡牌 (无卡号) - 卡名: {card_name[:30]}, 图片: {image_url[:60] if image_url else 'N/A'}")
+                continue
+            
+            if missing_details:
+                missing_details_count += 1
+            
+            card = Card(
+                card_no=card_no,
+                card_name=card_name,
+                card_name_ruby=None,
+                card_type=details.get('card_type', ''),
+                color=details.get('color', ''),
+                color2=details.get('color2'),
+                level=details.get('level'),
+                cost=details.get('cost'),
+                dp=details.get('dp'),
+                digivolve_cost1=details.get('digivolve_cost1'),
+                digivolve_cost2=details.get('digivolve_cost2'),
+                digivolve_color1=details.get('digivolve_color1'),
+                digivolve_color2=details.get('digivolve_color2'),
+                form=details.get('form'),
+                attribute=details.get('attribute'),
+                digimon_type=details.get('digimon_type'),
+                effect=details.get('effect'),
+                inherited_effect=details.get('inherited_effect'),
+                security_effect=None,
+                rarity=details.get('rarity', ''),
+                image_url=image_url,
+                parallel_id=None,
+                pack_id=pack.pack_id,
+                pack_name=pack.pack_name,
+                card_url=card_url
+            )
+            cards.append(card)
+            
+            if (idx + 1) % 100 == 0:
+                print(f"  已处理 {idx + 1}/{len(card_data_list)} 张卡牌")
+        
+        if skipped_count > 0:
+            print(f"  跳过了 {skipped_count} 张卡牌（无法提取卡号）")
+        if missing_details_count > 0:
+            print(f"  警告: {missing_details_count} 张卡牌缺少详情（可能是其他卡包的重印卡）")
+        print(f"  完成! 共 {len(cards)} 张卡牌")
+        
+        pack.card_count = len(cards)
+        return cards
+    
     def get_card_details_batch(self, cards: List[Card], batch_size: int = 10) -> List[Card]:
         """批量获取卡牌详情（可选，用于获取完整信息）"""
-        print(f"\n开始获取 {len(cards)} 张卡牌的详细信息...")
+        # 沿用已保存数据的卡牌（内容未变）已有详情
+        reused = {
+            id(card) for card, key in zip(cards, self._card_keys(cards))
+            if (card.pack_id, key) in self.reused_cards
+        }
+        pending = [card for card in cards if card.card_url and id(card) not in reused]
+        print(f"\n开始获取 {len(pending)} 张卡牌的详细信息（{len(cards) - len(pending)} 张沿用已有数据）...")
+        if self.fetch_mode == "http" and pending:
+            # 并发抓取详情页，抓取或解析失败的再用浏览器逐个打开
+            pages = self._fetch([card.card_url for card in pending])
+            remaining = []
+            for card in pending:
+                html = pages.get(card.card_url)
+                details = parse_detail_page(html) if html else {}
+                if details:
+                    self._apply_detail_page(card, details)
+                else:
+                    remaining.append(card)
+            print(f"  HTTP 获取详情: {len(pending) - len(remaining)}/{len(pending)}")
+            if remaining:
+                print(f"  ⚠️ {len(remaining)} 张卡牌改用浏览器获取详情")
+            pending = remaining
         
-        for idx, card in enumerate(cards):
-            if not card.card_url:
-                continue
-                
+        for idx, card in enumerate(pending):
             try:
                 self.driver.get(card.card_url)
-                time.sleep(1)
+                self.waits.present(self.driver, ".card_name, .cardname, h1.name", "卡牌详情页", timeout=10)
                 
                 # 解析详情页
-                details = self._parse_detail_page()
-                
-                # 更新卡牌信息
-                if details.get('card_name'):
-                    card.card_name = details['card_name']
-                if details.get('card_type'):
-                    card.card_type = details['card_type']
-                if details.get('color'):
-                    card.color = details['color']
-                if details.get('level'):
-                    card.level = details['level']
-                if details.get('cost'):
-                    card.cost = details['cost']
-                if details.get('dp'):
-                    card.dp = details['dp']
-                if details.get('effect'):
-                    card.effect = details['effect']
-                if details.get('rarity'):
-                    card.rarity = details['rarity']
+                self._apply_detail_page(card, self._parse_detail_page())
                     
                 if (idx + 1) % 10 == 0:
-                    print(f"  详情进度: {idx + 1}/{len(cards)}")
+                    print(f"  详情进度: {idx + 1}/{len(pending)}")
                     
             except Exception as e:
                 print(f"  获取详情失败 {card.card_no}: {e}")
+                self.detail_failures.add(id(card))
                 
         return cards
 
+    def _apply_detail_page(self, card: Card, details: Dict):
+        """用详情页解析结果更新卡牌信息"""
+        if details.get('card_name'):
+            card.card_name = details['card_name']
+        if details.get('card_type'):
+            card.card_type = details['card_type']
+        if details.get('color'):
+            card.color = details['color']
+        if details.get('level'):
+            card.level = details['level']
+        if details.get('cost'):
+            card.cost = details['cost']
+        if details.get('dp'):
+            card.dp = details['dp']
+        if details.get('effect'):
+            card.effect = details['effect']
+        if details.get('rarity'):
+            card.rarity = details['rarity']
+
     def _parse_detail_page(self) -> Dict:
         """解析详情页"""
         details = {}
@@ -551,7 +742,7 @@ class DigimonCardScraper:
         url = f"{self.CARDLIST_URL}?search=true&category={category_id}"
         print(f"访问: {url}")
         self.driver.get(url)
-        time.sleep(5)
+        self.waits.present(self.driver, f'[id="{card_id}"]', "卡牌详情div")
         
         result = self.driver.execute_script(f"""
             var detailDiv = document.getElementById('{card_id}');
@@ -582,7 +773,7 @@ class DigimonCardScraper:
         url = f"{self.CARDLIST_URL}?search=true&category={category_id}"
         print(f"访问: {url}")
         self.driver.get(url)
-        time.sleep(5)
+        self.waits.present(self.driver, "a[data-src]", "卡牌列表页")
         
         result = self.driver.execute_script("""
             var result = {
@@ -644,30 +835,15 @@ class DigimonCardScraper:
         
         try:
             print("\n正在获取卡包列表...")
-            self.driver.get(f"{self.CARDLIST_URL}?search=true")
-            time.sleep(3)
-            
-            # 使用JavaScript获取所有卡包选项
-            pack_data = self.driver.execute_script("""
-                var packs = [];
-                var select = document.querySelector('select[name="category"]');
-                
-                if (select) {
-                    var options = select.querySelectorAll('option');
-                    options.forEach(function(option) {
-                        var value = option.value;
-                        var text = option.textContent.trim();
-                        if (value && value !== '' && text && text !== '') {
-                            packs.push({
-                                id: value,
-                                name: text
-                            });
-                        }
-                    });
-                }
-                
-                return packs;
-            """)
+            pack_data = []
+            if self.fetch_mode == "http":
+                url = f"{self.CARDLIST_URL}?search=true"
+                html = self._fetch([url])[url]
+                pack_data = parse_pack_options(html) if html else []
+                if not pack_data:
+                    print("  ⚠️ HTTP 页面中没有卡包列表，改用浏览器")
+            if not pack_data:
+                pack_data = self._get_pack_options_selenium()
             
             for data in pack_data:
                 pack_id = data['id']
@@ -692,6 +868,33 @@ class DigimonCardScraper:
             
         return packs
     
+    def _get_pack_options_selenium(self) -> List[Dict]:
+        """通过浏览器读取卡包下拉框"""
+        self.driver.get(f"{self.CARDLIST_URL}?search=true")
+        self.waits.present(self.driver, 'select[name="category"] option', "卡包下拉框")
+        
+        # 使用JavaScript获取所有卡包选项
+        return self.driver.execute_script("""
+            var packs = [];
+            var select = document.querySelector('select[name="category"]');
+            
+            if (select) {
+                var options = select.querySelectorAll('option');
+                options.forEach(function(option) {
+                    var value = option.value;
+                    var text = option.textContent.trim();
+                    if (value && value !== '' && text && text !== '') {
+                        packs.push({
+                            id: value,
+                            name: text
+                        });
+                    }
+                });
+            }
+            
+            return packs;
+        """)
+    
     def _extract_pack_code(self, pack_name: str) -> str:
         """从卡包名称中提取卡包代码"""
         match = re.search(r'[A-Z]{2,3}-?\d{1,2}', pack_name)
@@ -707,18 +910,23 @@ class DigimonCardScraper:
             pack_url=f"{self.CARDLIST_URL}?search=true&category={category_id}"
         )
         
-        self.driver.get(pack.pack_url)
-        time.sleep(3)
-        
         # 获取卡包名称
+        pages = {}
         try:
-            title = self.driver.execute_script("return document.title || '';")
+            title = ""
+            if self.fetch_mode == "http":
+                pages = self._fetch([pack.pack_url])
+                html = pages[pack.pack_url]
+                title = parse_page_title(html) if html else ""
+            if not title:
+                self.driver.get(pack.pack_url)
+                title = self.driver.execute_script("return document.title || '';")
             pack.pack_name = title.split('｜')[0].strip() if '｜' in title else title
             pack.pack_code = self._extract_pack_code(pack.pack_name)
         except:
             pass
         
-        cards = self.get_cards_from_pack(pack)
+        cards = self.get_cards_from_packs([pack], pages, get_details=get_details)[pack.pack_id]
         
         if get_details and cards:
             cards = self.get_card_details_batch(cards)
@@ -738,23 +946,43 @@ class DigimonCardScraper:
         
         print(f"\n开始爬取 {len(packs)} 个卡包...\n")
         
+        if self.fetch_mode != "http" and self.workers > 1:
+            # 浏览器工作池：每个卡包的列表、详情和保存都在同一个工作线程内完成
+            cards_by_pack = self._get_cards_from_packs_selenium(packs, get_details=get_details, save=True)
+            for pack in packs:
+                all_packs.append(pack)
+                all_cards.extend(cards_by_pack[pack.pack_id])
+            print("\n\n=== 爬取完成，保存汇总文件 ===")
+            return all_packs, all_cards
+        
+        if self.fetch_mode == "http":
+            # 一次并发抓取全部卡包页面，再逐个处理详情和保存
+            cards_by_pack = self.get_cards_from_packs(packs, get_details=get_details)
+        
         for idx, pack in enumerate(packs):
             print(f"\n[{idx+1}/{len(packs)}] 处理卡包: {pack.pack_name}")
             
             try:
-                cards = self.get_cards_from_pack(pack)
+                if self.fetch_mode == "http":
+                    cards = cards_by_pack[pack.pack_id]
+                else:
+                    cards = self.get_cards_from_pack(pack)
                 
                 if get_details and cards:
                     cards = self.get_card_details_batch(cards)
                 
-                # 立即保存当前卡包
-                self.save_pack_to_json(pack, cards)
+                # 立即保存当前卡包（没有新增或变化的卡包保持原文件）
+                if pack.pack_id in self.unchanged_packs:
+                    print("  ⏭ 卡包无变化，跳过保存")
+                else:
+                    self.save_pack_to_json(pack, cards)
                 
                 all_packs.append(pack)
                 all_cards.extend(cards)
                 
-                # 礼貌性延迟
-                time.sleep(2)
+                # 礼貌性延迟（HTTP 模式由抓取器按站点控制请求间隔）
+                if self.fetch_mode != "http":
+                    time.sleep(2)
                 
             except Exception as e:
                 print(f"  爬取失败: {e}")
@@ -766,15 +994,18 @@ class DigimonCardScraper:
         print(f"\n\n=== 爬取完成，保存汇总文件 ===")
         return all_packs, all_cards
     
-    def save_pack_to_json(self, pack: CardPack, cards: List[Card]):
-        """保存单个卡包数据到JSON文件"""
+    def _pack_file_prefix(self, pack: CardPack) -> str:
+        """卡包文件名前缀"""
         # 清理文件名，移除特殊字符
         safe_name = pack.pack_name.replace(' ', '_').replace('/', '_').replace('\\', '_')
         safe_name = safe_name.replace(':', '_').replace('*', '_').replace('?', '_')
         safe_name = safe_name.replace('"', '_').replace('<', '_').replace('>', '_').replace('|', '_')
-        
+        return f"digimon_cards_{safe_name}"
+    
+    def save_pack_to_json(self, pack: CardPack, cards: List[Card]):
+        """保存单个卡包数据到JSON文件"""
         # 构建文件名
-        filename = f"digimon_cards_{safe_name}"
+        filename = self._pack_file_prefix(pack)
         
         # 保存卡包信息
         pack_file = os.path.join(self.output_dir, f"{filename}_pack.json")
@@ -788,6 +1019,18 @@ class DigimonCardScraper:
         
         print(f"  已保存: {cards_file} ({len(cards)} 张卡牌)")
         
+        # 记录内容哈希（获取详情失败的卡牌不记录，下次重新获取）
+        pending = self._pending_hashes.pop(pack.pack_id, None)
+        if pending and self.card_hashes:
+            failed = {f"{pack.pack_id}/{key}" for card, key in zip(cards, self._card_keys(cards))
+                      if id(card) in self.detail_failures}
+            for key, record in pending.items():
+                if key not in failed:
+                    self.card_hashes.update(key, record)
+            if failed:
+                self.card_hashes.hashes.pop(f"pack/{pack.pack_id}", None)
+            self.card_hashes.save()
+        
         return pack_file, cards_file
     
     def save_to_json(self, packs: List[CardPack], cards: List[Card], filename: str = None):
@@ -822,6 +1065,14 @@ def main():
     parser.add_argument("--details", action="store_true", help="获取详细信息（较慢）")
     parser.add_argument("--no-headless", action="store_true", help="显示浏览器")
     parser.add_argument("--driver-path", type=str, help="ChromeDriver路径")
+    parser.add_argument("--fetch-mode", choices=["http", "selenium"], default="http",
+                        help="http: 并发 HTTP 抓取（需要 JS 的页面回退到浏览器）; selenium: 全部通过浏览器")
+    parser.add_argument("--concurrency", type=int, default=8, help="HTTP 模式同时进行的请求数")
+    parser.add_argument("--delay", type=float, default=0.5, help="HTTP 模式同一站点相邻请求的最小间隔（秒）")
+    parser.add_argument("--workers", type=int, default=1, help="并行浏览器数（selenium 模式或 HTTP 回退时使用）")
+    parser.add_argument("--per-host", type=int, default=None, help="同时访问官网的浏览器数上限")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="不使用页面缓存和内容哈希，重新处理全部卡包（完整刷新）")
     
     args = parser.parse_args()
     
@@ -832,7 +1083,13 @@ def main():
     with DigimonCardScraper(
         headless=not args.no_headless, 
         output_dir=args.output,
-        chrome_driver_path=args.driver_path
+        chrome_driver_path=args.driver_path,
+        fetch_mode=args.fetch_mode,
+        concurrency=args.concurrency,
+        request_delay=args.delay,
+        workers=args.workers,
+        per_host=args.per_host,
+        use_cache=not args.no_cache
     ) as scraper:
         if args.debug:
             # 调试模式
@@ -851,6 +1108,9 @@ def main():
             # 爬取所有卡包
             packs, cards = scraper.scrape_all(max_packs=args.max_packs, get_details=args.details)
             scraper.save_to_json(packs, cards)
+        
+        if scraper.waits.records:
+            print(f"\n{scraper.waits.summary()}")
     
     print("\n完成!")
 
@@ -1,18 +1,21 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from typing import Optional, List
 import json
 import os
 
 from app.models import (
     DocumentType, DocumentMetadata, DocumentUpload,
-    QueryRequest, QueryResponse, DocumentInfo
+    QueryRequest, QueryResponse, DocumentInfo, CardFilterRequest,
+    CardBatchRequest
 )
 from app.vector_store import vector_store
 from app.pdf_processor import extract_text_from_bytes
 from app.llm_service import llm_service
+from app.config import EFFECT_EXAMPLE_CARDS, MAX_RULE_REFS
 
 app = FastAPI(
     title="卡牌游戏智能裁判",
@@ -103,35 +106,56 @@ async def add_text_document(doc: DocumentUpload):
     return {"status": "success", "data": result}
 
 
-@app.post("/query", response_model=QueryResponse, summary="提问")
-async def query(request: QueryRequest):
-    """
-    向智能裁判提问
-    
-    - question: 你的问题
-    - doc_types: 可选，限定搜索范围 ["rule", "ruling", "case"]
-    - top_k: 检索的参考文档数量
-    """
+def _retrieve_docs(request: QueryRequest):
+    """检索问题相关的文档，返回 (卡牌数据, 规则数据)"""
     from app.query_processor import query_processor
+    from app.effect_index import effect_index
+    from app.rule_index import rule_index
     
     card_docs = []  # 卡牌数据（直接显示）
     rule_docs_list = []  # 规则数据（给LLM分析）
     seen_contents = set()
     
-    # 1. 提取卡牌编号并精确检索
-    card_numbers = query_processor.extract_card_numbers(request.question)
+    # 1. 提取卡牌编号（含问题中提到的卡牌名）并精确检索
+    card_numbers = query_processor.resolve_card_numbers(request.question)
     if card_numbers:
         print(f"[检索] 发现卡牌编号: {card_numbers}")
+        card_results = vector_store.search_by_card_numbers(card_numbers, translate_result=True)
         for card_no in card_numbers:
-            results = vector_store.search_by_card_number(card_no, translate_result=True)
-            print(f"[检索] {card_no} 找到 {len(results)} 条结果")
-            for doc in results:
+            for doc in card_results.get(card_no.upper(), []):
+                content_hash = hash(doc["content"][:100])
+                if content_hash not in seen_contents:
+                    seen_contents.add(content_hash)
+                    card_docs.append(doc)
+    
+    # 2. 关键词效果/效果时机：直接取定义条款和示例卡牌
+    effect_terms = query_processor.extract_effect_terms(request.question)
+    if effect_terms:
+        print(f"[检索] 发现效果术语: {effect_terms}")
+        for term in effect_terms:
+            for doc in effect_index.rule_docs(term):
+                content_hash = hash(doc["content"][:100])
+                if content_hash not in seen_contents:
+                    seen_contents.add(content_hash)
+                    rule_docs_list.append(doc)
+            for doc in effect_index.example_docs(term, limit=EFFECT_EXAMPLE_CARDS):
                 content_hash = hash(doc["content"][:100])
                 if content_hash not in seen_contents:
                     seen_contents.add(content_hash)
                     card_docs.append(doc)
     
-    # 2. 对原始问题进行语义检索（规则相关）
+    # 3. 直接引用的规则条款/章节：按编号取条款
+    rule_refs = query_processor.extract_rule_refs(request.question)
+    if rule_refs:
+        print(f"[检索] 发现规则条款: {rule_refs}")
+        for rule_id in rule_refs[:MAX_RULE_REFS]:
+            for doc in rule_index.rule_docs(rule_id):
+                content_hash = hash(doc["content"][:100])
+                if content_hash not in seen_contents:
+                    seen_contents.add(content_hash)
+                    rule_docs_list.append(doc)
+    
+    # 4. 对原始问题进行语义检索（规则相关）
     rule_results = vector_store.search(
         query=request.question,
         doc_types=request.doc_types,
@@ -144,6 +168,44 @@ async def query(request: QueryRequest):
             seen_contents.add(content_hash)
             rule_docs_list.append(doc)
     
+    return card_docs, rule_docs_list
+
+
+def _format_cards(card_docs: List[dict]) -> List[dict]:
+    """卡牌数据直接返回（前端直接显示，不依赖LLM）"""
+    return [
+        {
+            "card_no": doc["metadata"].get("card_no", doc["metadata"].get("title", "")),
+            "title": doc["metadata"].get("title", ""),
+            "content": doc["content"]
+        }
+        for doc in card_docs
+    ]
+
+
+def _format_sources(rule_docs_list: List[dict]) -> List[dict]:
+    """规则来源"""
+    return [
+        {
+            "title": doc["metadata"].get("title", ""),
+            "doc_type": doc.get("doc_type", ""),
+            "excerpt": doc["content"][:300] + "..." if len(doc["content"]) > 300 else doc["content"]
+        }
+        for doc in rule_docs_list
+    ]
+
+
+@app.post("/query", response_model=QueryResponse, summary="提问")
+async def query(request: QueryRequest):
+    """
+    向智能裁判提问
+    
+    - question: 你的问题
+    - doc_types: 可选，限定搜索范围 ["rule", "ruling", "case"]
+    - top_k: 检索的参考文档数量
+    """
+    card_docs, rule_docs_list = _retrieve_docs(request)
+    
     # 合并所有文档给 LLM（只传规则，不传卡牌，避免 LLM 编造）
     # 卡牌数据已经在前端直接显示了
     all_docs_for_llm = rule_docs_list  # 只传规则文档
@@ -157,31 +219,106 @@ async def query(request: QueryRequest):
     
     # LLM 只做规则分析（不传卡牌数据，避免它编造效果）
     if all_docs_for_llm:
-        answer = llm_service.generate_answer(request.question, all_docs_for_llm)
+        # 放到线程池执行，不阻塞事件循环；并发的请求可以被微调模型合并成一批生成
+        answer = await run_in_threadpool(llm_service.generate_answer, request.question, all_docs_for_llm)
     else:
         answer = "已找到相关卡牌数据（见上方）。如需规则裁定分析，请确保已导入规则文档。"
     
-    # 卡牌数据直接返回（前端直接显示，不依赖LLM）
-    cards = [
-        {
-            "card_no": doc["metadata"].get("card_no", doc["metadata"].get("title", "")),
-            "title": doc["metadata"].get("title", ""),
-            "content": doc["content"]
-        }
-        for doc in card_docs
-    ]
+    return QueryResponse(answer=answer, sources=_format_sources(rule_docs_list), cards=_format_cards(card_docs))
+
+
+@app.post("/query/stream", summary="提问（流式返回）")
+async def query_stream(request: QueryRequest):
+    """
+    与 /query 相同，但以 NDJSON 流式返回：
+    第一行 {"sources": [...], "cards": [...]}，之后每行 {"delta": "回答片段"}，最后一行 {"done": true}
+    """
+    card_docs, rule_docs_list = _retrieve_docs(request)
     
-    # 规则来源
-    sources = [
-        {
-            "title": doc["metadata"].get("title", ""),
-            "doc_type": doc.get("doc_type", ""),
-            "excerpt": doc["content"][:300] + "..." if len(doc["content"]) > 300 else doc["content"]
-        }
-        for doc in rule_docs_list
-    ]
+    def events():
+        yield json.dumps({"sources": _format_sources(rule_docs_list), "cards": _format_cards(card_docs)},
+                         ensure_ascii=False) + "\n"
+        if not card_docs and not rule_docs_list:
+            yield json.dumps({"delta": "抱歉，我在知识库中没有找到与您问题相关的信息。"}, ensure_ascii=False) + "\n"
+        elif not rule_docs_list:
+            yield json.dumps({"delta": "已找到相关卡牌数据（见上方）。如需规则裁定分析，请确保已导入规则文档。"},
+                             ensure_ascii=False) + "\n"
+        else:
+            for piece in llm_service.stream_answer(request.question, rule_docs_list):
+                yield json.dumps({"delta": piece}, ensure_ascii=False) + "\n"
+        yield json.dumps({"done": True}) + "\n"
     
-    return QueryResponse(answer=answer, sources=sources, cards=cards)
+    # 同步生成器由 StreamingResponse 在线程池中迭代
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.post("/cards/filter", summary="按条件筛选卡牌")
+async def filter_cards(request: CardFilterRequest):
+    """
+    按颜色、等级、费用、DP、形态、属性、特征、稀有度、卡包、关键词效果等条件筛选卡牌
+
+    示例请求体（绿色 Lv.5 且持有≪阻挡者≫的数码宝贝）：
+    ```json
+    {"color": ["绿"], "level_min": 5, "level_max": 5, "keywords": ["≪阻挡者≫"]}
+    ```
+    """
+    from app.card_index import card_index
+
+    criteria = request.model_dump(exclude={"page", "page_size"})
+    result = card_index.filter(page=request.page, page_size=request.page_size, **criteria)
+    return {"status": "success", **result}
+
+
+@app.post("/cards/batch", summary="批量查询卡牌（卡组列表）")
+async def batch_cards(request: CardBatchRequest):
+    """
+    一次查询多张卡牌，支持直接粘贴卡组列表
+
+    示例请求体：
+    ```json
+    {"deck_list": "4 BT1-010 アグモン\nBT1-025 x3\nST1-01"}
+    ```
+    """
+    from app.query_processor import query_processor
+
+    entries = query_processor.parse_deck_list(request.deck_list) if request.deck_list else []
+    counted = {card_no for card_no, _ in entries}
+    for card_no in request.card_numbers:
+        card_no = query_processor.normalize_card_number(card_no.strip())
+        if card_no and card_no not in counted:
+            counted.add(card_no)
+            entries.append((card_no, 1))
+
+    if not entries:
+        raise HTTPException(status_code=400, detail="未找到卡牌编号")
+
+    results = vector_store.search_by_card_numbers(
+        [card_no for card_no, _ in entries],
+        translate_result=request.translate_result
+    )
+    data = []
+    for card_no, quantity in entries:
+        docs = results.get(card_no.upper(), [])
+        data.append({
+            "card_no": card_no,
+            "quantity": quantity,
+            "found": bool(docs),
+            "cards": [
+                {
+                    "card_no": doc["metadata"].get("card_no", doc["metadata"].get("title", "")),
+                    "title": doc["metadata"].get("title", ""),
+                    "content": doc["content"]
+                }
+                for doc in docs
+            ]
+        })
+
+    return {
+        "status": "success",
+        "data": data,
+        "total": sum(quantity for _, quantity in entries),
+        "not_found": [item["card_no"] for item in data if not item["found"]]
+    }
 
 
 @app.get("/documents", summary="列出所有文档")
@@ -0,0 +1,120 @@
+"""
+卡牌数据变更集
+
+比较两个卡牌数据快照（digimon_card_data/ 目录或之前保存的快照文件），按 card_no 和各字段的哈希
+找出新增、删除和勘误（字段变化）的卡牌，以及内容变化的数据文件。下游（卡牌翻译、向量库导入）
+读取变更集后只处理变化的部分。
+
+快照格式:
+    {"files": {文件名: 内容哈希}, "cards": {card_no: {"files": [...], "fields": {字段: 哈希}}}}
+
+变更集格式:
+    {"added": [card_no], "removed": [card_no], "errata": {card_no: [字段]},
+     "changed_files": [文件名], "removed_files": [文件名]}
+"""
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Union
+
+# 不属于卡牌内容的字段：爬取时间，以及重印卡在各卡包中不同的字段
+IGNORED_FIELDS = ("created_at", "updated_at", "pack_id", "pack_name", "card_url", "image_url")
+
+
+def _hash(value) -> str:
+    text = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def build_snapshot(card_dir: Union[str, Path]) -> Dict:
+    """
+    扫描卡牌目录生成快照
+    files 覆盖目录下全部 *.json（向量库导入全部文件）；cards 只来自 *_cards.json，
+    同一 card_no 出现在多个文件中时（重印）以文件名排序后第一次出现的为准
+    """
+    card_dir = Path(card_dir)
+    files, cards = {}, {}
+    for path in sorted(card_dir.glob("*.json")):
+        content = path.read_bytes()
+        files[path.name] = hashlib.sha256(content).hexdigest()[:16]
+        if not path.name.endswith("_cards.json"):
+            continue
+        for card in json.loads(content):
+            card_no = card.get('card_no')
+            if not card_no:
+                continue
+            entry = cards.setdefault(card_no, {"files": [], "fields": None})
+            if path.name not in entry["files"]:
+                entry["files"].append(path.name)
+            if entry["fields"] is None:
+                entry["fields"] = {
+                    field: _hash(value) for field, value in card.items() if field not in IGNORED_FIELDS
+                }
+    return {"files": files, "cards": cards}
+
+
+def load_snapshot(source: Union[str, Path]) -> Dict:
+    """source 为卡牌目录（现场扫描）或快照文件；文件不存在时视为空快照（全部新增）"""
+    source = Path(source)
+    if source.is_dir():
+        return build_snapshot(source)
+    if not source.exists():
+        return {"files": {}, "cards": {}}
+    with open(source, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_json(data: Dict, path: Union[str, Path]):
+    """原子写入"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = path.with_name(path.name + ".tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, path)
+
+
+def diff_snapshots(old: Dict, new: Dict) -> Dict:
+    """两个快照的变更集"""
+    old_cards, new_cards = old.get("cards", {}), new.get("cards", {})
+    errata = {}
+    for card_no in old_cards.keys() & new_cards.keys():
+        old_fields, new_fields = old_cards[card_no]["fields"], new_cards[card_no]["fields"]
+        changed = sorted(
+            field for field in old_fields.keys() | new_fields.keys()
+            if old_fields.get(field) != new_fields.get(field)
+        )
+        if changed:
+            errata[card_no] = changed
+
+    old_files, new_files = old.get("files", {}), new.get("files", {})
+    return {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "added": sorted(new_cards.keys() - old_cards.keys()),
+        "removed": sorted(old_cards.keys() - new_cards.keys()),
+        "errata": dict(sorted(errata.items())),
+        "changed_files": sorted(name for name, digest in new_files.items() if old_files.get(name) != digest),
+        "removed_files": sorted(old_files.keys() - new_files.keys()),
+    }
+
+
+def load_changes(path: Union[str, Path]) -> Dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def changed_card_nos(changes: Dict) -> set:
+    """需要重新处理的卡牌（新增 + 勘误）"""
+    return set(changes.get("added", [])) | set(changes.get("errata", {}))
+
+
+def is_empty(changes: Dict) -> bool:
+    return not any(changes.get(key) for key in ("added", "removed", "errata", "changed_files", "removed_files"))
+
+
+def summary(changes: Dict) -> str:
+    return (f"新增 {len(changes.get('added', []))} 张, 删除 {len(changes.get('removed', []))} 张, "
+            f"勘误 {len(changes.get('errata', {}))} 张; "
+            f"变化文件 {len(changes.get('changed_files', []))} 个, 删除文件 {len(changes.get('removed_files', []))} 个")
@@ -0,0 +1,362 @@
+"""
+卡牌结构化索引 - 基于预计算位图的多条件筛选
+
+启动时为每个字段的每个取值预先计算一个位图（Python int，第 i 位代表第 i 张卡），
+筛选时只对位图做按位与/或运算，耗时与卡包数量无关。
+"""
+import json
+import re
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.config import CARD_DATA_DIR
+
+# 关键词效果：≪ブロッカー≫、≪1ドロー≫、≪デコイ《黒》≫ 等
+KEYWORD_PATTERN = re.compile(r'≪([^≫]+)≫')
+
+# 效果时机：【登場時】、【自分のターン】 等
+TIMING_PATTERN = re.compile(r'【[^】]+】')
+
+# 卡面缩写 → 标准写法
+KEYWORD_ALIASES = {
+    "Sアタック": "セキュリティアタック",
+}
+
+# 需要提取关键词的文本字段
+EFFECT_FIELDS = ("effect", "inherited_effect", "security_effect")
+
+# 单值分类字段
+CATEGORY_FIELDS = ("color", "color2", "card_type", "form", "attribute", "rarity")
+
+# 数值区间字段
+RANGE_FIELDS = ("level", "cost", "dp")
+
+
+def normalize_keyword(raw: str) -> str:
+    """
+    标准化关键词效果，去掉数值和《》参数
+    例: ≪1ドロー≫ → ≪ドロー≫, ≪Sアタック+1≫ → ≪セキュリティアタック≫
+    """
+    name = raw.strip().strip("≪≫")
+    name = re.sub(r'《[^》]*》', '', name)
+    name = re.sub(r'[0-9０-９+\-−＋－/]', '', name).strip()
+    name = KEYWORD_ALIASES.get(name, name)
+    return f"≪{name}≫" if name else ""
+
+
+def extract_keywords(card: dict) -> List[str]:
+    """提取卡牌效果/继承效果/安防效果中出现的关键词效果（去重，保持出现顺序）"""
+    keywords = []
+    for field in EFFECT_FIELDS:
+        for raw in KEYWORD_PATTERN.findall(card.get(field) or ""):
+            keyword = normalize_keyword(raw)
+            if keyword and keyword not in keywords:
+                keywords.append(keyword)
+    return keywords
+
+
+def base_card_no(card_no: str) -> str:
+    """去掉平行卡后缀：BT1-079_P1 → BT1-079"""
+    return re.sub(r'_P\d+$', '', card_no.strip().upper())
+
+
+def extract_timings(card: dict) -> List[str]:
+    """提取卡牌效果/继承效果/安防效果中出现的效果时机（去重，保持出现顺序）"""
+    timings = []
+    for field in EFFECT_FIELDS:
+        for timing in TIMING_PATTERN.findall(card.get(field) or ""):
+            if timing not in timings:
+                timings.append(timing)
+    return timings
+
+
+def _pack_key(value: str) -> str:
+    """卡包标识标准化：BT-24 / bt24 / 【BT-24】 统一为 BT24"""
+    return re.sub(r'[\s\-_【】]', '', str(value)).upper()
+
+
+def natural_key(card_no: str) -> list:
+    """卡牌编号自然排序：BT2-099 排在 BT10-001 之前"""
+    return [int(p) if p.isdigit() else p for p in re.split(r'(\d+)', card_no)]
+
+
+def _iter_bits(mask: int):
+    """按从低到高的顺序遍历位图中被置位的下标"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _bit_count(mask: int) -> int:
+    return bin(mask).count("1")
+
+
+class CardIndex:
+    """日文卡牌数据的位图索引，每个卡牌编号（合并平行卡与再录）对应一位"""
+
+    def __init__(self, card_dir: str = CARD_DATA_DIR):
+        self.card_dir = Path(card_dir)
+        self.cards: List[dict] = []
+        self.card_keywords: List[List[str]] = []
+        self.card_timings: List[List[str]] = []
+        self.card_packs: List[List[str]] = []
+        self._positions: Dict[str, int] = {}  # {卡牌编号: 下标}
+        # {字段: {取值: 位图}}
+        self._bitmaps: Dict[str, Dict[str, int]] = {}
+        # {字段: (升序取值列表, 前缀位图列表)}，前缀位图[i] = 所有 <= 取值[i] 的卡
+        self._ranges: Dict[str, Tuple[list, List[int]]] = {}
+        self._all = 0
+        # {卡牌编号: 术语翻译后的卡牌文本}，术语表在进程内不变，翻译一次即可
+        self._translated: Dict[str, str] = {}
+        self._load()
+
+    def _load(self):
+        """加载卡牌数据，按卡牌编号合并各印刷版本并构建位图"""
+        if not self.card_dir.exists():
+            print(f"❌ [卡牌索引] 卡牌数据目录不存在: {self.card_dir}")
+            return
+
+        printings: Dict[str, List[dict]] = {}
+        row_count = 0
+        for file_path in sorted(self.card_dir.glob("*_cards.json")):
+            try:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    rows = json.load(f)
+            except Exception as e:
+                print(f"❌ [卡牌索引] 读取失败 {file_path.name}: {e}")
+                continue
+            for row in rows:
+                if row.get("card_no"):
+                    printings.setdefault(base_card_no(row["card_no"]), []).append(row)
+                    row_count += 1
+
+        for card_no in sorted(printings, key=natural_key):
+            rows = printings[card_no]
+            # 再录卡包中常有只含编号的空记录，优先使用有完整数据的版本
+            card = next((r for r in rows if r.get("card_type")), rows[0])
+            packs = []
+            for row in rows:
+                if row.get("pack_name") and row["pack_name"] not in packs:
+                    packs.append(row["pack_name"])
+            self._positions[card_no] = len(self.cards)
+            self.cards.append(dict(card, card_no=card_no))
+            self.card_packs.append(packs)
+            self.card_keywords.append(extract_keywords(card))
+            self.card_timings.append(extract_timings(card))
+
+        self._build(printings)
+        print(f"✅ [卡牌索引] 加载完成: {len(self.cards)} 张卡牌（{row_count} 条印刷记录）")
+
+    def _add(self, field: str, value, bit: int):
+        if value is None or value == "":
+            return
+        bucket = self._bitmaps.setdefault(field, {})
+        bucket[value] = bucket.get(value, 0) | bit
+
+    def _build(self, printings: Dict[str, List[dict]]):
+        for i, card in enumerate(self.cards):
+            bit = 1 << i
+            self._all |= bit
+
+            for field in CATEGORY_FIELDS:
+                self._add(field, card.get(field), bit)
+            for field in RANGE_FIELDS:
+                self._add(field, card.get(field), bit)
+
+            # 特征可能有多个，如 "聖騎士型/ロイヤルナイツ"
+            for digimon_type in (card.get("digimon_type") or "").split("/"):
+                self._add("digimon_type", digimon_type.strip(), bit)
+
+            # 卡包可用卡包编号、pack_id 或完整卡包名检索，收录于任一卡包即匹配
+            for row in printings[card["card_no"]]:
+                pack_name = row.get("pack_name") or ""
+                self._add("pack", _pack_key(pack_name), bit)
+                self._add("pack", _pack_key(row.get("pack_id") or ""), bit)
+                code = re.search(r'【([^】]+)】', pack_name)
+                if code:
+                    self._add("pack", _pack_key(code.group(1)), bit)
+
+            for keyword in self.card_keywords[i]:
+                self._add("keyword", keyword, bit)
+            for timing in self.card_timings[i]:
+                self._add("timing", timing, bit)
+
+        for field in RANGE_FIELDS:
+            bucket = self._bitmaps.get(field, {})
+            values = sorted(bucket)
+            prefix, acc = [], 0
+            for value in values:
+                acc |= bucket[value]
+                prefix.append(acc)
+            self._ranges[field] = (values, prefix)
+
+    # ---------- 取值标准化 ----------
+
+    @staticmethod
+    def _to_japanese(value: str) -> str:
+        """筛选条件支持中文，如 绿 → 緑、究极体 → 究極体"""
+        from app.terminology_translator import terminology_translator
+        value = str(value).strip()
+        return terminology_translator.zh_to_ja.get(value, value)
+
+    @staticmethod
+    def _to_japanese_keyword(value: str) -> str:
+        """关键词效果支持中日文、带或不带 ≪≫，如 阻挡者 / ≪阻挡者≫ / ブロッカー"""
+        from app.terminology_translator import terminology_translator
+        name = str(value).strip().strip("≪≫")
+        # 术语表中部分关键词缺少右括号，如 "≪判定安防"
+        for candidate in (f"≪{name}≫", f"≪{name}"):
+            ja = terminology_translator.zh_to_ja.get(candidate)
+            if ja:
+                name = ja
+                break
+        return normalize_keyword(name)
+
+    @staticmethod
+    def _to_japanese_timing(value: str) -> str:
+        """效果时机支持中日文、带或不带 【】，如 消灭时 / 【消灭时】 / 【消滅時】"""
+        from app.terminology_translator import terminology_translator
+        timing = "【" + str(value).strip().strip("【】") + "】"
+        return terminology_translator.zh_to_ja.get(timing, timing)
+
+    # ---------- 位图运算 ----------
+
+    def _match_any(self, field: str, values: List[str]) -> int:
+        """同一字段内多个取值为"或"关系"""
+        bucket = self._bitmaps.get(field, {})
+        mask = 0
+        for value in values:
+            mask |= bucket.get(value, 0)
+        return mask
+
+    def _match_range(self, field: str, low=None, high=None) -> int:
+        values, prefix = self._ranges.get(field, ([], []))
+        hi = len(values) - 1 if high is None else bisect_right(values, high) - 1
+        if hi < 0:
+            return 0
+        mask = prefix[hi]
+        if low is not None:
+            lo = bisect_left(values, low) - 1
+            if lo >= 0:
+                mask &= ~prefix[lo]
+        return mask
+
+    def filter_mask(
+        self,
+        color: Optional[List[str]] = None,
+        color2: Optional[List[str]] = None,
+        card_type: Optional[List[str]] = None,
+        form: Optional[List[str]] = None,
+        attribute: Optional[List[str]] = None,
+        digimon_type: Optional[List[str]] = None,
+        rarity: Optional[List[str]] = None,
+        pack: Optional[List[str]] = None,
+        keywords: Optional[List[str]] = None,
+        timings: Optional[List[str]] = None,
+        level_min: Optional[int] = None,
+        level_max: Optional[int] = None,
+        cost_min: Optional[int] = None,
+        cost_max: Optional[int] = None,
+        dp_min: Optional[int] = None,
+        dp_max: Optional[int] = None,
+    ) -> int:
+        """
+        计算满足所有条件的卡牌位图
+        不同字段之间为"与"，同一字段的多个取值为"或"，keywords/timings 需全部满足。
+        """
+        mask = self._all
+
+        categories = {
+            "color": color, "color2": color2, "card_type": card_type,
+            "form": form, "attribute": attribute, "digimon_type": digimon_type,
+            "rarity": rarity,
+        }
+        for field, values in categories.items():
+            if values:
+                mask &= self._match_any(field, [self._to_japanese(v) for v in values])
+
+        if pack:
+            mask &= self._match_any("pack", [_pack_key(p) for p in pack])
+
+        for keyword in keywords or []:
+            mask &= self._match_any("keyword", [self._to_japanese_keyword(keyword)])
+
+        for timing in timings or []:
+            mask &= self._match_any("timing", [self._to_japanese_timing(timing)])
+
+        ranges = {
+            "level": (level_min, level_max),
+            "cost": (cost_min, cost_max),
+            "dp": (dp_min, dp_max),
+        }
+        for field, (low, high) in ranges.items():
+            if low is not None or high is not None:
+                mask &= self._match_range(field, low, high)
+
+        return mask
+
+    def format_card(self, i: int) -> dict:
+        """返回卡牌数据，附带去掉编号前缀的名称、关键词效果、效果时机和收录卡包"""
+        card = self.cards[i]
+        name = card.get("card_name") or ""
+        if name.upper().startswith(card["card_no"]):
+            name = name[len(card["card_no"]):]
+        return dict(card, name=name, keywords=self.card_keywords[i],
+                    timings=self.card_timings[i], packs=self.card_packs[i])
+
+    def get_card(self, card_no: str) -> Optional[dict]:
+        """按卡牌编号获取卡牌（平行卡编号返回原卡）"""
+        i = self._positions.get(base_card_no(card_no))
+        return self.format_card(i) if i is not None else None
+
+    def card_doc(self, card_no: str, translate_result: bool = True, source: str = "jp_cards") -> Optional[dict]:
+        """按卡牌编号生成与卡牌编号检索结果格式一致的文档"""
+        from app.pdf_processor import format_card_data
+        from app.terminology_translator import terminology_translator
+
+        card = self.get_card(card_no)
+        if not card:
+            return None
+        content = format_card_data(card)
+        if translate_result and card["card_no"] not in self._translated:
+            self._translated[card["card_no"]] = terminology_translator.translate_result_to_chinese(content)
+        return {
+            "content": self._translated[card["card_no"]] if translate_result else content,
+            "content_original": content,
+            "metadata": {
+                "title": f"{card['card_no']} {card['name']}",
+                "doc_type": "card",
+                "card_no": card["card_no"],
+                "source": source
+            },
+            "score": 0.0,
+            "doc_type": "card"
+        }
+
+    def filter(self, page: int = 1, page_size: int = 20, **criteria) -> dict:
+        """按条件筛选卡牌并分页"""
+        page = max(page, 1)
+        page_size = max(page_size, 1)
+        mask = self.filter_mask(**criteria)
+
+        start = (page - 1) * page_size
+        cards = []
+        for n, i in enumerate(_iter_bits(mask)):
+            if n < start:
+                continue
+            if len(cards) >= page_size:
+                break
+            cards.append(self.format_card(i))
+
+        return {
+            "total": _bit_count(mask),
+            "page": page,
+            "page_size": page_size,
+            "cards": cards,
+        }
+
+
+# 单例
+card_index = CardIndex()
@@ -13,17 +13,65 @@ CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", str(PROJECT_ROOT / "data" /
 if CHROMA_PERSIST_DIR.startswith(".."):
     CHROMA_PERSIST_DIR = str((BASE_DIR / CHROMA_PERSIST_DIR).resolve())
 DOCS_DIR = os.getenv("DOCS_DIR", str(BASE_DIR / "data" / "documents"))
+# 日文卡牌数据（爬虫输出，*_cards.json）
+CARD_DATA_DIR = os.getenv("CARD_DATA_DIR", str(PROJECT_ROOT / "digimon_card_data"))
+# 卡牌数据快照（上次处理时的字段哈希）和变更集（由 diff_card_data.py 生成）
+CARD_SNAPSHOT_FILE = os.getenv("CARD_SNAPSHOT_FILE", str(PROJECT_ROOT / "data" / "card_snapshot.json"))
+CARD_CHANGES_FILE = os.getenv("CARD_CHANGES_FILE", str(PROJECT_ROOT / "data" / "card_changes.json"))
+# PDF 逐页提取结果缓存
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", str(PROJECT_ROOT / "data" / "pdf_cache"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# DTCG 术语对照表
+TERMINOLOGY_FILE = os.getenv("TERMINOLOGY_FILE", str(PROJECT_ROOT / "digimon_data" / "dtcg_terminology.json"))
+# 数码宝贝日中名称对照表
+NAME_MAPPING_FILE = os.getenv("NAME_MAPPING_FILE", str(PROJECT_ROOT / "digimon_data" / "digimon_name_mapping_v3.json"))
+# 关键词效果/效果时机倒排索引（由 build_effect_index.py 生成）
+EFFECT_INDEX_FILE = os.getenv("EFFECT_INDEX_FILE", str(PROJECT_ROOT / "data" / "effect_index.json"))
+# 规则书中文文本（用于定位关键词效果/效果时机的规则条款）
+RULEBOOK_TEXT_FILE = os.getenv(
+    "RULEBOOK_TEXT_FILE",
+    str(BASE_DIR / "数码宝贝卡牌对战_综合规则_最新版_中文翻译_gemini.txt")
+)
 
 # Model settings
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "local")
-LLM_MODEL = os.getenv("LLM_MODEL", "local")  # 可选: local, openai, gemini
+LLM_MODEL = os.getenv("LLM_MODEL", "local")  # 可选: local, openai, gemini, qwen, finetuned
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY", "")
 
+# 进程内微调模型（LLM_MODEL=finetuned）：finetune_qwen.py --merge 输出的合并模型
+FINETUNED_MODEL_PATH = os.getenv("FINETUNED_MODEL_PATH", str(BASE_DIR / "finetune" / "output" / "dtcg_qwen_lora_merged"))
+FINETUNED_DEVICE = os.getenv("FINETUNED_DEVICE", "auto")  # auto / cpu / cuda / cuda:0
+FINETUNED_MAX_BATCH = int(os.getenv("FINETUNED_MAX_BATCH", "8"))  # 一批最多合并的并发请求数
+FINETUNED_BATCH_WAIT_MS = float(os.getenv("FINETUNED_BATCH_WAIT_MS", "20"))  # 收集并发请求的等待时间
+FINETUNED_MAX_NEW_TOKENS = int(os.getenv("FINETUNED_MAX_NEW_TOKENS", "512"))
+
 # RAG settings
 CHUNK_SIZE = 500
 CHUNK_OVERLAP = 100
+RULE_CHUNK_SIZE = 1000  # 综合规则按条款切分时单个分块的最大字数（单个条款超长时不拆分）
+MAX_RULE_REFS = 3  # 问题中直接引用的规则条款/章节最多取几条
 TOP_K_RESULTS = 5
+EFFECT_EXAMPLE_CARDS = 2  # 问题中提到关键词/时机时附带的示例卡牌数
+MAX_CARDS_PER_NAME = 10  # 问题中提到卡牌名时最多检索的印刷版本数
+
+# 批量 LLM 翻译（各翻译工具共用）
+TRANSLATION_CONCURRENCY = int(os.getenv("TRANSLATION_CONCURRENCY", "8"))  # 同时进行的请求数
+TRANSLATION_RPM = {  # 各提供方每分钟请求数上限
+    "gemini": float(os.getenv("GEMINI_RPM", "15")),
+    "openai": float(os.getenv("OPENAI_RPM", "500")),
+}
+# 多条短文本合并为一次请求（JSON 数组输入输出）
+TRANSLATION_BATCH_ITEMS = int(os.getenv("TRANSLATION_BATCH_ITEMS", "20"))  # 每次请求最多条数
+TRANSLATION_BATCH_CHARS = int(os.getenv("TRANSLATION_BATCH_CHARS", "3000"))  # 每次请求原文最多字数
+# 本地处理（术语替换等 CPU 密集部分）的进程数
+TRANSLATION_WORKERS = int(os.getenv("TRANSLATION_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# 翻译记忆库（各翻译工具共用，LLM 调用前先查）
+TRANSLATION_MEMORY_DB = os.getenv("TRANSLATION_MEMORY_DB", str(PROJECT_ROOT / "data" / "translation_memory.db"))
+# 规则书翻译脚本从旧版中文规则书提取的术语参考（不是译文，单独缓存）
+TERMINOLOGY_CACHE_FILE = os.getenv("TERMINOLOGY_CACHE_FILE", str(PROJECT_ROOT / "data" / "terminology_cache.json"))
 
 # Collection names
 COLLECTION_RULES = "game_rules"
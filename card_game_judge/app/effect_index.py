@@ -0,0 +1,261 @@
+"""
+关键词效果/效果时机倒排索引
+
+解析卡牌效果文本中的 ≪…≫ 关键词效果与 【…】 效果时机，建立 卡牌编号 ↔ 术语 的双向索引，
+并从规则书中定位各术语的定义条款。问题中提到这些术语时，无需向量检索即可取得规则和示例卡牌。
+索引由 build_effect_index.py 预先生成，文件不存在时在启动时即时构建。
+"""
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.card_index import extract_keywords, extract_timings, normalize_keyword
+from app.config import EFFECT_INDEX_FILE, RULEBOOK_TEXT_FILE, TERMINOLOGY_FILE
+from app.rulebook_parser import clause_block, format_clauses, parse_rulebook
+
+INDEX_VERSION = 1
+
+# 问题或规则中的术语
+TERM_PATTERN = re.compile(r'≪[^≫]+≫|【[^】]+】')
+
+# 术语表未收录（或与规则书译法不同）的术语：{日文: 规则书中文写法}
+RULEBOOK_TERM_ALIASES = {
+    "≪再起動≫": "≪重启≫",
+    "≪道連れ≫": "≪同归于尽≫",
+    "≪デジバースト≫": "≪数码爆裂≫",
+    "≪突進≫": "≪突进≫",
+    "≪アーマー解除≫": "≪装甲解除≫",
+    "≪衝突≫": "≪冲突≫",
+    "≪マインドリンク≫": "≪意识链接≫",
+    "≪ヴォルテクス≫": "≪旋风≫",
+    "≪スケープゴート≫": "≪替罪≫",
+    "≪氷装≫": "≪冰装≫",
+    "≪リンク≫": "≪链接≫",
+    "≪オーバークロック≫": "≪超频≫",
+    "≪吸収進化≫": "≪吸收进化≫",
+    "≪プログレス≫": "≪进程≫",
+    "≪エグゼキュート≫": "≪处决≫",
+    "≪フラグメント≫": "≪碎片≫",
+    "≪ブラスト進化≫": "≪突风进化≫",
+    "≪ブラストジョグレス≫": "≪突风联展进化≫",
+    "≪デコード≫": "≪解码≫",
+    "≪パーティション≫": "≪分裂≫",
+    "【自分のターン終了時】": "【自己的回合结束时】",
+    "【相手のターン終了時】": "【对手的回合结束时】",
+    "【お互いのターン終了時】": "【双方回合结束时】",
+    "【相手のメインフェイズ開始時】": "【对手的主要阶段开始时】",
+    "【アタック終了時】": "【攻击结束时】",
+    "【移動時】": "【移动时】",
+    "【リンク時】": "【链接时】",
+}
+
+
+def canonical_term(term: str, aliases: Dict[str, str]) -> str:
+    """将中日文术语统一为索引中的标准写法（优先日文）"""
+    if term.startswith("≪"):
+        term = normalize_keyword(term)
+    return aliases.get(term, term)
+
+
+def _terminology_aliases(terminology_file: str = TERMINOLOGY_FILE) -> Dict[str, str]:
+    """从术语对照表生成 {中/日文写法: 日文标准写法}"""
+    aliases = {}
+    for ja, zh in RULEBOOK_TERM_ALIASES.items():
+        aliases[ja] = ja
+        aliases[zh] = ja
+    path = Path(terminology_file)
+    if not path.exists():
+        return aliases
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for ja, zh in data.get("keyword_effect", {}).items():
+        # 术语表中部分关键词缺少右括号，如 "≪セキュリティアタック"
+        canonical = normalize_keyword(ja)
+        aliases[canonical] = canonical
+        if zh:
+            aliases.setdefault(normalize_keyword(zh), canonical)
+    for ja, zh in data.get("effect_timing", {}).items():
+        aliases[ja] = ja
+        if zh:
+            aliases.setdefault(zh, ja)
+    return aliases
+
+
+def parse_rule_sections(text: str, aliases: Dict[str, str]) -> Dict[str, List[dict]]:
+    """
+    定位规则书中各术语的定义条款
+    标题只由术语组成的条款（如 "16-4. ≪阻挡者≫"）视为定义，连同其下所有子条款一起返回
+    """
+    clauses = parse_rulebook(text)
+    sections: Dict[str, List[dict]] = {}
+    for i, clause in enumerate(clauses):
+        # 去掉 "（※旧≪…≫）" 之类的注释后只剩术语
+        heading = re.sub(r'（[^）]*）', "", clause["title"])
+        terms = TERM_PATTERN.findall(heading)
+        if not terms or TERM_PATTERN.sub("", heading).strip():
+            continue
+        body = format_clauses(clause_block(clauses, i))
+        for term in dict.fromkeys(canonical_term(t, aliases) for t in terms):
+            sections.setdefault(term, []).append({
+                "rule_id": clause["rule_id"],
+                "title": clause["title"],
+                "text": body,
+            })
+    return sections
+
+
+def build_effect_index(cards: List[dict], rulebook_text: str = "") -> dict:
+    """
+    构建倒排索引
+
+    Args:
+        cards: 日文卡牌数据（每个卡牌编号一条）
+        rulebook_text: 规则书文本，用于定位术语的定义条款
+    """
+    aliases = _terminology_aliases()
+    card_terms: Dict[str, dict] = {}
+    keywords: Dict[str, List[str]] = {}
+    timings: Dict[str, List[str]] = {}
+
+    for card in cards:
+        card_no = card.get("card_no")
+        if not card_no:
+            continue
+        card_keywords = [canonical_term(k, aliases) for k in extract_keywords(card)]
+        card_timings = [canonical_term(t, aliases) for t in extract_timings(card)]
+        if not card_keywords and not card_timings:
+            continue
+        card_terms[card_no] = {"keywords": card_keywords, "timings": card_timings}
+        for keyword in card_keywords:
+            keywords.setdefault(keyword, []).append(card_no)
+        for timing in card_timings:
+            timings.setdefault(timing, []).append(card_no)
+
+    rule_sections = parse_rule_sections(rulebook_text, aliases) if rulebook_text else {}
+
+    # 只出现在卡牌或规则书中的术语，以自身为标准写法
+    for term in list(keywords) + list(timings) + list(rule_sections):
+        aliases.setdefault(term, term)
+
+    return {
+        "version": INDEX_VERSION,
+        "built_at": datetime.now().isoformat(),
+        "aliases": aliases,
+        "cards": card_terms,
+        "keywords": keywords,
+        "timings": timings,
+        "rule_sections": rule_sections,
+    }
+
+
+def read_rulebook_text(path: str = RULEBOOK_TEXT_FILE) -> str:
+    p = Path(path)
+    return p.read_text(encoding='utf-8') if p.exists() else ""
+
+
+class EffectIndex:
+    """查询阶段使用的术语索引"""
+
+    def __init__(self, index_file: str = EFFECT_INDEX_FILE):
+        self.index_file = Path(index_file)
+        self.data: dict = {}
+        self._load()
+        aliases = self.data.get("aliases", {})
+        self._terms = set(aliases.values())
+        # 用户提问时常省略 ≪≫ / 【】，如 "阻挡者"、"ブロッカー"、"登场时"
+        # （效果时机只收录以"时/時"结尾的写法，"メイン"、"安防"等单独出现时多半不是指时机）
+        keywords, timings = self.data.get("keywords", {}), self.data.get("timings", {})
+        bare_terms = {}
+        for alias, term in aliases.items():
+            bare = alias.strip("≪≫【】")
+            if len(bare) < 2:
+                continue
+            if (alias.startswith("≪") and term in keywords) or (
+                    alias.startswith("【") and term in timings and bare.endswith(("时", "時"))):
+                bare_terms.setdefault(bare, term)
+        self._bare_terms = [
+            (self._bare_pattern(bare), term)
+            for bare, term in sorted(bare_terms.items(), key=lambda x: len(x[0]), reverse=True)
+        ]
+
+    def _load(self):
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if data.get("version") == INDEX_VERSION:
+                    self.data = data
+                    print(f"✅ [术语索引] 加载完成: {len(data['keywords'])} 个关键词效果, "
+                          f"{len(data['timings'])} 个效果时机, {len(data['cards'])} 张卡牌")
+                    return
+                print("⚠️ [术语索引] 索引版本不一致，重新构建")
+            except Exception as e:
+                print(f"❌ [术语索引] 加载失败: {e}")
+
+        from app.card_index import card_index
+        self.data = build_effect_index(card_index.cards, read_rulebook_text())
+        print("⚠️ [术语索引] 未找到索引文件，已即时构建（建议运行 build_effect_index.py）")
+
+    def find_terms(self, query: str) -> List[str]:
+        """找出问题中提到的关键词效果和效果时机（标准写法）"""
+        aliases = self.data.get("aliases", {})
+        found = []
+        for term in TERM_PATTERN.findall(query):
+            term = canonical_term(term, aliases)
+            if term in self._terms and term not in found:
+                found.append(term)
+        for pattern, term in self._bare_terms:
+            if term not in found and pattern.search(query):
+                found.append(term)
+        return found
+
+    @staticmethod
+    def _bare_pattern(bare: str) -> re.Pattern:
+        """两个字的别名（链接、分裂、冲突）容易是普通词语的一部分，前后不能紧接其他文字"""
+        if len(bare) > 2:
+            return re.compile(re.escape(bare))
+        return re.compile(rf'(?<!\w){re.escape(bare)}(?!\w)')
+
+    def cards_with(self, term: str) -> List[str]:
+        """使用该术语的所有卡牌编号"""
+        term = canonical_term(term, self.data.get("aliases", {}))
+        return self.data["keywords"].get(term) or self.data["timings"].get(term) or []
+
+    def terms_of(self, card_no: str) -> Optional[dict]:
+        """卡牌使用的关键词效果和效果时机"""
+        return self.data["cards"].get(card_no.upper())
+
+    def rule_docs(self, term: str) -> List[dict]:
+        """术语的定义条款，格式与向量检索结果一致"""
+        return [
+            {
+                "content": section["text"],
+                "content_original": section["text"],
+                "metadata": {
+                    "title": f"综合规则 {section['rule_id']} {section['title']}",
+                    "doc_type": "rule",
+                    "rule_id": section["rule_id"],
+                    "source": "effect_index"
+                },
+                "score": 0.0,
+                "doc_type": "rule"
+            }
+            for section in self.data["rule_sections"].get(term, [])
+        ]
+
+    def example_docs(self, term: str, limit: int = 2) -> List[dict]:
+        """使用该术语的示例卡牌，格式与卡牌编号检索结果一致"""
+        from app.card_index import card_index
+
+        docs = []
+        for card_no in self.cards_with(term)[:limit]:
+            doc = card_index.card_doc(card_no, source="effect_index")
+            if doc:
+                docs.append(doc)
+        return docs
+
+
+# 单例
+effect_index = EffectIndex()
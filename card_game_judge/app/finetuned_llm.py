@@ -0,0 +1,260 @@
+"""
+微调模型（LLM_MODEL=finetuned）：进程内加载 finetune/finetune_qwen.py 合并后的模型（merge_and_save 的输出）
+
+- 模型和分词器只加载一次，由一个后台线程负责生成
+- 动态批处理：等待 FINETUNED_BATCH_WAIT_MS 毫秒收集并发请求（最多 FINETUNED_MAX_BATCH 个），
+  左侧补齐后一起预填充，之后逐 token 解码并复用 KV cache；一批全部结束后再处理下一批
+- 逐 token 流式输出：每个请求有自己的队列，解码出的文本片段立即放入
+- 贪心解码（与其他提供方的 temperature=0 一致）；没有 GPU 时在 CPU 上运行，可以用 Qwen2-1.5B 等小模型测试
+
+FinetunedChatModel 是 LangChain 聊天模型，LLMService 的 prompt | llm 链和 .stream() 可以直接使用。
+"""
+import queue
+import threading
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from app.config import (
+    FINETUNED_BATCH_WAIT_MS, FINETUNED_DEVICE, FINETUNED_MAX_BATCH,
+    FINETUNED_MAX_NEW_TOKENS, FINETUNED_MODEL_PATH
+)
+
+# 与 finetune_qwen.py 的训练模板一致（分词器没有 chat_template 时使用）
+CHATML_TURN = "<|im_start|>{role}\n{content}<|im_end|>\n"
+
+
+class _GenerationRequest:
+    """一个生成请求：解码出的文本片段依次放入 chunks 队列，结束时放入 None（出错时放入异常）"""
+
+    def __init__(self, prompt: str, max_new_tokens: int, stop: Optional[List[str]] = None):
+        self.prompt = prompt
+        self.max_new_tokens = max_new_tokens
+        self.stop = [s for s in (stop or []) if s]
+        self.tokens: List[int] = []
+        self.text = ""  # 已输出的文本
+        self._pending = ""  # 已解码（可能还未输出）的文本
+        self.done = False
+        self.chunks: queue.Queue = queue.Queue()
+
+    def add_token(self, token_id: int, tokenizer, eos_ids: set):
+        """追加一个 token，输出新增的完整字符；遇到结束符、停止词或达到长度上限时结束"""
+        if token_id in eos_ids:
+            self.finish()
+            return
+        self.tokens.append(token_id)
+        text = tokenizer.decode(self.tokens, skip_special_tokens=True)
+        stopped = False
+        for stop in self.stop:
+            index = text.find(stop)
+            if index != -1:
+                text, stopped = text[:index], True
+        self._pending = text
+        if stopped or len(self.tokens) >= self.max_new_tokens:
+            self.finish()
+            return
+        # 末尾可能是停止词的开头时先不输出
+        hold = max((k for stop in self.stop for k in range(1, len(stop)) if text.endswith(stop[:k])), default=0)
+        self._emit(text[:len(text) - hold])
+
+    def _emit(self, text: str):
+        # 末尾是不完整的多字节字符时等下一个 token
+        if not text.endswith("\ufffd") and len(text) > len(self.text):
+            self.chunks.put(text[len(self.text):])
+            self.text = text
+
+    def finish(self):
+        if not self.done:
+            self._emit(self._pending)
+            self.done = True
+            self.chunks.put(None)
+
+    def fail(self, error: Exception):
+        if not self.done:
+            self.done = True
+            self.chunks.put(error)
+
+    def __iter__(self) -> Iterator[str]:
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                return
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+class FinetunedGenerator:
+    """进程内生成服务：加载一次模型，后台线程按批处理并发请求"""
+
+    def __init__(self, model_path: str = FINETUNED_MODEL_PATH, device: str = FINETUNED_DEVICE,
+                 max_batch_size: int = FINETUNED_MAX_BATCH, batch_wait_ms: float = FINETUNED_BATCH_WAIT_MS):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+
+        self.torch = torch
+        if device == "auto":
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.device = device
+        self.max_batch_size = max(1, max_batch_size)
+        self.batch_wait = batch_wait_ms / 1000
+
+        print(f"📥 加载微调模型: {model_path} ({device})")
+        start = time.time()
+        self.tokenizer = AutoTokenizer.from_pretrained(model_path, trust_remote_code=True, padding_side="left")
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        self.model = AutoModelForCausalLM.from_pretrained(
+            model_path, trust_remote_code=True,
+            torch_dtype=torch.float16 if device.startswith("cuda") else torch.float32
+        ).to(device)
+        self.model.eval()
+
+        # 结束符：eos 和 ChatML 的 <|im_end|>
+        self.eos_ids = {self.tokenizer.eos_token_id}
+        generation_eos = getattr(self.model.generation_config, "eos_token_id", None)
+        if generation_eos is not None:
+            self.eos_ids.update(generation_eos if isinstance(generation_eos, list) else [generation_eos])
+        im_end = self.tokenizer.convert_tokens_to_ids("<|im_end|>")
+        if isinstance(im_end, int) and im_end != self.tokenizer.unk_token_id:
+            self.eos_ids.add(im_end)
+        self.eos_ids.discard(None)
+        print(f"✅ 微调模型加载完成，耗时 {time.time() - start:.1f}s")
+
+        self._requests: queue.Queue = queue.Queue()
+        self.stats = {"requests": 0, "batches": 0, "tokens": 0}
+        threading.Thread(target=self._worker, daemon=True, name="finetuned-llm").start()
+
+    def format_messages(self, messages: List[dict]) -> str:
+        """[{"role", "content"}] → 模型输入（以 assistant 开头等待生成）"""
+        if getattr(self.tokenizer, "chat_template", None):
+            return self.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        prompt = "".join(CHATML_TURN.format(**message) for message in messages)
+        return prompt + "<|im_start|>assistant\n"
+
+    def submit(self, prompt: str, max_new_tokens: int = FINETUNED_MAX_NEW_TOKENS,
+               stop: Optional[List[str]] = None) -> _GenerationRequest:
+        """提交请求，返回可迭代的请求对象（逐片段产出文本）"""
+        request = _GenerationRequest(prompt, max_new_tokens, stop)
+        self._requests.put(request)
+        return request
+
+    def generate(self, prompt: str, max_new_tokens: int = FINETUNED_MAX_NEW_TOKENS,
+                 stop: Optional[List[str]] = None) -> str:
+        return "".join(self.submit(prompt, max_new_tokens, stop))
+
+    def _next_batch(self) -> List[_GenerationRequest]:
+        """阻塞等待第一个请求，再在 batch_wait 内收集更多请求"""
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.batch_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                print(f"❌ 微调模型生成失败: {e}")
+                for request in batch:
+                    request.fail(e)
+
+    def _run_batch(self, batch: List[_GenerationRequest]):
+        torch = self.torch
+        self.stats["requests"] += len(batch)
+        self.stats["batches"] += 1
+
+        encoded = self.tokenizer([r.prompt for r in batch], return_tensors="pt", padding=True).to(self.device)
+        input_ids = encoded["input_ids"]
+        attention_mask = encoded["attention_mask"]
+        # 左侧补齐：位置从每条序列的第一个真实 token 开始计数
+        position_ids = (attention_mask.cumsum(dim=-1) - 1).clamp(min=0)
+        past_key_values = None
+        pad_id = self.tokenizer.pad_token_id
+
+        with torch.inference_mode():
+            for _ in range(max(r.max_new_tokens for r in batch)):
+                outputs = self.model(
+                    input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                    past_key_values=past_key_values, use_cache=True
+                )
+                past_key_values = outputs.past_key_values
+                next_tokens = outputs.logits[:, -1, :].argmax(dim=-1)
+
+                for request, token_id in zip(batch, next_tokens.tolist()):
+                    if not request.done:
+                        request.add_token(token_id, self.tokenizer, self.eos_ids)
+                        self.stats["tokens"] += 1
+                finished = torch.tensor([r.done for r in batch], device=self.device)
+                if bool(finished.all()):
+                    break
+
+                # 已结束的序列继续喂补齐 token（结果丢弃），保持批内形状一致
+                input_ids = next_tokens.masked_fill(finished, pad_id)[:, None]
+                attention_mask = torch.cat([attention_mask, torch.ones_like(input_ids)], dim=-1)
+                position_ids = position_ids[:, -1:] + 1
+
+        for request in batch:
+            request.finish()
+
+
+_generator: Optional[FinetunedGenerator] = None
+_generator_lock = threading.Lock()
+
+
+def get_generator() -> FinetunedGenerator:
+    """进程内共享的生成服务（首次调用时加载模型）"""
+    global _generator
+    with _generator_lock:
+        if _generator is None:
+            _generator = FinetunedGenerator()
+        return _generator
+
+
+def _to_chat_messages(messages: List[BaseMessage]) -> List[dict]:
+    roles = {SystemMessage: "system", HumanMessage: "user", AIMessage: "assistant"}
+    return [{"role": roles.get(type(m), "user"), "content": m.content} for m in messages]
+
+
+class FinetunedChatModel(BaseChatModel):
+    """LangChain 聊天模型：调用进程内的 FinetunedGenerator"""
+
+    max_new_tokens: int = FINETUNED_MAX_NEW_TOKENS
+
+    def __init__(self, **kwargs: Any):
+        super().__init__(**kwargs)
+        get_generator()  # 启动时加载模型，而不是第一次提问时
+
+    @property
+    def _llm_type(self) -> str:
+        return "dtcg-finetuned"
+
+    def _submit(self, messages: List[BaseMessage], stop: Optional[List[str]]) -> _GenerationRequest:
+        generator = get_generator()
+        prompt = generator.format_messages(_to_chat_messages(messages))
+        return generator.submit(prompt, self.max_new_tokens, stop)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        text = "".join(self._submit(messages, stop))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for piece in self._submit(messages, stop):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
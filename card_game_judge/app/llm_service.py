@@ -2,7 +2,7 @@ from langchain_openai import ChatOpenAI
 from langchain_community.llms import Ollama
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.prompts import ChatPromptTemplate
-from typing import List
+from typing import Iterator, List
 import time
 import os
 import httpx
@@ -63,6 +63,10 @@ class LLMService:
                 timeout=60,
                 max_retries=2
             )
+        elif LLM_MODEL == "finetuned":
+            # 进程内加载微调后的合并模型（依赖 torch / transformers，按需导入）
+            from app.finetuned_llm import FinetunedChatModel
+            return FinetunedChatModel()
         elif LLM_MODEL == "qwen":
             # 通义千问 - 使用 OpenAI 兼容接口
             return ChatOpenAI(
@@ -91,17 +95,14 @@ class LLMService:
             return response.content
         return str(response)
     
-    def generate_answer(self, question: str, context_docs: List[dict], log_callback=None) -> str:
-        """根据检索到的文档生成回答，带日志"""
-        def log(msg: str):
-            if log_callback:
-                log_callback(msg)
-            print(f"[LLM] {msg}")
-        
-        start_time = time.time()
-        
-        # 步骤1: 构建上下文
-        log("📝 步骤1/3: 构建上下文...")
+    def stream_answer(self, question: str, context_docs: List[dict]) -> Iterator[str]:
+        """根据检索到的文档流式生成回答，逐片段产出文本"""
+        chain = self.prompt | self.llm
+        for chunk in chain.stream({"context": self._build_context(context_docs), "question": question}):
+            yield chunk.content if hasattr(chunk, 'content') else str(chunk)
+    
+    def _build_context(self, context_docs: List[dict]) -> str:
+        """把检索到的文档拼成【规则参考】"""
         context_parts = []
         for i, doc in enumerate(context_docs, 1):
             title = doc['metadata'].get('title', '未知来源')
@@ -122,8 +123,20 @@ class LLMService:
                 f"来源：{title}（{type_label}）\n"
                 f"内容：{content}\n"
             )
+        return "\n\n".join(context_parts)
+    
+    def generate_answer(self, question: str, context_docs: List[dict], log_callback=None) -> str:
+        """根据检索到的文档生成回答，带日志"""
+        def log(msg: str):
+            if log_callback:
+                log_callback(msg)
+            print(f"[LLM] {msg}")
+        
+        start_time = time.time()
         
-        context = "\n\n".join(context_parts)
+        # 步骤1: 构建上下文
+        log("📝 步骤1/3: 构建上下文...")
+        context = self._build_context(context_docs)
         log(f"✅ 上下文构建完成，共 {len(context_docs)} 个参考文档，{len(context)} 字符")
         
         # 调试：打印实际传给 LLM 的上下文
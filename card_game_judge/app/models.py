@@ -37,6 +37,36 @@ class QueryResponse(BaseModel):
     confidence: Optional[float] = None
 
 
+class CardFilterRequest(BaseModel):
+    # 分类字段：同一字段多个取值为"或"关系，支持中日文（如 "绿" / "緑"）
+    color: Optional[List[str]] = None
+    color2: Optional[List[str]] = None
+    card_type: Optional[List[str]] = None
+    form: Optional[List[str]] = None
+    attribute: Optional[List[str]] = None
+    digimon_type: Optional[List[str]] = None
+    rarity: Optional[List[str]] = None
+    pack: Optional[List[str]] = None  # 卡包编号/ID/名称，如 "BT-24"
+    keywords: Optional[List[str]] = None  # 关键词效果，需全部满足，如 ["≪阻挡者≫"]
+    timings: Optional[List[str]] = None  # 效果时机，需全部满足，如 ["【消灭时】"]
+    # 数值区间（闭区间）
+    level_min: Optional[int] = None
+    level_max: Optional[int] = None
+    cost_min: Optional[int] = None
+    cost_max: Optional[int] = None
+    dp_min: Optional[int] = None
+    dp_max: Optional[int] = None
+    # 分页
+    page: int = 1
+    page_size: int = 20
+
+
+class CardBatchRequest(BaseModel):
+    card_numbers: List[str] = []  # 卡牌编号列表
+    deck_list: Optional[str] = None  # 卡组列表文本，每行一张，如 "4 BT1-001"
+    translate_result: bool = True
+
+
 class DocumentInfo(BaseModel):
     id: str
     title: str
@@ -0,0 +1,159 @@
+"""
+卡牌名称匹配 - 基于 Aho-Corasick 自动机的多模式匹配
+
+启动时把所有中日文卡牌名和数码宝贝名称对照表编译成一个自动机，
+对用户问题只需扫描一遍即可找出提到的所有卡牌名。
+"""
+import json
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from app.config import NAME_MAPPING_FILE
+
+# 单字名称误匹配太多，不参与匹配
+MIN_NAME_LENGTH = 2
+
+
+def normalize_name(text: str) -> str:
+    """统一全半角/大小写，去掉空白和间隔号："奥米加兽 兹瓦特" → "奥米加兽兹瓦特" """
+    text = unicodedata.normalize("NFKC", text).lower()
+    return re.sub(r'[\s・·]', '', text)
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机"""
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = patterns
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]  # 每个状态结束的模式下标
+        for pid, pattern in enumerate(patterns):
+            self._insert(pattern, pid)
+        self._build_fail()
+
+    def _insert(self, pattern: str, pid: int):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append(pid)
+
+    def _build_fail(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                # 合并失败链上的输出，匹配时无需再沿失败链回溯
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """返回所有匹配 [(起始位置, 模式下标)]，可能互相重叠"""
+        matches = []
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(ch, 0)
+            for pid in self._output[state]:
+                matches.append((i - len(self.patterns[pid]) + 1, pid))
+        return matches
+
+    def find_longest(self, text: str) -> List[int]:
+        """返回从左到右、互不重叠的最长匹配的模式下标，"战斗暴龙兽" 不会再匹配出 "暴龙兽" """
+        candidates = sorted(self.find_all(text), key=lambda m: (m[0], -len(self.patterns[m[1]])))
+        result = []
+        end = 0
+        for start, pid in candidates:
+            if start >= end:
+                result.append(pid)
+                end = start + len(self.patterns[pid])
+        return result
+
+
+class CardNameMatcher:
+    """卡牌名 → 卡牌编号（所有印刷版本）"""
+
+    def __init__(self):
+        self._names: Dict[str, Set[str]] = {}  # {标准化名称: {卡牌编号}}
+        self._display: Dict[str, str] = {}  # {标准化名称: 原始名称}
+        self.automaton = AhoCorasick([])
+
+    def add(self, name: str, card_nos):
+        key = normalize_name(name or "")
+        if len(key) < MIN_NAME_LENGTH or not card_nos:
+            return
+        self._names.setdefault(key, set()).update(card_nos)
+        self._display.setdefault(key, name.strip())
+
+    def build(self):
+        self.automaton = AhoCorasick(list(self._names))
+        return self
+
+    def match(self, query: str) -> List[dict]:
+        """
+        找出问题中提到的卡牌名
+        返回: [{"name": 名称, "card_numbers": [卡牌编号, ...]}, ...]
+        """
+        from app.card_index import natural_key
+
+        result = []
+        for pid in self.automaton.find_longest(normalize_name(query)):
+            key = self.automaton.patterns[pid]
+            result.append({
+                "name": self._display[key],
+                "card_numbers": sorted(self._names[key], key=natural_key),
+            })
+        return result
+
+    def __len__(self):
+        return len(self._names)
+
+
+def build_card_name_matcher() -> CardNameMatcher:
+    """汇总日文卡牌、中文卡牌和数码宝贝名称对照表构建匹配器"""
+    from app.card_index import card_index
+    from app.vector_store import vector_store
+
+    matcher = CardNameMatcher()
+
+    # 日文卡牌名
+    jp_names: Dict[str, Set[str]] = {}
+    for i, card in enumerate(card_index.cards):
+        name = card_index.format_card(i)["name"].strip()
+        if name:
+            jp_names.setdefault(normalize_name(name), set()).add(card["card_no"])
+            matcher.add(name, [card["card_no"]])
+
+    # 中文卡牌数据
+    for card_no, card in vector_store.cn_cards.items():
+        matcher.add(card.get("name_cn", ""), [card_no])
+        matcher.add(card.get("name_jp", ""), [card_no])
+
+    # 数码宝贝名称对照表：中文名 → 同名日文卡牌
+    mapping_file = Path(NAME_MAPPING_FILE)
+    if mapping_file.exists():
+        with open(mapping_file, 'r', encoding='utf-8') as f:
+            mapping = json.load(f)
+        for ja, zh in mapping.items():
+            card_nos = jp_names.get(normalize_name(ja))
+            if card_nos:
+                matcher.add(zh, card_nos)
+
+    print(f"✅ [卡牌名匹配] 构建完成: {len(matcher)} 个名称")
+    return matcher.build()
@@ -1,29 +1,134 @@
 import pdfplumber
 from pypdf import PdfReader
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
 from pathlib import Path
 from typing import Optional, Dict, Any, List, Union
+import hashlib
 import json
+import os
 
+from app.config import PDF_CACHE_DIR, PDF_WORKERS
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """从 PDF 提取文本，优先使用 pdfplumber（对中文支持更好）"""
-    text_parts = []
-    
+# 提取逻辑或 pdfplumber 版本变化时，旧缓存自动失效
+PDF_EXTRACTOR_VERSION = f"1-pdfplumber{pdfplumber.__version__}"
+
+# 页数不超过此值时直接在当前进程提取，避免进程池启动开销
+PDF_PARALLEL_MIN_PAGES = 8
+
+# 进程池 worker 持有的 PDF 内容（通过 initializer 传入，每个 worker 只传一次）
+_worker_pdf_content: bytes = b""
+
+
+def _init_pdf_worker(content: bytes):
+    global _worker_pdf_content
+    _worker_pdf_content = content
+
+
+def _extract_pages(content: bytes, page_numbers: List[int]) -> Dict[int, str]:
+    """
+    提取指定页的文本，优先使用 pdfplumber（对中文支持更好）
+    单页提取失败时仅该页回退到 pypdf
+    """
+    texts = {}
     try:
-        with pdfplumber.open(file_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text_parts.append(page_text)
+        pdf = pdfplumber.open(BytesIO(content))
     except Exception:
-        # 回退到 pypdf
-        reader = PdfReader(file_path)
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text_parts.append(page_text)
-    
-    return "\n\n".join(text_parts)
+        pdf = None
+    reader = None
+    try:
+        for i in page_numbers:
+            text = None
+            if pdf is not None:
+                try:
+                    text = pdf.pages[i].extract_text() or ""
+                except Exception:
+                    text = None
+            if text is None:
+                # 回退到 pypdf
+                if reader is None:
+                    reader = PdfReader(BytesIO(content))
+                try:
+                    text = reader.pages[i].extract_text() or ""
+                except Exception:
+                    text = ""
+            texts[i] = text
+    finally:
+        if pdf is not None:
+            pdf.close()
+    return texts
+
+
+def _extract_pages_in_worker(page_numbers: List[int]) -> Dict[int, str]:
+    return _extract_pages(_worker_pdf_content, page_numbers)
+
+
+def _page_cache_path(file_hash: str, page: int) -> Path:
+    """缓存键: (文件哈希, 页码, 提取器版本)"""
+    return Path(PDF_CACHE_DIR) / f"{file_hash}_{PDF_EXTRACTOR_VERSION}" / f"{page:05d}.txt"
+
+
+def _write_page_cache(file_hash: str, page: int, text: str):
+    path = _page_cache_path(file_hash, page)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ [PDF] 写入页缓存失败: {e}")
+
+
+def _page_count(content: bytes) -> int:
+    try:
+        return len(PdfReader(BytesIO(content)).pages)
+    except Exception:
+        with pdfplumber.open(BytesIO(content)) as pdf:
+            return len(pdf.pages)
+
+
+def extract_text_from_pdf_bytes(content: bytes, workers: int = PDF_WORKERS) -> str:
+    """
+    从 PDF 字节流逐页提取文本
+    已提取过的页直接读取磁盘缓存，其余页分批交给进程池并行提取
+    """
+    file_hash = hashlib.sha256(content).hexdigest()[:32]
+    page_count = _page_count(content)
+
+    texts: Dict[int, str] = {}
+    missing = []
+    for i in range(page_count):
+        cache_path = _page_cache_path(file_hash, i)
+        if cache_path.exists():
+            texts[i] = cache_path.read_text(encoding="utf-8")
+        else:
+            missing.append(i)
+
+    if missing:
+        workers = max(1, min(workers, len(missing)))
+        if workers == 1 or len(missing) <= PDF_PARALLEL_MIN_PAGES:
+            extracted = _extract_pages(content, missing)
+        else:
+            # 连续页分成若干批，每批在 worker 中只打开一次 PDF
+            batch_count = workers * 4
+            batch_size = max(1, -(-len(missing) // batch_count))
+            batches = [missing[i:i + batch_size] for i in range(0, len(missing), batch_size)]
+            extracted = {}
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker,
+                                     initargs=(content,)) as executor:
+                for result in executor.map(_extract_pages_in_worker, batches):
+                    extracted.update(result)
+        for i, text in extracted.items():
+            _write_page_cache(file_hash, i, text)
+        texts.update(extracted)
+        print(f"[PDF] 共 {page_count} 页，缓存命中 {page_count - len(missing)} 页，新提取 {len(missing)} 页")
+
+    return "\n\n".join(texts[i] for i in range(page_count) if texts[i])
+
+
+def extract_text_from_pdf(file_path: str) -> str:
+    """从 PDF 提取文本，优先使用 pdfplumber（对中文支持更好）"""
+    return extract_text_from_pdf_bytes(Path(file_path).read_bytes())
 
 
 def format_terminology_json(data: Dict[str, Any]) -> str:
@@ -177,9 +282,6 @@ def extract_text_from_json(content: bytes) -> str:
 
 def extract_text_from_bytes(content: bytes, filename: str) -> str:
     """从上传的文件字节流提取文本"""
-    import tempfile
-    import os
-    
     suffix = Path(filename).suffix.lower()
     
     # JSON 文件特殊处理
@@ -188,13 +290,7 @@ def extract_text_from_bytes(content: bytes, filename: str) -> str:
     
     # PDF 文件
     if suffix == ".pdf":
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp:
-            tmp.write(content)
-            tmp_path = tmp.name
-        try:
-            return extract_text_from_pdf(tmp_path)
-        finally:
-            os.unlink(tmp_path)
+        return extract_text_from_pdf_bytes(content)
     
     # TXT 和其他文本文件
     return content.decode("utf-8")
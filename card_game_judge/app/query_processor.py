@@ -4,6 +4,8 @@
 import re
 from typing import List, Tuple, Dict
 
+from app.config import MAX_CARDS_PER_NAME
+
 
 class QueryProcessor:
     """处理用户查询，提取卡牌编号、数码宝贝名称等关键信息"""
@@ -21,23 +23,78 @@ class QueryProcessor:
     # 等级相关
     LEVEL_PATTERN = re.compile(r'(?:Lv\.?|等级|レベル)\s*(\d+)', re.IGNORECASE)
     
+    def __init__(self):
+        from app.name_matcher import build_card_name_matcher
+        # 启动时构建中日文卡牌名自动机
+        self.name_matcher = build_card_name_matcher()
+    
+    # 卡组列表中的张数：4 BT1-001 / BT1-001 x4 / 4x BT1-001 / BT1-001 アグモン ×4
+    QUANTITY_PATTERN = re.compile(r'(?:[x×*]\s*(\d{1,2})\b|\b(\d{1,2})\s*[x×*]|(?:^|\s)(\d{1,2})(?=\s|$))', re.IGNORECASE)
+    
+    def normalize_card_number(self, card_no: str) -> str:
+        """标准化卡牌编号：大写，确保有连字符"""
+        m = card_no.upper()
+        # 标准化为 XX00-000 格式
+        # 处理 BT20079 -> BT20-079
+        if re.match(r'^(BT|ST|EX|RB|LM)(\d{1,2})(\d{2,3})$', m):
+            match = re.match(r'^(BT|ST|EX|RB|LM)(\d{1,2})(\d{2,3})$', m)
+            m = f"{match.group(1)}{match.group(2)}-{match.group(3)}"
+        # 处理 BT-20-079 -> BT20-079
+        m = re.sub(r'^(BT|ST|EX|RB|LM)-(\d)', r'\1\2', m)
+        return m
+    
     def extract_card_numbers(self, query: str) -> List[str]:
         """提取查询中的所有卡牌编号"""
         matches = self.CARD_NO_PATTERN.findall(query)
-        # 标准化格式：大写，确保有连字符
-        result = []
-        for m in matches:
-            m = m.upper()
-            # 标准化为 XX00-000 格式
-            # 处理 BT20079 -> BT20-079
-            if re.match(r'^(BT|ST|EX|RB|LM)(\d{1,2})(\d{2,3})$', m):
-                match = re.match(r'^(BT|ST|EX|RB|LM)(\d{1,2})(\d{2,3})$', m)
-                m = f"{match.group(1)}{match.group(2)}-{match.group(3)}"
-            # 处理 BT-20-079 -> BT20-079
-            m = re.sub(r'^(BT|ST|EX|RB|LM)-(\d)', r'\1\2', m)
-            result.append(m)
+        return [self.normalize_card_number(m) for m in matches]
+    
+    def parse_deck_list(self, text: str) -> List[Tuple[str, int]]:
+        """
+        解析卡组列表文本，每行一张卡，支持 "4 BT1-001"、"BT1-001 x4"、"BT1-001 アグモン 4" 等写法
+        同一行有多个编号时每个编号计 1 张；重复出现的编号张数累加
+        返回: [(卡牌编号, 张数), ...]，保持首次出现的顺序
+        """
+        counts: Dict[str, int] = {}
+        for line in text.splitlines():
+            card_numbers = self.extract_card_numbers(line)
+            if not card_numbers:
+                continue
+            quantity = 1
+            if len(card_numbers) == 1:
+                rest = self.CARD_NO_PATTERN.sub(" ", line)
+                match = self.QUANTITY_PATTERN.search(rest)
+                if match:
+                    quantity = int(next(g for g in match.groups() if g))
+            for card_no in card_numbers:
+                counts[card_no] = counts.get(card_no, 0) + quantity
+        return list(counts.items())
+    
+    def extract_card_names(self, query: str) -> List[Dict]:
+        """
+        提取查询中提到的卡牌名（中日文），一次扫描完成
+        返回: [{"name": 名称, "card_numbers": [所有印刷版本的卡牌编号]}, ...]
+        """
+        return self.name_matcher.match(query)
+    
+    def resolve_card_numbers(self, query: str, max_per_name: int = MAX_CARDS_PER_NAME) -> List[str]:
+        """卡牌编号 + 卡牌名解析出的编号（去重，编号在前）"""
+        result = self.extract_card_numbers(query)
+        for hit in self.extract_card_names(query):
+            for card_no in hit["card_numbers"][:max_per_name]:
+                if card_no not in result:
+                    result.append(card_no)
         return result
     
+    def extract_effect_terms(self, query: str) -> List[str]:
+        """提取查询中提到的关键词效果和效果时机（如 ≪阻挡者≫、【消灭时】）"""
+        from app.effect_index import effect_index
+        return effect_index.find_terms(query)
+    
+    def extract_rule_refs(self, query: str) -> List[str]:
+        """提取查询中直接引用的规则条款编号（如 规则5-2、第16章、「游戏准备」）"""
+        from app.rule_index import rule_index
+        return rule_index.find_rule_ids(query)
+    
     def extract_memory_values(self, query: str) -> List[int]:
         """提取内存值"""
         matches = self.MEMORY_PATTERN.findall(query)
@@ -53,6 +110,9 @@ class QueryProcessor:
         return {
             "original_query": query,
             "card_numbers": self.extract_card_numbers(query),
+            "card_names": self.extract_card_names(query),
+            "effect_terms": self.extract_effect_terms(query),
+            "rule_refs": self.extract_rule_refs(query),
             "memory_values": self.extract_memory_values(query),
             "levels": self.extract_levels(query),
         }
@@ -63,10 +123,9 @@ class QueryProcessor:
         返回: [(查询文本, 查询类型), ...]
         """
         queries = []
-        analysis = self.analyze_query(query)
         
-        # 1. 添加卡牌编号的精确查询
-        for card_no in analysis["card_numbers"]:
+        # 1. 添加卡牌编号的精确查询（含卡牌名解析出的编号）
+        for card_no in self.resolve_card_numbers(query):
             queries.append((card_no, "card"))
         
         # 2. 添加原始查询（用于规则检索）
@@ -0,0 +1,119 @@
+"""
+综合规则条款索引
+
+问题中直接引用条款编号（"规则5-3"、"5-3-2"、"第5章"）或带引号的章节标题（"「游戏准备」"）时，
+直接按编号取出条款及其子条款，无需向量检索。
+"""
+import re
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.config import RULE_CHUNK_SIZE, RULEBOOK_TEXT_FILE
+from app.rulebook_parser import clause_block, format_clauses, parse_rulebook, rule_key
+
+# 条款编号：规则5-3 / ルール5-3-2 / 第5-3条 / 5-3-2
+# 两级编号（5-3）需要前缀，避免把"费用3-5的卡"之类的数值范围当作条款；三级及以上的编号单独出现也算
+# （不匹配卡牌编号 BT1-001 及日期 2025-12-25 中的片段）
+PREFIXED_RULE_REF_PATTERN = re.compile(r'(?:规则|規則|ルール|条款|条|第)\s*(\d{1,2}(?:-\d{1,2})+)(?![\d\-/])')
+RULE_REF_PATTERN = re.compile(r'(?<![A-Za-z0-9\-/])(\d{1,2}(?:-\d{1,2}){2,})(?![\d\-/])')
+
+# 章：第5章 / 第五章
+CHAPTER_REF_PATTERN = re.compile(r'第\s*(\d{1,2}|[一二三四五六七八九十]+)\s*章')
+
+# 引号中的标题：「游戏准备」 “阻挡” 『成立确认』
+QUOTED_PATTERN = re.compile(r'[「『“"《]([^」』”"》]{2,20})[」』”"》]')
+
+CHINESE_NUMERALS = {"一": 1, "二": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9, "十": 10}
+
+
+def _chinese_to_int(text: str) -> int:
+    """一 ~ 九十九"""
+    if text.isdigit():
+        return int(text)
+    if "十" not in text:
+        return CHINESE_NUMERALS.get(text, 0)
+    tens, _, ones = text.partition("十")
+    return CHINESE_NUMERALS.get(tens, 1) * 10 + CHINESE_NUMERALS.get(ones, 0)
+
+
+def _normalize_title(title: str) -> str:
+    return re.sub(r'\s', '', unicodedata.normalize("NFKC", title))
+
+
+class RuleIndex:
+    """条款编号 / 章节标题 → 条款"""
+
+    def __init__(self, rulebook_file: str = RULEBOOK_TEXT_FILE):
+        path = Path(rulebook_file)
+        self.clauses = parse_rulebook(path.read_text(encoding='utf-8')) if path.exists() else []
+        self._positions: Dict[str, int] = {}
+        self._titles: Dict[str, str] = {}  # {标准化标题: 条款编号}，只收录章、节标题
+        for i, clause in enumerate(self.clauses):
+            rule_id = clause["rule_id"]
+            self._positions.setdefault(rule_id, i)
+            if rule_id.count("-") <= 1 and "。" not in clause["title"]:
+                self._titles.setdefault(_normalize_title(clause["title"]), rule_id)
+        if self.clauses:
+            print(f"✅ [规则索引] 加载完成: {len(self.clauses)} 个条款")
+
+    def get(self, rule_id: str) -> Optional[dict]:
+        pos = self._positions.get(rule_id)
+        return self.clauses[pos] if pos is not None else None
+
+    def find_rule_ids(self, query: str) -> List[str]:
+        """找出问题中引用的条款编号（只保留规则书中存在的）"""
+        found = []
+
+        def add(rule_id: Optional[str]):
+            if rule_id and rule_id in self._positions and rule_id not in found:
+                found.append(rule_id)
+
+        query = unicodedata.normalize("NFKC", query)
+        for match in CHAPTER_REF_PATTERN.finditer(query):
+            add(str(_chinese_to_int(match.group(1))))
+        for pattern in (PREFIXED_RULE_REF_PATTERN, RULE_REF_PATTERN):
+            for match in pattern.finditer(query):
+                add(match.group(1))
+        for match in QUOTED_PATTERN.finditer(query):
+            add(self._titles.get(_normalize_title(match.group(1))))
+        return found
+
+    def rule_text(self, rule_id: str) -> str:
+        """
+        条款及其子条款的全文
+        超过 RULE_CHUNK_SIZE 时（如整章）只列出直属子条款的标题
+        """
+        pos = self._positions.get(rule_id)
+        if pos is None:
+            return ""
+        block = clause_block(self.clauses, pos)
+        text = format_clauses(block)
+        if len(text) <= RULE_CHUNK_SIZE:
+            return text
+        depth = len(rule_key(rule_id))
+        return format_clauses([c for c in block if len(rule_key(c["rule_id"])) <= depth + 1])
+
+    def rule_docs(self, rule_id: str) -> List[dict]:
+        """条款文档，格式与向量检索结果一致"""
+        clause = self.get(rule_id)
+        if not clause:
+            return []
+        text = self.rule_text(rule_id)
+        return [{
+            "content": text,
+            "content_original": text,
+            "metadata": {
+                "title": f"综合规则 {rule_id} {clause['title'][:30]}",
+                "doc_type": "rule",
+                "rule_id": rule_id,
+                "chapter": clause["chapter"],
+                "source": "rule_index"
+            },
+            "score": 0.0,
+            "doc_type": "rule"
+        }]
+
+
+# 单例
+rule_index = RuleIndex()
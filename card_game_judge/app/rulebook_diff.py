@@ -0,0 +1,233 @@
+"""
+规则书新旧版本对比
+
+新版日文规则书与上一版逐条对齐，只有新增或修改的部分需要重新翻译：
+- 条款模式：两版都能按条款编号解析时（见 rulebook_parser.is_structured），按编号对齐；
+  编号变化但正文不变的条款（前面插入了新条款）按正文对齐，沿用旧译文
+- 段落模式：PDF 提取结果无法按条款解析时，按段落做序列比对（difflib）；
+  旧版日文段落与上一版中文译文按段落中的数字序列（条款编号、数值，翻译时保持不变）对齐，
+  未变化的段落沿用对应的旧译文
+
+translation/retranslate_rulebook.py 使用。
+"""
+import difflib
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from app.rulebook_parser import is_structured, parse_rulebook
+from app.translation_memory import normalize_source
+
+UNCHANGED = "unchanged"
+RENUMBERED = "renumbered"
+MODIFIED = "modified"
+ADDED = "added"
+REMOVED = "removed"
+
+STATUS_LABELS = {
+    UNCHANGED: "未变化",
+    RENUMBERED: "仅编号变化",
+    MODIFIED: "修改",
+    ADDED: "新增",
+    REMOVED: "删除",
+}
+
+# 段落结束：句末标点
+PARAGRAPH_END_PATTERN = re.compile(r'[。！？!?：:]$')
+DIGITS_PATTERN = re.compile(r'\d+')
+
+
+def split_paragraphs(text: str) -> List[str]:
+    """按空行及句末标点把 PDF 提取的折行文本合并为段落"""
+    paragraphs, current = [], []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            current.append(line)
+        if current and (not line or PARAGRAPH_END_PATTERN.search(line)):
+            paragraphs.append("".join(current))
+            current = []
+    if current:
+        paragraphs.append("".join(current))
+    return paragraphs
+
+
+def segment_rulebook(text: str, mode: Optional[str] = None) -> List[dict]:
+    """
+    切分为待对齐的片段: [{"key", "rule_id", "text"}, ...]
+    条款模式下 key 为条款编号、text 为编号后的正文；段落模式下 key 为 "p序号"
+    """
+    if mode != "paragraph":
+        clauses = parse_rulebook(text)
+        if mode == "rule" or is_structured(clauses):
+            return [{"key": c["rule_id"], "rule_id": c["rule_id"], "text": c["title"]} for c in clauses]
+    return [{"key": f"p{i}", "rule_id": "", "text": p} for i, p in enumerate(split_paragraphs(text))]
+
+
+def detect_mode(old_text: str, new_text: str) -> str:
+    """两版都能按条款解析时用条款模式"""
+    return "rule" if all(is_structured(parse_rulebook(t)) for t in (old_text, new_text)) else "paragraph"
+
+
+def _diff_rules(old: List[dict], new: List[dict]) -> List[dict]:
+    old_by_id = {s["key"]: s for s in old}
+    # 正文 → 旧编号（正文重复的条款，如 "删除。"，不参与按正文对齐）
+    counts = Counter(normalize_source(s["text"]) for s in old)
+    old_by_text = {normalize_source(s["text"]): s for s in old if counts[normalize_source(s["text"])] == 1}
+
+    changes, matched = [], set()
+    for segment in new:
+        text = normalize_source(segment["text"])
+        previous = old_by_id.get(segment["key"])
+        if previous and normalize_source(previous["text"]) == text:
+            status = UNCHANGED
+        elif text in old_by_text:
+            # 编号重复的条款（提取错误）按正文对齐到同一编号时仍视为未变化
+            previous = old_by_text[text]
+            status = UNCHANGED if previous["key"] == segment["key"] else RENUMBERED
+        elif previous:
+            status = MODIFIED
+        else:
+            status = ADDED
+        if previous:
+            matched.add(previous["key"])
+        changes.append({**segment, "status": status, "old_key": previous["key"] if previous else "",
+                        "old_text": previous["text"] if previous else ""})
+
+    changes.extend({"key": s["key"], "rule_id": s["rule_id"], "text": "", "status": REMOVED,
+                    "old_key": s["key"], "old_text": s["text"]}
+                   for s in old if s["key"] not in matched)
+    return changes
+
+
+def _diff_paragraphs(old: List[dict], new: List[dict]) -> List[dict]:
+    matcher = difflib.SequenceMatcher(
+        None, [normalize_source(s["text"]) for s in old], [normalize_source(s["text"]) for s in new],
+        autojunk=False
+    )
+    changes = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            changes.extend({**n, "status": UNCHANGED, "old_key": o["key"], "old_text": o["text"]}
+                           for o, n in zip(old[i1:i2], new[j1:j2]))
+            continue
+        olds, news = old[i1:i2], new[j1:j2]
+        # 替换块：一一对应的部分记为修改，多出的记为新增/删除
+        for k, n in enumerate(news):
+            o = olds[k] if k < len(olds) else None
+            changes.append({**n, "status": MODIFIED if o else ADDED,
+                            "old_key": o["key"] if o else "", "old_text": o["text"] if o else ""})
+        changes.extend({"key": o["key"], "rule_id": "", "text": "", "status": REMOVED,
+                        "old_key": o["key"], "old_text": o["text"]}
+                       for o in olds[len(news):])
+    return changes
+
+
+def diff_rulebooks(old_text: str, new_text: str, mode: Optional[str] = None) -> Dict:
+    """
+    对比新旧两版日文规则书
+
+    Returns:
+        {"mode": "rule" | "paragraph",
+         "changes": [{"key", "rule_id", "text", "status", "old_key", "old_text"}, ...]}
+        changes 按新版顺序排列，删除的片段附在最后
+    """
+    mode = mode or detect_mode(old_text, new_text)
+    old, new = segment_rulebook(old_text, mode), segment_rulebook(new_text, mode)
+    changes = _diff_rules(old, new) if mode == "rule" else _diff_paragraphs(old, new)
+    return {"mode": mode, "changes": changes}
+
+
+def _digit_signature(text: str) -> tuple:
+    return tuple(DIGITS_PATTERN.findall(normalize_source(text)))
+
+
+def _run_lengths(signatures: List[tuple]) -> List[int]:
+    """每个段落所在的连续无数字段落的长度（有数字的段落为 0）"""
+    lengths, start = [0] * len(signatures), 0
+    for i in range(len(signatures) + 1):
+        if i == len(signatures) or signatures[i]:
+            for k in range(start, i):
+                lengths[k] = i - start
+            start = i + 1
+    return lengths
+
+
+def align_paragraphs(source: List[str], translated: List[str]) -> Dict[int, int]:
+    """
+    原文段落与译文段落对齐: {原文序号: 译文序号}
+    按每段的数字序列做序列比对，只采用完全一致的区块；不含数字的段落还要求
+    所在的连续无数字段落数相同，避免前后错位
+    """
+    src, dst = [_digit_signature(t) for t in source], [_digit_signature(t) for t in translated]
+    src_runs, dst_runs = _run_lengths(src), _run_lengths(dst)
+    matcher = difflib.SequenceMatcher(None, src, dst, autojunk=False)
+    aligned = {}
+    for block in matcher.get_matching_blocks():
+        for k in range(block.size):
+            i, j = block.a + k, block.b + k
+            if src[i] or src_runs[i] == dst_runs[j]:
+                aligned[i] = j
+    return aligned
+
+
+def previous_translations(old_text: str, old_translation: str, mode: str) -> Dict[str, str]:
+    """
+    上一版译文按旧版片段 key 索引: {旧版 key: 译文}
+    条款模式按条款编号，段落模式按 align_paragraphs 对齐
+    """
+    if not old_translation:
+        return {}
+    if mode == "rule":
+        return {c["rule_id"]: c["title"] for c in parse_rulebook(old_translation)}
+    translated = split_paragraphs(old_translation)
+    aligned = align_paragraphs(split_paragraphs(old_text), translated)
+    return {f"p{i}": translated[j] for i, j in aligned.items()}
+
+
+def change_summary(changes: List[dict]) -> Dict[str, int]:
+    counts = Counter(c["status"] for c in changes)
+    return {status: counts.get(status, 0) for status in STATUS_LABELS}
+
+
+def format_change_report(diff: Dict, translations: Dict[str, str], sent: int, reused: int,
+                         max_chars: int = 200) -> str:
+    """
+    Markdown 变更报告：统计 + 每个新增/修改/删除片段的新旧原文及新译文
+    sent 为实际交给 LLM 的片段数，reused 为沿用上一版译文的片段数
+    """
+    changes = diff["changes"]
+    summary = change_summary(changes)
+    total = sum(1 for c in changes if c["status"] != REMOVED)
+
+    def clip(text: str) -> str:
+        return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+    lines = [
+        "# 规则书版本变更报告",
+        "",
+        f"- 对齐方式: {'按条款编号' if diff['mode'] == 'rule' else '按段落'}",
+        f"- 新版片段: {total}，沿用译文 {reused}，重新翻译 {sent}（{sent / max(total, 1):.1%}）",
+    ]
+    lines.extend(f"- {STATUS_LABELS[status]}: {count}" for status, count in summary.items())
+    missing = sum(1 for c in changes if c["status"] != REMOVED and c["key"] not in translations)
+    if missing:
+        lines.append(f"- 无译文（保留日文原文）: {missing}")
+
+    for status in (ADDED, MODIFIED, RENUMBERED, REMOVED):
+        items = [c for c in changes if c["status"] == status]
+        if not items:
+            continue
+        lines.extend(["", f"## {STATUS_LABELS[status]}（{len(items)}）"])
+        for c in items:
+            label = c["rule_id"] or c["key"]
+            if status == RENUMBERED:
+                lines.append(f"- {c['old_key']} → {c['key']}")
+                continue
+            lines.extend(["", f"### {label}"])
+            if c["old_text"]:
+                lines.append(f"- 旧版: {clip(c['old_text'])}")
+            if c["text"]:
+                lines.append(f"- 新版: {clip(c['text'])}")
+                lines.append(f"- 译文: {clip(translations.get(c['key'], '（翻译失败）'))}")
+    return "\n".join(lines) + "\n"
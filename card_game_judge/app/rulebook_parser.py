@@ -0,0 +1,144 @@
+"""
+综合规则结构化解析
+
+综合规则按条款编号组织（章 "5." → 节 "5-3." → 条款 "5-3-2." …），
+按编号解析出条款树，并以"节"为单位切分文档，保证一个条款不会被拆到两个分块中。
+"""
+import re
+from typing import Dict, List, Tuple
+
+# 规则条款行：16-4. ≪阻挡者≫ / 15-16-4-1. 【消灭时】效果是…
+RULE_LINE_PATTERN = re.compile(r'^(\d+(?:-\d+)*)\.\s*(.*)$')
+
+# 目录行：1. 游戏概要 ........ 1
+TOC_LINE_PATTERN = re.compile(r'\.{4,}|…{2,}')
+
+# 正文结束：其后的更新履历中 "4-3-2.已更新。" 之类的行不是条款
+END_MARKERS = ("更新履历", "更新履歴")
+
+# 条款正文中混入另一条款的编号，说明原文是双栏排版、按行提取后已错乱
+EMBEDDED_RULE_PATTERN = re.compile(r'\s\d+(?:-\d+)+\.\s')
+
+
+def rule_key(rule_id: str) -> Tuple[int, ...]:
+    """条款编号排序键："5-3-10" → (5, 3, 10)"""
+    return tuple(int(part) for part in rule_id.split("-"))
+
+
+def parse_rulebook(text: str) -> List[dict]:
+    """
+    按条款编号解析规则书
+    返回: [{"rule_id", "title", "chapter", "parent"}, ...]，按原文顺序；title 为编号后的全部正文
+    """
+    clauses = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or TOC_LINE_PATTERN.search(line):
+            continue
+        if line in END_MARKERS and clauses:
+            break
+        match = RULE_LINE_PATTERN.match(line)
+        if match:
+            rule_id = match.group(1)
+            clauses.append({
+                "rule_id": rule_id,
+                "title": match.group(2),
+                "chapter": rule_id.split("-")[0],
+                "parent": rule_id.rsplit("-", 1)[0] if "-" in rule_id else "",
+            })
+        elif clauses:
+            # 跨行的条款正文
+            clauses[-1]["title"] += line
+    return clauses
+
+
+def is_structured(clauses: List[dict], min_clauses: int = 20) -> bool:
+    """文本能否按条款编号切分（条款足够多，且不是双栏排版错乱的提取结果）"""
+    if len(clauses) < min_clauses:
+        return False
+    garbled = sum(1 for c in clauses if EMBEDDED_RULE_PATTERN.search(" " + c["title"]))
+    return garbled <= len(clauses) * 0.05
+
+
+def chapter_titles(clauses: List[dict]) -> Dict[str, str]:
+    """{章编号: 章标题}，如 {"5": "游戏准备"}"""
+    return {c["rule_id"]: c["title"] for c in clauses if c["rule_id"] == c["chapter"]}
+
+
+def clause_block(clauses: List[dict], index: int) -> List[dict]:
+    """条款及其下所有子条款（clauses 按原文顺序）"""
+    rule_id = clauses[index]["rule_id"]
+    block = [clauses[index]]
+    for clause in clauses[index + 1:]:
+        if not clause["rule_id"].startswith(rule_id + "-"):
+            break
+        block.append(clause)
+    return block
+
+
+def format_clauses(clauses: List[dict]) -> str:
+    return "\n".join(f"{c['rule_id']}. {c['title']}" for c in clauses)
+
+
+def chunk_rulebook(text: str, max_chars: int = 1500) -> List[dict]:
+    """
+    以节（"5-3."）为单位切分规则书，返回 [{"content", "rule_id", "rule_ids", "chapter", "chapter_title", "section_title"}]
+
+    - 同一章中相邻的短小节合并到一个分块，直到接近 max_chars
+    - 超过 max_chars 的节在子条款边界处拆分，每个分块都带上节标题
+    文本不是按条款编号排版时返回空列表，由调用方回退到普通切分
+    """
+    clauses = parse_rulebook(text)
+    if not is_structured(clauses):
+        return []
+    chapters = chapter_titles(clauses)
+
+    # 1. 每节一个候选分块，超长的节按子条款拆分
+    pieces = []  # [(chapter, rule_id, section_title, content)]
+    i = 0
+    while i < len(clauses):
+        clause = clauses[i]
+        if clause["rule_id"] == clause["chapter"]:
+            i += 1
+            continue
+        section = clause_block(clauses, i)
+        i += len(section)
+        content = format_clauses(section)
+        if len(content) <= max_chars:
+            pieces.append((clause["chapter"], clause["rule_id"], clause["title"], content))
+            continue
+
+        heading = format_clauses(section[:1])
+        part: List[dict] = []
+        j = 1
+        while j < len(section):
+            block = clause_block(section, j)
+            j += len(block)
+            if part and len(heading) + len(format_clauses(part + block)) > max_chars:
+                pieces.append((clause["chapter"], clause["rule_id"], clause["title"],
+                               heading + "\n" + format_clauses(part)))
+                part = []
+            part.extend(block)
+        if part or len(section) == 1:
+            pieces.append((clause["chapter"], clause["rule_id"], clause["title"],
+                           heading + ("\n" + format_clauses(part) if part else "")))
+
+    # 2. 合并同一章中相邻的短小节
+    chunks = []
+    for chapter, rule_id, section_title, content in pieces:
+        last = chunks[-1] if chunks else None
+        if (last and last["chapter"] == chapter
+                and len(last["content"]) + len(content) + 1 <= max_chars):
+            last["content"] += "\n" + content
+            if rule_id not in last["rule_ids"]:
+                last["rule_ids"].append(rule_id)
+            continue
+        chunks.append({
+            "content": content,
+            "rule_id": rule_id,
+            "rule_ids": [rule_id],
+            "chapter": chapter,
+            "chapter_title": chapters.get(chapter, ""),
+            "section_title": section_title,
+        })
+    return chunks
@@ -0,0 +1,105 @@
+"""
+规则书分块并发翻译
+
+translation/ 下的三个规则书翻译脚本共用：
+- 各分块在限流下并发翻译（TranslationEngine），翻译记忆库命中的分块不占用请求配额
+- 每完成一块按 "序号-原文版本" 追加到断点文件，中断后重新运行只翻译未完成的分块
+- 按序号重新拼接；失败的分块保留原文并标记，重新运行时重试
+- 从旧版中文规则书提取的术语参考缓存在单独的 JSON 文件（cached_terminology），
+  重新运行时术语参考不变，分块译文的记忆库键也不变
+"""
+import json
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from app.config import TERMINOLOGY_CACHE_FILE, TRANSLATION_CONCURRENCY
+from app.translation_engine import TranslationEngine
+from app.translation_memory import TranslationMemory, text_version
+
+
+def chunk_key(index: int, chunk: str) -> str:
+    """断点键：分块内容变化（如新版规则书）后旧的译文不再使用"""
+    return f"{index:04d}-{text_version(chunk)}"
+
+
+def cached_terminology(source: str, request_fn: Callable[[str], str], prompt_version: str,
+                       cache_file: str = TERMINOLOGY_CACHE_FILE) -> str:
+    """提取术语参考：按 (提示词版本, 参考文本) 缓存，未命中时调用 request_fn(source)"""
+    key = text_version(prompt_version, source)
+    path = Path(cache_file)
+    cache = json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
+    if key in cache:
+        return cache[key]
+    cache[key] = request_fn(source)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(cache, ensure_ascii=False, indent=2), encoding='utf-8')
+    return cache[key]
+
+
+def failed_chunk_text(index: int, chunk: str) -> str:
+    return f"[翻译失败 - Chunk {index + 1}]\n{chunk}"
+
+
+class RulebookTranslationRunner:
+    """
+    用法:
+        runner = RulebookTranslationRunner(
+            lambda text: self._request_translation(text, terminology_ref),
+            memory=self._memory(terminology_ref),
+            rpm=TRANSLATION_RPM["openai"],
+            checkpoint=Path(output_path).with_suffix('.chunks.jsonl'),
+        )
+        translated_chunks, failed = runner.translate(chunks)
+    """
+
+    def __init__(
+        self,
+        request_fn: Callable[[str], str],
+        memory: Optional[TranslationMemory] = None,
+        rpm: float = 60,
+        concurrency: int = TRANSLATION_CONCURRENCY,
+        checkpoint=None,
+    ):
+        """
+        Args:
+            request_fn: 翻译一个分块的同步函数（在线程中执行），出错时抛出异常
+            memory: 分块级翻译记忆库（按整块缓存，不按句切分）
+            checkpoint: 断点文件路径，None 时不保存进度
+        """
+        self.request_fn = request_fn
+        self.memory = memory
+        self.engine = TranslationEngine(rpm=rpm, concurrency=concurrency)
+        self.checkpoint = Path(checkpoint) if checkpoint else None
+
+    async def _translate_chunk(self, chunk: str) -> str:
+        if self.memory is None:
+            return await self.engine.call(self.request_fn, chunk)
+        return await self.memory.translate_async(
+            chunk, lambda text: self.engine.call(self.request_fn, text), segment=False
+        )
+
+    def translate(self, chunks: List[str]) -> Tuple[List[str], List[int]]:
+        """
+        Returns:
+            (按原顺序的译文列表, 失败的分块序号)
+        """
+        keys = [chunk_key(i, chunk) for i, chunk in enumerate(chunks)]
+        print(f"并发: {self.engine.concurrency}, 限流: {self.engine.rpm:g} 次/分钟, 共 {len(chunks)} 块")
+
+        results, failures = self.engine.run(
+            zip(keys, chunks), self._translate_chunk, checkpoint=self.checkpoint, progress_every=5
+        )
+
+        translated, failed = [], []
+        for i, (key, chunk) in enumerate(zip(keys, chunks)):
+            if key in results:
+                translated.append(results[key])
+            else:
+                failed.append(i)
+                translated.append(failed_chunk_text(i, chunk))
+
+        if self.memory is not None:
+            print(f"✓ {self.memory.summary()}, LLM 请求 {self.engine.request_count} 次")
+        if failed:
+            print(f"⚠️ {len(failed)} 块翻译失败（已保留原文），重新运行即可只重试这些分块")
+        return translated, failed
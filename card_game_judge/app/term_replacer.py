@@ -0,0 +1,37 @@
+"""
+术语表单次扫描替换
+
+多张术语表合并编译成一个正则（按长度降序的备选分支），从左到右一次扫描、
+最长匹配优先完成全部替换，替换结果不会被后面的词条再次替换。
+卡牌翻译、QA 本地翻译共用。
+"""
+import re
+from typing import Dict, Optional
+
+
+class TermReplacer:
+    """
+    用法:
+        replacer = TermReplacer(KEYWORD_EFFECT_MAPPING, EFFECT_TIMING_MAPPING, GAME_TERM_MAPPING)
+        replacer.replace("【登場時】メモリー+1")
+    """
+
+    def __init__(self, *tables: Dict[str, str]):
+        """同一词条出现在多张表中时，以靠前的表为准"""
+        self.terms: Dict[str, str] = {}
+        for table in tables:
+            for source, target in table.items():
+                if source and target is not None:
+                    self.terms.setdefault(source, target)
+        self._pattern: Optional[re.Pattern] = None
+        if self.terms:
+            alternatives = sorted(self.terms, key=len, reverse=True)
+            self._pattern = re.compile("|".join(map(re.escape, alternatives)))
+
+    def replace(self, text: str) -> str:
+        if not text or self._pattern is None:
+            return text
+        return self._pattern.sub(lambda m: self.terms[m.group(0)], text)
+
+    def __len__(self):
+        return len(self.terms)
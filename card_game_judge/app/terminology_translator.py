@@ -2,6 +2,7 @@
 术语翻译器 - 支持中日双向翻译
 用于查询时将中文转日文，返回时将日文转中文
 """
+import hashlib
 import json
 import re
 from pathlib import Path
@@ -12,35 +13,44 @@ class TerminologyTranslator:
     def __init__(self):
         self.zh_to_ja: Dict[str, str] = {}  # 中文 → 日文
         self.ja_to_zh: Dict[str, str] = {}  # 日文 → 中文
+        # 术语表版本：已加载文件内容的哈希，入库时预存的译文以此判断是否过期
+        self.version = ""
         self._load_terminology()
+        # 按长度降序排序，优先匹配长词（只排序一次）
+        self._sorted_zh_terms = sorted(self.zh_to_ja.keys(), key=len, reverse=True)
+        self._sorted_ja_terms = sorted(self.ja_to_zh.keys(), key=len, reverse=True)
     
     def _load_terminology(self):
         """加载术语对照表"""
         base_dir = Path(__file__).parent.parent.parent
+        digest = hashlib.md5()
         
         # 加载术语对照表
         terminology_file = base_dir / "digimon_data" / "dtcg_terminology.json"
         if terminology_file.exists():
-            with open(terminology_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for category, terms in data.items():
-                    if isinstance(terms, dict):
-                        for ja, zh in terms.items():
-                            if ja and zh:
-                                self.ja_to_zh[ja] = zh
-                                self.zh_to_ja[zh] = ja
+            raw = terminology_file.read_bytes()
+            digest.update(raw)
+            data = json.loads(raw.decode('utf-8'))
+            for category, terms in data.items():
+                if isinstance(terms, dict):
+                    for ja, zh in terms.items():
+                        if ja and zh:
+                            self.ja_to_zh[ja] = zh
+                            self.zh_to_ja[zh] = ja
         
         # 加载数码宝贝名称对照表
         name_file = base_dir / "digimon_data" / "digimon_name_mapping.json"
         if name_file.exists():
-            with open(name_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                for ja, zh in data.items():
-                    if ja and zh:
-                        self.ja_to_zh[ja] = zh
-                        self.zh_to_ja[zh] = ja
+            raw = name_file.read_bytes()
+            digest.update(raw)
+            data = json.loads(raw.decode('utf-8'))
+            for ja, zh in data.items():
+                if ja and zh:
+                    self.ja_to_zh[ja] = zh
+                    self.zh_to_ja[zh] = ja
         
-        print(f"[术语翻译器] 加载完成: {len(self.zh_to_ja)} 条中→日, {len(self.ja_to_zh)} 条日→中")
+        self.version = digest.hexdigest()[:12]
+        print(f"[术语翻译器] 加载完成: {len(self.zh_to_ja)} 条中→日, {len(self.ja_to_zh)} 条日→中 (版本 {self.version})")
     
     def translate_query_to_japanese(self, query: str) -> Tuple[str, list]:
         """
@@ -50,10 +60,7 @@ class TerminologyTranslator:
         translated = query
         translations = []
         
-        # 按长度降序排序，优先匹配长词
-        sorted_terms = sorted(self.zh_to_ja.keys(), key=len, reverse=True)
-        
-        for zh_term in sorted_terms:
+        for zh_term in self._sorted_zh_terms:
             if zh_term in translated:
                 ja_term = self.zh_to_ja[zh_term]
                 translated = translated.replace(zh_term, ja_term)
@@ -65,10 +72,7 @@ class TerminologyTranslator:
         """将结果中的日文术语转换为中文"""
         translated = text
         
-        # 按长度降序排序，优先匹配长词
-        sorted_terms = sorted(self.ja_to_zh.keys(), key=len, reverse=True)
-        
-        for ja_term in sorted_terms:
+        for ja_term in self._sorted_ja_terms:
             if ja_term in translated:
                 zh_term = self.ja_to_zh[ja_term]
                 translated = translated.replace(ja_term, zh_term)
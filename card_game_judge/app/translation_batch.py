@@ -0,0 +1,215 @@
+"""
+多条文本合并翻译
+
+卡牌效果、问答等短文本逐条请求时，大部分 token 花在重复的提示词上。这里把多条文本
+（如 20 条卡牌效果、多个问答的问题和回答）打包为一个 JSON 数组，一次请求翻译，
+要求模型按 id 返回 JSON 数组：
+- 解析失败、缺失或为空的条目拆成更小的批次重试，成功的条目不重复翻译
+- 调用方逐条 await translate()，短时间内提交的文本自动合并为一批
+- 相同的文本（及参考信息）只翻译一次；配合翻译记忆库时按 (原文, 参考信息) 先查库、译完写回
+"""
+import asyncio
+import json
+import re
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import TRANSLATION_BATCH_CHARS, TRANSLATION_BATCH_ITEMS
+
+BATCH_OUTPUT_INSTRUCTIONS = """
+待翻译的内容是一个 JSON 数组，每项的 "text" 为待翻译文本，"context" 为可选的参考信息（不需要翻译）：
+{items}
+
+请逐项翻译 "text"，只输出一个 JSON 数组，格式为：
+[{{"id": "原样保留的 id", "translation": "译文"}}, ...]
+要求：每个 id 输出且只输出一次，不要合并或拆分条目，不要输出 JSON 以外的任何内容。"""
+
+# ```json ... ``` 代码块
+CODE_FENCE_PATTERN = re.compile(r'```(?:json)?\s*(.*?)```', re.DOTALL)
+
+
+def build_batch_prompt(instructions: str, items: List[Tuple[str, str, str]]) -> str:
+    """items: [(id, 原文, 参考信息)]"""
+    payload = []
+    for item_id, text, context in items:
+        entry = {"id": item_id, "text": text}
+        if context:
+            entry["context"] = context
+        payload.append(entry)
+    return instructions.rstrip() + "\n" + BATCH_OUTPUT_INSTRUCTIONS.format(
+        items=json.dumps(payload, ensure_ascii=False, indent=1)
+    )
+
+
+def parse_batch_response(response: str, expected_ids: Iterable[str]) -> Dict[str, str]:
+    """
+    解析模型返回的 JSON 数组，只保留预期 id 且译文非空的条目
+    兼容代码块包裹、数组前后带说明文字、{id: 译文} 形式的对象
+    """
+    text = response or ""
+    fence = CODE_FENCE_PATTERN.search(text)
+    if fence:
+        text = fence.group(1)
+    start = min([i for i in (text.find("["), text.find("{")) if i >= 0], default=-1)
+    end = max(text.rfind("]"), text.rfind("}"))
+    if start < 0 or end < start:
+        return {}
+    try:
+        data = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+
+    if isinstance(data, dict):
+        entries = [{"id": k, "translation": v} for k, v in data.items()]
+    elif isinstance(data, list):
+        entries = [e for e in data if isinstance(e, dict)]
+    else:
+        return {}
+
+    expected = set(expected_ids)
+    results = {}
+    for entry in entries:
+        item_id = str(entry.get("id", ""))
+        translation = entry.get("translation")
+        if item_id in expected and isinstance(translation, str) and translation.strip():
+            results.setdefault(item_id, translation.strip())
+    return results
+
+
+class BatchTranslator:
+    """
+    用法:
+        engine = TranslationEngine(rpm=15)
+        batcher = BatchTranslator(lambda prompt: engine.call(model_generate, prompt), INSTRUCTIONS)
+
+        # 并发提交，自动合并为多条一批的请求
+        translations = await asyncio.gather(*(batcher.translate(t) for t in texts))
+    """
+
+    def __init__(
+        self,
+        request_fn: Callable[[str], Awaitable[str]],
+        instructions: str,
+        memory=None,
+        max_items: int = TRANSLATION_BATCH_ITEMS,
+        max_chars: int = TRANSLATION_BATCH_CHARS,
+        max_attempts: int = 3,
+        max_wait: float = 0.05,
+    ):
+        """
+        Args:
+            request_fn: 发送提示词、返回模型输出的协程函数（限流/配额重试由调用方负责，如 engine.call）
+            instructions: 翻译要求（术语表等），输出格式要求由本模块追加
+            memory: 可选的 TranslationMemory
+            max_attempts: 每条文本最多参与几次请求，失败的条目每次拆成一半大小的批次
+            max_wait: 凑批等待时间（秒），未凑满 max_items 时到时即发送
+        """
+        self.request_fn = request_fn
+        self.instructions = instructions
+        self.memory = memory
+        self.max_items = max(1, max_items)
+        self.max_chars = max_chars
+        self.max_attempts = max(1, max_attempts)
+        self.max_wait = max_wait
+        self.request_count = 0
+        self.item_count = 0
+        self.retry_count = 0
+
+        self._pending: List[Tuple[str, str, asyncio.Future]] = []
+        self._pending_chars = 0
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+    async def translate(self, text: str, context: str = "") -> str:
+        """翻译一条文本；多次重试仍失败时抛出 RuntimeError"""
+        if not text or not text.strip():
+            return text
+        if self.memory is not None:
+            cached = self.memory.lookup(text, context)
+            if cached is not None:
+                return cached
+
+        key = (text, context)
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._inflight[key] = future
+            self._enqueue(text, context, future)
+        try:
+            return await asyncio.shield(future)
+        finally:
+            self._inflight.pop(key, None)
+
+    async def translate_many(self, texts: Iterable[str], context: str = "") -> Dict[str, str]:
+        """批量翻译，返回 {原文: 译文}，失败的文本不在结果中"""
+        unique = list(dict.fromkeys(t for t in texts if t and t.strip()))
+        results = await asyncio.gather(*(self.translate(t, context) for t in unique), return_exceptions=True)
+        return {t: r for t, r in zip(unique, results) if isinstance(r, str)}
+
+    def summary(self) -> str:
+        return (f"合并翻译: {self.item_count} 条文本, 请求 {self.request_count} 次 "
+                f"(重试 {self.retry_count} 次)")
+
+    def _enqueue(self, text: str, context: str, future: asyncio.Future):
+        self._pending.append((text, context, future))
+        self._pending_chars += len(text) + len(context)
+        if len(self._pending) >= self.max_items or self._pending_chars >= self.max_chars:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._pending:
+            batch, chars = [], 0
+            while self._pending and len(batch) < self.max_items:
+                size = len(self._pending[0][0]) + len(self._pending[0][1])
+                if batch and chars + size > self.max_chars:
+                    break
+                batch.append(self._pending.pop(0))
+                chars += size
+            self._spawn(self._send(batch, attempt=1))
+        self._pending_chars = 0
+
+    def _spawn(self, coro):
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: List[Tuple[str, str, asyncio.Future]], attempt: int):
+        ids = [str(i) for i in range(1, len(batch) + 1)]
+        prompt = build_batch_prompt(self.instructions, [(i, t, c) for i, (t, c, _) in zip(ids, batch)])
+        self.request_count += 1
+        try:
+            translations = parse_batch_response(await self.request_fn(prompt), ids)
+            error = None
+        except Exception as e:
+            translations, error = {}, e
+
+        failed = []
+        for item_id, (text, context, future) in zip(ids, batch):
+            if item_id in translations:
+                self.item_count += 1
+                if self.memory is not None:
+                    self.memory.store(text, translations[item_id], context=context)
+                if not future.done():
+                    future.set_result(translations[item_id])
+            else:
+                failed.append((text, context, future))
+        if not failed:
+            return
+
+        if attempt >= self.max_attempts:
+            reason = error or "返回结果中缺少该条目或格式错误"
+            for text, _, future in failed:
+                if not future.done():
+                    future.set_exception(RuntimeError(f"合并翻译失败: {reason}"))
+            return
+
+        # 只重试失败的条目，每次拆成一半大小
+        self.retry_count += 1
+        size = max(1, (len(failed) + 1) // 2)
+        await asyncio.gather(*(self._send(failed[i:i + size], attempt + 1)
+                               for i in range(0, len(failed), size)))
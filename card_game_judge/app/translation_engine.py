@@ -0,0 +1,206 @@
+"""
+并发、限流的 LLM 批量翻译引擎
+
+- 令牌桶限流：按提供方的每分钟请求数发放请求，遇到配额错误时整体暂停
+- 并发：最多 N 个请求同时进行，LLM SDK 的同步调用放到线程中执行
+- 重试：配额/限流错误按指数退避重试（优先使用服务端给出的等待时间）
+- 断点：每完成一条追加写入一行 JSONL，续传时跳过已完成的条目
+"""
+import asyncio
+import json
+import random
+import re
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+# 配额/限流错误的特征（google.api_core.exceptions.ResourceExhausted、openai.RateLimitError 等）
+QUOTA_ERROR_PATTERN = re.compile(
+    r'429|quota|rate.?limit|resource.?exhausted|too many requests|overloaded|503', re.IGNORECASE
+)
+
+# 服务端建议的等待时间："retry_delay { seconds: 17 }" / "Please retry in 17.5s"
+RETRY_DELAY_PATTERN = re.compile(
+    r'retry_delay\s*\{\s*seconds:\s*(\d+)|retry (?:in|after) (\d+(?:\.\d+)?)\s*s', re.IGNORECASE
+)
+
+
+def is_quota_error(error: Exception) -> bool:
+    return bool(QUOTA_ERROR_PATTERN.search(f"{type(error).__name__} {error}"))
+
+
+def suggested_retry_delay(error: Exception) -> Optional[float]:
+    match = RETRY_DELAY_PATTERN.search(str(error))
+    return float(match.group(1) or match.group(2)) if match else None
+
+
+class TokenBucket:
+    """令牌桶：平均每分钟 rpm 个请求，最多允许 burst 个突发"""
+
+    def __init__(self, rpm: float, burst: Optional[float] = None):
+        self.rate = rpm / 60.0
+        self.capacity = burst if burst is not None else max(1.0, min(rpm / 10.0, 10.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def pause(self, seconds: float):
+        """配额耗尽时暂停发放，所有等待中的请求一起推迟"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    self._updated = time.monotonic()
+                    continue
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class JsonlCheckpoint:
+    """追加写入的断点文件，每行 {"key": ..., "result": ...}"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = None
+
+    def load(self) -> Dict[str, Any]:
+        done: Dict[str, Any] = {}
+        if not self.path.exists():
+            return done
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断时写了一半的最后一行
+                    continue
+                done[str(record["key"])] = record["result"]
+        return done
+
+    def append(self, key: str, result: Any):
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(self.path, 'a', encoding='utf-8')
+        self._file.write(json.dumps({"key": key, "result": result}, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class TranslationEngine:
+    """
+    用法:
+        engine = TranslationEngine(rpm=15, concurrency=8)
+
+        async def handle(item):
+            return await engine.call(model.generate_content, prompt)
+
+        results, failures = engine.run(items, handle, checkpoint="out.jsonl")
+    """
+
+    def __init__(self, rpm: float, concurrency: int = 8, max_retries: int = 5, base_delay: float = 2.0):
+        self.rpm = rpm
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.request_count = 0
+        # asyncio 对象需在事件循环中创建，见 _setup
+        self._bucket: Optional[TokenBucket] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _setup(self):
+        self._loop = asyncio.get_running_loop()
+        self._bucket = TokenBucket(self.rpm)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def call(self, fn: Callable, *args, **kwargs):
+        """限流执行一次 LLM 请求，配额错误时退避重试，其他错误直接抛出"""
+        if self._bucket is None or self._loop is not asyncio.get_running_loop():
+            self._setup()
+        for attempt in range(self.max_retries + 1):
+            await self._bucket.acquire()
+            try:
+                async with self._semaphore:
+                    self.request_count += 1
+                    if asyncio.iscoroutinefunction(fn):
+                        return await fn(*args, **kwargs)
+                    return await asyncio.to_thread(fn, *args, **kwargs)
+            except Exception as e:
+                if not is_quota_error(e) or attempt == self.max_retries:
+                    raise
+                delay = suggested_retry_delay(e) or self.base_delay * (2 ** attempt)
+                delay += random.uniform(0, 1)
+                print(f"⏳ 触发限流，{delay:.1f} 秒后重试 ({attempt + 1}/{self.max_retries})")
+                self._bucket.pause(delay)
+
+    async def run_async(
+        self,
+        items: Iterable[Tuple[str, Any]],
+        handler: Callable[[Any], Awaitable[Any]],
+        checkpoint=None,
+        progress_every: int = 10,
+    ) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        """
+        并发处理所有条目
+
+        Args:
+            items: [(唯一键, 条目)]
+            handler: 处理单个条目的协程，返回值需可 JSON 序列化
+            checkpoint: 断点文件路径，已完成的条目直接取出、不再处理
+
+        Returns:
+            (成功结果 {键: 结果}, 失败 {键: 异常})
+        """
+        self._setup()
+        log = JsonlCheckpoint(checkpoint) if checkpoint else None
+        results = log.load() if log else {}
+        pending = [(str(key), item) for key, item in items if str(key) not in results]
+        if results:
+            print(f"✓ 断点续传: 已完成 {len(results)} 条，剩余 {len(pending)} 条")
+
+        failures: Dict[str, Exception] = {}
+        finished = 0
+        started = time.monotonic()
+
+        async def process(key: str, item: Any):
+            nonlocal finished
+            try:
+                result = await handler(item)
+            except Exception as e:
+                failures[key] = e
+                print(f"✗ [{key}] 失败: {e}")
+                return
+            results[key] = result
+            if log:
+                log.append(key, result)
+            finished += 1
+            if finished % progress_every == 0 or finished == len(pending):
+                elapsed = time.monotonic() - started
+                print(f"[{finished}/{len(pending)}] 已完成, "
+                      f"{finished / elapsed * 60:.1f} 条/分钟, 请求 {self.request_count} 次")
+
+        try:
+            await asyncio.gather(*(process(key, item) for key, item in pending))
+        finally:
+            if log:
+                log.close()
+        return results, failures
+
+    def run(self, items, handler, checkpoint=None, progress_every: int = 10):
+        return asyncio.run(self.run_async(items, handler, checkpoint, progress_every))
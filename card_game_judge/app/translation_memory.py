@@ -0,0 +1,235 @@
+"""
+翻译记忆库（SQLite）
+
+各翻译工具在调用 LLM 前先查记忆库，翻译后写回。键由以下部分组成：
+标准化原文 + 语言对 + 提示词版本 + 术语表版本（+ 参考信息），提示词或术语表变化后自动失效。
+提示词中带参考信息（如问答涉及的卡牌）时传入 context，相同原文在不同参考信息下分别缓存。
+
+多句文本按句切分：整段未命中时，若半数以上的句子已有译文，只翻译缺失的句子再拼接；
+整段翻译的结果如果能与原文逐句对齐，也按句写入，供以后部分重复的文本复用。
+"""
+import asyncio
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.config import TRANSLATION_MEMORY_DB
+
+# 句末标点之后切分（保留标点）
+SENTENCE_END_PATTERN = re.compile(r'(?<=[。！？!?])')
+
+
+def normalize_source(text: str) -> str:
+    """统一全半角和空白，作为查询键"""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r'[ \t　]+', ' ', text).strip()
+
+
+def text_version(*parts: str) -> str:
+    """提示词/术语表等内容的版本号"""
+    return hashlib.md5("\x00".join(parts).encode('utf-8')).hexdigest()[:12]
+
+
+def file_version(*paths) -> str:
+    """术语表文件的版本号（文件不存在时忽略）"""
+    md5 = hashlib.md5()
+    for path in paths:
+        p = Path(path)
+        if p.exists():
+            md5.update(p.read_bytes())
+    return md5.hexdigest()[:12]
+
+
+def split_segments(text: str) -> List[List[str]]:
+    """按行、再按句切分：[[第1行的句子...], [第2行的句子...]]"""
+    return [[s for s in SENTENCE_END_PATTERN.split(line) if s] for line in text.split("\n")]
+
+
+def join_segments(lines: List[List[str]]) -> str:
+    return "\n".join("".join(sentences) for sentences in lines)
+
+
+class TranslationMemory:
+    def __init__(
+        self,
+        prompt_version: str,
+        terminology_version: str = "",
+        src_lang: str = "ja",
+        tgt_lang: str = "zh",
+        db_path: str = TRANSLATION_MEMORY_DB,
+        reuse_ratio: float = 0.5,
+    ):
+        """
+        Args:
+            prompt_version: 提示词版本（各工具自行定义，修改提示词时更新）
+            terminology_version: 术语表版本，见 file_version / text_version
+            reuse_ratio: 已有译文的句子达到该比例时，只翻译缺失的句子
+        """
+        self.prompt_version = prompt_version
+        self.terminology_version = terminology_version
+        self.src_lang = src_lang
+        self.tgt_lang = tgt_lang
+        self.reuse_ratio = reuse_ratio
+        self.hits = 0
+        self.segment_hits = 0
+        self.misses = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        # 引擎在线程中执行请求，连接需跨线程使用
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS translation_memory (
+                    key TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    target TEXT NOT NULL,
+                    src_lang TEXT,
+                    tgt_lang TEXT,
+                    prompt_version TEXT,
+                    terminology_version TEXT,
+                    created_at TEXT
+                )
+            """)
+            self._conn.commit()
+
+    def _key(self, normalized: str, context: str = "") -> str:
+        parts = [self.src_lang, self.tgt_lang, self.prompt_version, self.terminology_version, normalized]
+        if context:
+            parts.append(normalize_source(context))
+        return hashlib.sha1("\x00".join(parts).encode('utf-8')).hexdigest()
+
+    def get(self, text: str, context: str = "") -> Optional[str]:
+        normalized = normalize_source(text)
+        if not normalized:
+            return text
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT target FROM translation_memory WHERE key = ?", (self._key(normalized, context),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, text: str, translation: str, context: str = ""):
+        self.put_many([(text, translation)], context)
+
+    def put_many(self, pairs, context: str = ""):
+        rows = []
+        now = datetime.now().isoformat()
+        for text, translation in pairs:
+            normalized = normalize_source(text)
+            if normalized and translation:
+                rows.append((self._key(normalized, context), normalized, translation, self.src_lang,
+                             self.tgt_lang, self.prompt_version, self.terminology_version, now))
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO translation_memory VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def _plan(self, text: str, segment: bool = True, context: str = ""):
+        """
+        查询记忆库，返回 (整段译文, 待翻译的句子, 已有的句子译文)
+        - 整段命中或所有句子命中: (译文, [], {})
+        - 部分命中且达到 reuse_ratio: (None, [缺失的句子], {句子: 译文})
+        - 其他: (None, None, {})，整段翻译
+        """
+        cached = self.get(text, context)
+        if cached is not None:
+            self.hits += 1
+            return cached, [], {}
+        lines = split_segments(text)
+        sentences = [s for line in lines for s in line if s.strip()]
+        if not segment or len(sentences) <= 1:
+            self.misses += 1
+            return None, None, {}
+        lookup = {s: self.get(s, context) for s in dict.fromkeys(sentences)}
+        found = {s: t for s, t in lookup.items() if t is not None}
+        missing = [s for s, t in lookup.items() if t is None]
+        if not missing:
+            self.segment_hits += 1
+            return self._assemble(lines, found), [], {}
+        if len(missing) <= len(lookup) * (1 - self.reuse_ratio):
+            self.segment_hits += 1
+            return None, missing, found
+        self.misses += 1
+        return None, None, {}
+
+    def lookup(self, text: str, context: str = "") -> Optional[str]:
+        """整段命中或所有句子都有译文时返回译文，否则返回 None（不调用 LLM）"""
+        cached, missing, _ = self._plan(text, context=context)
+        return cached
+
+    def _assemble(self, lines: List[List[str]], translations: Dict[str, str]) -> str:
+        return join_segments([[translations.get(s, s) for s in line] for line in lines])
+
+    def store(self, text: str, translation: str, segments: Optional[Dict[str, str]] = None,
+              segment: bool = True, context: str = ""):
+        """写入整段译文；segments 为按句翻译的结果，未提供时尝试按句对齐"""
+        pairs = [(text, translation)]
+        if segments:
+            pairs.extend(segments.items())
+        elif segment:
+            # 整段翻译：逐行逐句数目一致时按句对齐写入
+            src_lines, tgt_lines = split_segments(text), split_segments(translation)
+            if [len(l) for l in src_lines] == [len(l) for l in tgt_lines]:
+                for src_line, tgt_line in zip(src_lines, tgt_lines):
+                    pairs.extend(zip(src_line, tgt_line))
+        self.put_many(pairs, context)
+
+    def translate(self, text: str, translate_fn: Callable[[str], str], segment: bool = True,
+                  context: str = "") -> str:
+        """
+        先查记忆库，未命中的部分调用 translate_fn 翻译并写回；translate_fn 出错时直接抛出，不写入
+        segment=False 时只按整段缓存（如 PDF 提取的大段文本，按句拆开翻译会损失上下文）
+        context 为提示词中的参考信息，参与记忆库的键
+        """
+        if not text or not text.strip():
+            return text
+        cached, missing, found = self._plan(text, segment, context)
+        if cached is not None:
+            return cached
+        if missing is None:
+            translation = translate_fn(text)
+            self.store(text, translation, segment=segment, context=context)
+            return translation
+        segments = {s: translate_fn(s) for s in missing}
+        translation = self._assemble(split_segments(text), {**found, **segments})
+        self.store(text, translation, segments, context=context)
+        return translation
+
+    async def translate_async(
+        self, text: str, translate_fn: Callable[[str], Awaitable[str]], segment: bool = True,
+        context: str = ""
+    ) -> str:
+        """translate 的协程版本，translate_fn 为协程函数"""
+        if not text or not text.strip():
+            return text
+        cached, missing, found = self._plan(text, segment, context)
+        if cached is not None:
+            return cached
+        if missing is None:
+            translation = await translate_fn(text)
+            self.store(text, translation, segment=segment, context=context)
+            return translation
+        results = await asyncio.gather(*(translate_fn(s) for s in missing))
+        segments = dict(zip(missing, results))
+        translation = self._assemble(split_segments(text), {**found, **segments})
+        self.store(text, translation, segments, context=context)
+        return translation
+
+    def summary(self) -> str:
+        total = self.hits + self.segment_hits + self.misses
+        return (f"翻译记忆: 整段命中 {self.hits}, 按句复用 {self.segment_hits}, "
+                f"未命中 {self.misses} (共 {total} 段)")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -28,9 +28,13 @@ from datetime import datetime
 
 from app.config import (
     CHROMA_PERSIST_DIR, EMBEDDING_MODEL, OPENAI_API_KEY,
-    CHUNK_SIZE, CHUNK_OVERLAP
+    CHUNK_SIZE, CHUNK_OVERLAP, RULE_CHUNK_SIZE
 )
 from app.models import DocumentType, DocumentMetadata
+from app.rulebook_parser import chunk_rulebook
+
+# 入库时预存的术语翻译字段（元数据中），返回结果时剔除
+TRANSLATION_FIELDS = ("content_zh", "terminology_version")
 
 # 中文卡牌数据路径
 CN_CARDS_FILE = Path(__file__).parent.parent.parent / "digimon_card_data_chiness" / "digimon_cards_cn.json"
@@ -67,6 +71,11 @@ class VectorStoreManager:
         else:
             print(f"❌ [卡牌数据] 中文卡牌文件不存在: {CN_CARDS_FILE}")
     
+    @property
+    def cn_cards(self) -> Dict[str, dict]:
+        """全部中文卡牌数据 {card_no: card_data}"""
+        return self._cn_cards
+    
     def get_cn_card(self, card_no: str) -> Optional[dict]:
         """获取中文卡牌数据"""
         return self._cn_cards.get(card_no.upper())
@@ -132,12 +141,14 @@ class VectorStoreManager:
         doc_id = self._generate_doc_id(content, metadata.title)
         
         # 切分文档
-        chunks = self.text_splitter.split_text(content)
+        chunks, rule_metas = self._split_document(content, metadata.doc_type)
         
-        # 准备元数据
+        # 准备元数据（预先计算术语翻译，查询时直接使用）
         metadatas = []
         for i, chunk in enumerate(chunks):
             metadatas.append({
+                **rule_metas[i],
+                **self._translate_chunk(chunk),
                 "doc_id": doc_id,
                 "title": metadata.title,
                 "doc_type": metadata.doc_type.value,
@@ -167,6 +178,71 @@ class VectorStoreManager:
             "collection": collection_name
         }
     
+    def _split_document(self, content: str, doc_type: DocumentType) -> tuple:
+        """
+        切分文档，返回 (分块列表, 每个分块的附加元数据)
+        规则手册按条款编号切分（一个条款不会跨分块），并记录条款编号和所属章节；
+        无法识别条款结构的文本（如双栏排版的 PDF）仍按字数切分
+        """
+        if doc_type == DocumentType.RULE:
+            rule_chunks = chunk_rulebook(content, max_chars=RULE_CHUNK_SIZE)
+            if rule_chunks:
+                print(f"[入库] 按规则条款切分: {len(rule_chunks)} 个分块")
+                return (
+                    [c["content"] for c in rule_chunks],
+                    [{
+                        "rule_id": c["rule_id"],
+                        "rule_ids": ",".join(c["rule_ids"]),
+                        "chapter": c["chapter"],
+                        "chapter_title": c["chapter_title"],
+                        "section_title": c["section_title"],
+                    } for c in rule_chunks]
+                )
+        chunks = self.text_splitter.split_text(content)
+        return chunks, [{} for _ in chunks]
+
+    def _translate_chunk(self, chunk: str) -> dict:
+        """入库时预存的术语翻译，按术语表版本标记"""
+        from app.terminology_translator import terminology_translator
+        return {
+            "content_zh": terminology_translator.translate_result_to_chinese(chunk),
+            "terminology_version": terminology_translator.version
+        }
+    
+    @staticmethod
+    def _strip_translation(metadata: dict) -> dict:
+        return {k: v for k, v in metadata.items() if k not in TRANSLATION_FIELDS}
+    
+    def _resolve_translation(self, content: str, metadata: dict, stale: list) -> tuple:
+        """
+        取出预存的中文译文，返回 (译文, 不含译文字段的元数据)
+        没有预存译文或术语表已更新时重新翻译，并记入 stale 等待回写
+        """
+        from app.terminology_translator import terminology_translator
+        
+        clean_meta = self._strip_translation(metadata)
+        if metadata.get("terminology_version") == terminology_translator.version and "content_zh" in metadata:
+            return metadata["content_zh"], clean_meta
+        
+        translation = self._translate_chunk(content)
+        if metadata.get("doc_id") and metadata.get("chunk_index") is not None:
+            chunk_id = f"{metadata['doc_id']}_{metadata['chunk_index']}"
+            stale.append((chunk_id, {**clean_meta, **translation}))
+        return translation["content_zh"], clean_meta
+    
+    def _write_back_translations(self, collection_name: str, stale: list):
+        """把重新翻译的结果写回向量库，之后的查询无需再翻译"""
+        if not stale:
+            return
+        try:
+            collection = self.client.get_collection(collection_name)
+            collection.update(
+                ids=[chunk_id for chunk_id, _ in stale],
+                metadatas=[meta for _, meta in stale]
+            )
+        except Exception as e:
+            print(f"[翻译缓存] 回写失败 {collection_name}: {e}")
+    
     def search(
         self, 
         query: str, 
@@ -185,8 +261,6 @@ class VectorStoreManager:
             translate_query: 是否将中文查询扩展为中日双语（已废弃，默认False）
             translate_result: 是否将返回结果中的日文术语翻译为中文
         """
-        from app.terminology_translator import terminology_translator
-        
         if doc_types is None:
             doc_types = list(DocumentType)
         
@@ -203,19 +277,22 @@ class VectorStoreManager:
                     persist_directory=CHROMA_PERSIST_DIR
                 )
                 results = vectorstore.similarity_search_with_score(search_query, k=top_k)
+                stale = []
                 for doc, score in results:
-                    content = doc.page_content
-                    # 将返回结果中的日文术语翻译为中文
+                    # 将返回结果中的日文术语翻译为中文（使用入库时预存的译文）
                     if translate_result:
-                        content = terminology_translator.translate_result_to_chinese(content)
+                        content, metadata = self._resolve_translation(doc.page_content, doc.metadata, stale)
+                    else:
+                        content, metadata = doc.page_content, self._strip_translation(doc.metadata)
                     
                     all_results.append({
                         "content": content,
                         "content_original": doc.page_content,  # 保留原始内容
-                        "metadata": doc.metadata,
+                        "metadata": metadata,
                         "score": float(score),
                         "doc_type": doc_type.value
                     })
+                self._write_back_translations(collection_name, stale)
             except Exception:
                 continue
         
@@ -223,65 +300,106 @@ class VectorStoreManager:
         all_results.sort(key=lambda x: x["score"])
         return all_results[:top_k]
     
+    def _cn_card_result(self, cn_card: dict) -> dict:
+        content = self.format_cn_card(cn_card)
+        return {
+            "content": content,
+            "content_original": content,
+            "metadata": {
+                "title": f"{cn_card.get('card_no', '')} {cn_card.get('name_cn', '')}",
+                "doc_type": "card",
+                "card_no": cn_card.get('card_no', ''),
+                "source": "cn_cards"
+            },
+            "score": 0.0,  # 精确匹配
+            "doc_type": "card"
+        }
+    
     def search_by_card_number(self, card_no: str, translate_result: bool = True) -> List[dict]:
         """
         通过卡牌编号精确搜索
         优先从中文卡牌数据中查找
         """
-        results = []
-        card_no_upper = card_no.upper()
+        return self.search_by_card_numbers([card_no], translate_result).get(card_no.upper(), [])
+    
+    def search_by_card_numbers(self, card_nos: List[str], translate_result: bool = True) -> Dict[str, List[dict]]:
+        """
+        批量通过卡牌编号精确搜索
+        优先使用中文卡牌数据；中文数据中没有的编号取日文卡牌索引的卡牌文档，
+        并在向量库中一起扫描一遍，附上提到该编号的规则/裁定/判例（每个编号最多 3 条）
         
-        print(f"[卡牌搜索] 搜索卡牌: {card_no_upper}")
+        Returns:
+            {卡牌编号(大写): [结果, ...]}，未找到的编号对应空列表
+        """
+        from app.card_index import card_index
         
-        # 优先从中文卡牌数据中查找
-        cn_card = self.get_cn_card(card_no_upper)
-        if cn_card:
-            content = self.format_cn_card(cn_card)
-            results.append({
-                "content": content,
-                "content_original": content,
-                "metadata": {
-                    "title": f"{cn_card.get('card_no', '')} {cn_card.get('name_cn', '')}",
-                    "doc_type": "card",
-                    "card_no": cn_card.get('card_no', ''),
-                    "source": "cn_cards"
-                },
-                "score": 0.0,  # 精确匹配
-                "doc_type": "card"
-            })
-            print(f"[卡牌搜索] 从中文数据找到: {card_no_upper} - {cn_card.get('name_cn', '')}")
-            return results
+        results: Dict[str, List[dict]] = {}
+        pending = []
+        for card_no in card_nos:
+            card_no_upper = card_no.upper()
+            if card_no_upper in results:
+                continue
+            
+            # 优先从中文卡牌数据中查找
+            cn_card = self.get_cn_card(card_no_upper)
+            if cn_card:
+                results[card_no_upper] = [self._cn_card_result(cn_card)]
+                continue
+            
+            # 其次从日文卡牌索引中查找，再与向量库的结果合并
+            doc = card_index.card_doc(card_no_upper, translate_result=translate_result)
+            results[card_no_upper] = [doc] if doc else []
+            pending.append(card_no_upper)
         
-        # 如果中文数据没有，回退到向量库搜索
-        print(f"[卡牌搜索] 中文数据未找到 {card_no_upper}，尝试向量库...")
-        from app.terminology_translator import terminology_translator
+        # 向量库：每个集合只读取一次，同时匹配所有剩余编号
+        if pending:
+            print(f"[卡牌搜索] 中文数据未找到 {pending}，扫描向量库...")
+            scanned: Dict[str, List[dict]] = {card_no_upper: [] for card_no_upper in pending}
+            for doc_type in DocumentType:
+                self._scan_collection_for_cards(doc_type, pending, scanned, translate_result)
+            for card_no_upper in pending:
+                results[card_no_upper].extend(scanned[card_no_upper][:3])
         
-        for doc_type in DocumentType:
-            collection_name = self._get_collection_name(doc_type)
-            try:
-                collection = self.client.get_collection(collection_name)
-                all_docs = collection.get(include=["documents", "metadatas"])
-                for i, doc in enumerate(all_docs["documents"]):
-                    if card_no_upper in doc[:300]:
-                        content = doc
-                        if translate_result:
-                            content = terminology_translator.translate_result_to_chinese(content)
-                        
-                        results.append({
-                            "content": content,
-                            "content_original": doc,
-                            "metadata": all_docs["metadatas"][i],
-                            "score": 0.0,
-                            "doc_type": doc_type.value
-                        })
-                        print(f"[卡牌搜索] 从向量库找到: {card_no_upper}")
-                        break
-            except Exception as e:
-                print(f"[卡牌搜索] 向量库搜索错误: {e}")
-                continue
+        found = sum(1 for docs in results.values() if docs)
+        print(f"[卡牌搜索] 批量检索 {len(results)} 个编号，找到 {found} 个")
+        return results
+    
+    def _scan_collection_for_cards(
+        self,
+        doc_type: DocumentType,
+        card_nos: List[str],
+        results: Dict[str, List[dict]],
+        translate_result: bool
+    ):
+        """遍历一个集合，每个编号取第一条开头包含该编号的文档"""
+        collection_name = self._get_collection_name(doc_type)
+        try:
+            collection = self.client.get_collection(collection_name)
+            all_docs = collection.get(include=["documents", "metadatas"])
+        except Exception as e:
+            print(f"[卡牌搜索] 向量库搜索错误: {e}")
+            return
         
-        print(f"[卡牌搜索] {card_no_upper} 共找到 {len(results)} 条结果")
-        return results[:3]
+        remaining = set(card_nos)
+        stale = []
+        for doc, meta in zip(all_docs["documents"], all_docs["metadatas"]):
+            head = doc[:300]
+            for card_no in [c for c in remaining if c in head]:
+                remaining.discard(card_no)
+                if translate_result:
+                    content, metadata = self._resolve_translation(doc, meta, stale)
+                else:
+                    content, metadata = doc, self._strip_translation(meta)
+                results[card_no].append({
+                    "content": content,
+                    "content_original": doc,
+                    "metadata": metadata,
+                    "score": 0.0,
+                    "doc_type": doc_type.value
+                })
+            if not remaining:
+                break
+        self._write_back_translations(collection_name, stale)
     
     def delete_document(self, doc_id: str, doc_type: DocumentType) -> bool:
         """删除指定文档"""
@@ -297,6 +415,18 @@ class VectorStoreManager:
             pass
         return False
     
+    def delete_by_source(self, source: str, doc_type: DocumentType) -> int:
+        """删除来源文件为 source 的所有分块（文件更新后重新导入前调用），返回删除的分块数"""
+        collection_name = self._get_collection_name(doc_type)
+        try:
+            collection = self.client.get_collection(collection_name)
+            results = collection.get(where={"source": source})
+            if results["ids"]:
+                collection.delete(ids=results["ids"])
+            return len(results["ids"])
+        except Exception:
+            return 0
+    
     def list_documents(self, doc_type: Optional[DocumentType] = None) -> List[dict]:
         """列出所有文档"""
         doc_types = [doc_type] if doc_type else list(DocumentType)
@@ -337,7 +467,7 @@ class VectorStoreManager:
                     chunks.append({
                         "chunk_index": meta.get("chunk_index", i),
                         "content": doc_content,
-                        "metadata": meta
+                        "metadata": self._strip_translation(meta)
                     })
             except Exception:
                 continue
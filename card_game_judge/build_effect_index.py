@@ -0,0 +1,48 @@
+"""
+构建关键词效果/效果时机倒排索引
+解析所有卡牌的效果/继承效果/安防效果文本，以及规则书中各术语的定义条款
+
+用法:
+  python build_effect_index.py
+  python build_effect_index.py --rulebook path/to/rulebook.txt --output path/to/effect_index.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.config import EFFECT_INDEX_FILE, RULEBOOK_TEXT_FILE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="构建关键词效果/效果时机倒排索引")
+    parser.add_argument("--rulebook", type=str, default=RULEBOOK_TEXT_FILE, help="规则书文本文件")
+    parser.add_argument("--output", type=str, default=EFFECT_INDEX_FILE, help="索引输出路径")
+    args = parser.parse_args()
+
+    from app.card_index import card_index
+    from app.effect_index import build_effect_index, read_rulebook_text
+
+    rulebook_text = read_rulebook_text(args.rulebook)
+    if not rulebook_text:
+        print(f"⚠️ 规则书文本不存在，跳过规则条款定位: {args.rulebook}")
+
+    index = build_effect_index(card_index.cards, rulebook_text)
+
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, indent=2)
+
+    print("=" * 50)
+    print(f"卡牌: {len(index['cards'])} 张")
+    print(f"关键词效果: {len(index['keywords'])} 个")
+    print(f"效果时机: {len(index['timings'])} 个")
+    print(f"规则条款: {len(index['rule_sections'])} 个术语")
+    print(f"已保存到: {output}")
+
+
+if __name__ == "__main__":
+    main()
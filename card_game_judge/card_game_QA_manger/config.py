@@ -13,10 +13,9 @@ OUTPUT_FILE = "official_qa.json"
 HEADLESS = True  # 是否使用无头模式（不显示浏览器窗口）
 WINDOW_SIZE = "1920,1080"  # 浏览器窗口大小
 
-# 等待时间设置（秒）
-PAGE_LOAD_TIMEOUT = 20  # 页面加载超时时间
-INITIAL_WAIT = 3  # 页面加载后的初始等待时间
-ELEMENT_WAIT = 0.5  # 元素操作之间的等待时间
+# 等待时间设置（秒）：按选择器等待元素出现，以下为最长等待时间
+PAGE_LOAD_TIMEOUT = 20  # 页面加载超时时间（等待QA元素出现）
+ELEMENT_TIMEOUT = 5  # 点击展开单条QA后等待内容出现的超时时间
 
 # 选择器配置
 # 按优先级排列，爬虫会依次尝试这些选择器
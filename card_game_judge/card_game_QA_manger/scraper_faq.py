@@ -3,23 +3,28 @@
 从 https://app.digicamoe.cn/faq 爬取官方问答数据
 """
 
-import json
-import time
 import os
+import sys
 from datetime import datetime
+from pathlib import Path
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
 from webdriver_manager.chrome import ChromeDriverManager
 
+# 爬虫共用工具（仓库根目录的 scraper_common）
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from scraper_common.browser_driver import PageWaits, block_resource_types, build_chrome_options
+from scraper_common.incremental import ChangeTracker, NEW, CHANGED
+from scraper_common.json_journal import JsonJournal
+
 # 尝试导入配置文件
 try:
     from config import (
         FAQ_URL, OUTPUT_FILE, HEADLESS as DEFAULT_HEADLESS,
-        PAGE_LOAD_TIMEOUT, INITIAL_WAIT, ELEMENT_WAIT,
+        PAGE_LOAD_TIMEOUT, ELEMENT_TIMEOUT,
         SELECTORS, DATA_SOURCE, SAVE_DEBUG_HTML, DEBUG_HTML_FILE
     )
 except ImportError:
@@ -28,8 +33,7 @@ except ImportError:
     OUTPUT_FILE = "official_qa.json"
     DEFAULT_HEADLESS = True
     PAGE_LOAD_TIMEOUT = 20
-    INITIAL_WAIT = 3
-    ELEMENT_WAIT = 0.5
+    ELEMENT_TIMEOUT = 5
     SELECTORS = [
         ".ant-collapse-item",
         "[class*='faq']",
@@ -52,15 +56,19 @@ class FAQDatabase:
     def __init__(self, data_file=DEFAULT_DATA_FILE):
         self.data_file = data_file
         self.qa_list = []
+        # 新增QA只追加日志，save() 时合并回 data_file
+        self.journal = JsonJournal(data_file)
         self.load()
     
     def load(self):
-        """加载现有数据"""
-        if os.path.exists(self.data_file):
+        """加载现有数据（快照 + 上次未合并的日志）"""
+        if os.path.exists(self.data_file) or self.journal.journal_file.exists():
             try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    self.qa_list = json.load(f)
+                self.qa_list = list(self.journal.load().values())
                 print(f"已加载 {len(self.qa_list)} 条QA数据")
+                if self.journal.pending:
+                    print(f"  从日志恢复 {self.journal.pending} 条未合并的更新")
+                    self.save()
             except Exception as e:
                 print(f"加载数据失败: {e}")
                 self.qa_list = []
@@ -69,17 +77,18 @@ class FAQDatabase:
             self.qa_list = []
     
     def save(self):
-        """保存数据到文件"""
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.qa_list, f, ensure_ascii=False, indent=2)
+        """保存数据到文件（原子替换，并清空日志）"""
+        self.journal.compact(self.qa_list)
         print(f"已保存 {len(self.qa_list)} 条QA数据到 {self.data_file}")
     
     def add_qa(self, qa_info):
         """添加单条QA"""
+        self.journal.put(len(self.qa_list), qa_info)
         self.qa_list.append(qa_info)
     
     def clear(self):
         """清空数据"""
+        self.journal.clear()
         self.qa_list = []
     
     def count(self):
@@ -95,16 +104,15 @@ class DigimonFAQScraper:
         self.headless = headless if headless is not None else DEFAULT_HEADLESS
         self.data_file = data_file or DEFAULT_DATA_FILE
         self.db = FAQDatabase(self.data_file)
+        self.waits = PageWaits(timeout=PAGE_LOAD_TIMEOUT)
         
     def setup_driver(self):
-        """设置浏览器驱动"""
-        chrome_options = Options()
-        if self.headless:
-            chrome_options.add_argument('--headless=new')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--disable-blink-features=AutomationControlled')
+        """设置浏览器驱动（需要点击展开 QA，保留 CSS）"""
+        return block_resource_types(self.launch_driver())
+    
+    def launch_driver(self):
+        """启动Chrome"""
+        chrome_options = build_chrome_options(self.headless, ['--disable-blink-features=AutomationControlled'])
         chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
         chrome_options.add_experimental_option('useAutomationExtension', False)
         
@@ -183,7 +191,8 @@ class DigimonFAQScraper:
             WebDriverWait(driver, timeout).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
-            time.sleep(INITIAL_WAIT)  # 额外等待动态内容
+            # 等待QA元素渲染（超时则由 extract_qa_items 保存调试HTML）
+            self.waits.present(driver, ", ".join(SELECTORS), "QA列表", timeout)
             return True
         except Exception as e:
             print(f"页面加载超时: {e}")
@@ -238,7 +247,11 @@ class DigimonFAQScraper:
                         # 点击展开（如果需要）
                         if "ant-collapse-item-active" not in element.get_attribute("class"):
                             header.click()
-                            time.sleep(ELEMENT_WAIT)
+                            self.waits.until(
+                                driver,
+                                lambda d: element.find_elements(By.CSS_SELECTOR, ".ant-collapse-content"),
+                                "展开QA", ELEMENT_TIMEOUT
+                            )
                         
                         content = element.find_element(By.CSS_SELECTOR, ".ant-collapse-content")
                         answer = content.text.strip()
@@ -313,6 +326,17 @@ class DigimonFAQScraper:
             if qa_items:
                 print(f"\n成功提取 {len(qa_items)} 条QA")
                 
+                # 按问题与已有数据比较内容（忽略 scraped_at / index）
+                existing = {qa['question']: qa for qa in self.db.qa_list}
+                tracker = ChangeTracker()
+                for qa in qa_items:
+                    tracker.check(existing.get(qa['question']), qa)
+                removed = len(existing.keys() - {qa['question'] for qa in qa_items})
+                print(f"增量: {tracker.summary()}, 删除 {removed} 条")
+                if not tracker.counts[NEW] and not tracker.counts[CHANGED] and not removed:
+                    print(f"\n✓ QA内容无变化，保留原文件: {self.db.data_file}")
+                    return
+                
                 # 清空旧数据并添加新数据
                 self.db.clear()
                 for qa in qa_items:
@@ -334,6 +358,7 @@ class DigimonFAQScraper:
             import traceback
             traceback.print_exc()
         finally:
+            print(self.waits.summary())
             driver.quit()
 
 
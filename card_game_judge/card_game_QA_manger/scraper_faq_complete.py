@@ -1,89 +1,92 @@
 """
 数码兽卡牌官方QA完整爬虫
 支持翻页，爬取所有238条QA
+增量更新：按内容哈希只写入新增/变化的QA，可设置连续若干页没有新增或变化时停止翻页
 """
 
 import json
-import time
 import os
+import sys
 import re
 from datetime import datetime
-from selenium import webdriver
+from pathlib import Path
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+
+# 爬虫共用工具（仓库根目录的 scraper_common）
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from scraper_common.browser_driver import PageWaits, build_chrome_options, create_chrome_driver
+from scraper_common.incremental import NEW, CHANGED, UNCHANGED, ChangeTracker
+from scraper_common.json_journal import JsonJournal
+
+# 页面中的QA编号（Q1.23：），出现即表示列表已渲染
+QA_NUMBER_PATTERN = r'Q(\d+\.\d+)：'
 
 
 class DigimonFAQCompleteScraper:
     """完整的FAQ爬虫，支持翻页和增量保存"""
     
-    def __init__(self, headless=True, output_file='official_qa_complete.json'):
+    def __init__(self, headless=True, output_file='official_qa_complete.json', stop_after_known_pages=None):
+        """stop_after_known_pages: 连续这么多页没有新增或变化的QA时停止翻页（None 时翻完所有页）"""
         self.base_url = "https://app.digicamoe.cn/faq"
         self.headless = headless
         self.output_file = output_file
+        self.tracker = ChangeTracker(stop_after_known_pages)
         self.existing_ids = set()
+        self.waits = PageWaits(timeout=20)
         self.load_existing_data()
         
     def load_existing_data(self):
-        """加载已有数据，获取已存在的ID"""
-        if os.path.exists(self.output_file):
+        """加载已有数据（快照 + 上次未合并的日志），获取已存在的ID"""
+        self.journal = JsonJournal(self.output_file, key_field='id')
+        if os.path.exists(self.output_file) or self.journal.journal_file.exists():
             try:
-                with open(self.output_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.existing_ids = {qa['id'] for qa in data if 'id' in qa}
+                self.qa_records = self.journal.load()
+                self.existing_ids = set(self.qa_records)
                 print(f"✓ 已加载 {len(self.existing_ids)} 条已有QA")
+                if self.journal.pending:
+                    print(f"  从日志恢复 {self.journal.pending} 条未合并的QA")
+                    self.flush()
             except Exception as e:
                 print(f"⚠ 加载已有数据失败: {e}")
+                self.qa_records = {}
                 self.existing_ids = set()
         else:
             print(f"✓ 将创建新文件: {self.output_file}")
             # 创建空文件
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False)
+            self.qa_records = {}
+            self.journal.compact([])
     
     def add_qa_to_file(self, qa):
-        """将单条QA追加到文件末尾"""
-        # 检查是否已存在
-        if qa['id'] in self.existing_ids:
-            return False
+        """
+        将新增或内容变化的QA追加到日志（定期及爬取结束时合并回输出文件）
+        Returns: new / changed / unchanged
+        """
+        # 检查是否已存在且内容未变（忽略 scraped_at）
+        status = self.tracker.check(self.qa_records.get(qa['id']), qa)
+        if status == UNCHANGED:
+            return status
         
-        # 读取现有数据
-        try:
-            with open(self.output_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except:
-            data = []
-        
-        # 追加新数据
-        data.append(qa)
-        
-        # 保存回文件
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        self.qa_records[qa['id']] = qa
+        self.journal.put(qa['id'], qa)
+        if self.journal.pending >= self.journal.compact_every:
+            self.flush()
         
         # 更新已存在ID集合
         self.existing_ids.add(qa['id'])
-        return True
+        return status
+    
+    def flush(self):
+        """把日志合并回输出文件"""
+        self.journal.compact(list(self.qa_records.values()))
         
     def setup_driver(self):
-        """设置浏览器"""
-        chrome_options = Options()
-        if self.headless:
-            chrome_options.add_argument('--headless=new')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--window-size=1920,1080')
-        
-        try:
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-        except:
-            driver = webdriver.Chrome(options=chrome_options)
-        
-        return driver
+        """设置浏览器（按 innerText 的换行解析QA，保留 CSS）"""
+        return create_chrome_driver(build_chrome_options(self.headless))
+    
+    def first_qa_number(self, driver):
+        """当前页第一条QA的编号（用于判断翻页完成）"""
+        match = re.search(QA_NUMBER_PATTERN, driver.find_element(By.TAG_NAME, 'body').text)
+        return match.group(1) if match else None
     
     def parse_qa_from_text(self, text):
         """从文本中解析QA"""
@@ -123,7 +126,7 @@ class DigimonFAQCompleteScraper:
         try:
             # 滚动到页面底部，确保分页按钮可见
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)
+            first_qa = self.first_qa_number(driver)
             
             # 查找下一页按钮
             next_buttons = driver.find_elements(By.CSS_SELECTOR, "li.ant-pagination-next")
@@ -136,15 +139,14 @@ class DigimonFAQCompleteScraper:
                     except:
                         # 方法2: 普通点击
                         driver.execute_script("arguments[0].scrollIntoView(true);", btn)
-                        time.sleep(0.5)
                         btn.click()
                         print("  ✓ 已点击下一页")
                     
-                    time.sleep(4)  # 等待页面加载
+                    # 等待列表换成下一页的QA
+                    self.waits.value_changes(driver, self.first_qa_number, first_qa, "翻页")
                     
                     # 滚动到页面顶部
                     driver.execute_script("window.scrollTo(0, 0);")
-                    time.sleep(2)
                     
                     return True
             
@@ -162,11 +164,11 @@ class DigimonFAQCompleteScraper:
         try:
             print(f"正在访问: {self.base_url}")
             driver.get(self.base_url)
-            time.sleep(5)
             
             page = 1
             max_pages = 20  # 安全限制
             total_new = 0
+            total_changed = 0
             total_skipped = 0
             failed_pages = []
             
@@ -176,12 +178,9 @@ class DigimonFAQCompleteScraper:
                 print(f"{'='*60}")
                 
                 # 滚动页面，确保内容加载
-                driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(1)
                 driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-                time.sleep(2)
+                self.waits.text_matches(driver, QA_NUMBER_PATTERN, "QA列表")
                 driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(1)
                 
                 # 获取当前页面文本
                 body = driver.find_element(By.TAG_NAME, 'body')
@@ -211,23 +210,33 @@ class DigimonFAQCompleteScraper:
                     
                     # 逐条检查并保存
                     page_new = 0
+                    page_changed = 0
                     page_skipped = 0
                     
                     for qa in qa_list:
-                        if self.add_qa_to_file(qa):
+                        status = self.add_qa_to_file(qa)
+                        if status == NEW:
                             page_new += 1
                             total_new += 1
                             print(f"  ✓ 新增: {qa['id']} - {qa['question'][:40]}...")
+                        elif status == CHANGED:
+                            page_changed += 1
+                            total_changed += 1
+                            print(f"  ✎ 更新: {qa['id']} (内容变化)")
                         else:
                             page_skipped += 1
                             total_skipped += 1
                             print(f"  ⏭ 跳过: {qa['id']} (已存在)")
                     
-                    print(f"\n本页统计: 新增 {page_new} 条, 跳过 {page_skipped} 条")
+                    print(f"\n本页统计: 新增 {page_new} 条, 更新 {page_changed} 条, 跳过 {page_skipped} 条")
                     print(f"总计: 已保存 {len(self.existing_ids)} 条QA")
                 else:
                     print("✗ 本页未提取到QA")
                 
+                if qa_list and self.tracker.end_page():
+                    print(f"\n连续 {self.tracker.stop_after_known_pages} 页没有新增或变化的QA，停止翻页")
+                    break
+                
                 # 尝试点击下一页
                 if not self.click_next_page(driver):
                     print("\n已到最后一页")
@@ -235,12 +244,15 @@ class DigimonFAQCompleteScraper:
                 
                 page += 1
             
+            self.flush()
             print(f"\n{'='*60}")
             print(f"✓ 爬取完成！")
             print(f"✓ 新增 {total_new} 条QA")
+            print(f"✓ 更新 {total_changed} 条内容变化的QA")
             print(f"✓ 跳过 {total_skipped} 条已存在QA")
             print(f"✓ 总计 {len(self.existing_ids)} 条QA")
             print(f"✓ 数据已保存到: {self.output_file}")
+            print(self.waits.summary())
             
             if failed_pages:
                 print(f"\n⚠ 以下页面未能提取QA: {failed_pages}")
@@ -271,6 +283,8 @@ class DigimonFAQCompleteScraper:
             import traceback
             traceback.print_exc()
         finally:
+            if self.journal.pending:
+                self.flush()
             driver.quit()
 
 
@@ -279,7 +293,13 @@ def main():
     print("数码兽卡牌官方QA完整爬虫")
     print("=" * 60)
     
-    scraper = DigimonFAQCompleteScraper(headless=True)
+    import argparse
+    parser = argparse.ArgumentParser(description="数码兽卡牌官方QA完整爬虫")
+    parser.add_argument("--stop-after-known-pages", type=int, default=None,
+                        help="连续这么多页没有新增或变化的QA时停止翻页（增量更新）")
+    args = parser.parse_args()
+    
+    scraper = DigimonFAQCompleteScraper(headless=True, stop_after_known_pages=args.stop_after_known_pages)
     scraper.scrape_all_pages()
 
 
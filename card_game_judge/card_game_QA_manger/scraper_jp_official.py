@@ -1,65 +1,70 @@
 """
 数码兽卡牌日文官网QA爬虫
 从 https://digimoncard.com/rule/#qaResult_card 爬取日文QA
+增量更新：按内容哈希只写入新增/变化的QA
 """
 
 import json
-import time
 import os
+import sys
 import re
 from datetime import datetime
-from selenium import webdriver
+from pathlib import Path
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+
+# 爬虫共用工具（仓库根目录的 scraper_common）
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from scraper_common.browser_driver import PageWaits, build_chrome_options, create_chrome_driver
+from scraper_common.browser_pool import BrowserWorkerPool
+from scraper_common.incremental import VOLATILE_FIELDS, NEW, UNCHANGED, ChangeTracker
+from scraper_common.json_journal import JsonJournal
 
 
 class JapaneseOfficialQAScraper:
     """日文官网QA爬虫"""
     
-    def __init__(self, headless=True, output_file='official_qa_jp.json'):
+    def __init__(self, headless=True, output_file='official_qa_jp.json', workers=1, per_host=None):
+        """workers > 1 时多个无头浏览器并行爬取不同収録弾，per_host 限制同时访问官网的浏览器数"""
         self.base_url = "https://digimoncard.com/rule/#qaResult_card"
         self.headless = headless
         self.output_file = output_file
+        self.workers = workers
+        self.per_host = per_host
         self.existing_ids = set()
+        self.waits = PageWaits(timeout=20)
+        # 同一QA会出现在多个収録弾中，比较内容时忽略収録弾字段
+        self.tracker = ChangeTracker(ignore=VOLATILE_FIELDS + ('prodid', 'prod_name'))
         self.load_existing_data()
         
     def load_existing_data(self):
-        """加载已有数据"""
-        if os.path.exists(self.output_file):
+        """加载已有数据（快照 + 上次未合并的日志）"""
+        self.journal = JsonJournal(self.output_file, key_field='id')
+        if os.path.exists(self.output_file) or self.journal.journal_file.exists():
             try:
-                with open(self.output_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.existing_ids = {qa['id'] for qa in data if 'id' in qa}
+                self.qa_records = self.journal.load()
+                self.existing_ids = set(self.qa_records)
                 print(f"✓ 已加载 {len(self.existing_ids)} 条已有QA")
+                if self.journal.pending:
+                    print(f"  从日志恢复 {self.journal.pending} 条未合并的QA")
+                    self.flush()
             except Exception as e:
                 print(f"⚠ 加载已有数据失败: {e}")
+                self.qa_records = {}
                 self.existing_ids = set()
         else:
             print(f"✓ 将创建新文件: {self.output_file}")
-            with open(self.output_file, 'w', encoding='utf-8') as f:
-                json.dump([], f, ensure_ascii=False)
+            self.qa_records = {}
+            self.journal.compact([])
     
-    def setup_driver(self):
-        """设置浏览器"""
-        chrome_options = Options()
-        if self.headless:
-            chrome_options.add_argument('--headless=new')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--window-size=1920,1080')
-        chrome_options.add_argument('--lang=ja')  # 设置日语
-        
-        try:
-            print("启动Chrome...")
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-        except:
-            driver = webdriver.Chrome(options=chrome_options)
-        
+    def flush(self):
+        """把日志合并回输出文件"""
+        self.journal.compact(list(self.qa_records.values()))
+    
+    def setup_driver(self, headless=None):
+        """设置浏览器（按元素可见文本提取QA，保留 CSS）"""
+        print("启动Chrome...")
+        headless = self.headless if headless is None else headless
+        driver = create_chrome_driver(build_chrome_options(headless, ['--lang=ja']))  # 设置日语
         print("✓ Chrome启动成功")
         return driver
     
@@ -90,7 +95,6 @@ class JapaneseOfficialQAScraper:
             # 选择prodid
             select_element = driver.find_element(By.NAME, 'prodid')
             driver.execute_script(f"arguments[0].value='{prodid_value}';", select_element)
-            time.sleep(0.5)
             
             # 点击检索按钮
             search_buttons = driver.find_elements(By.CSS_SELECTOR, "button[type='submit'], input[type='submit']")
@@ -99,9 +103,12 @@ class JapaneseOfficialQAScraper:
                     # 检查按钮是否在卡片搜索表单中
                     form = btn.find_element(By.XPATH, './ancestor::form')
                     if 'qaResult_card' in form.get_attribute('action'):
+                        page = driver.find_element(By.TAG_NAME, 'html')
                         driver.execute_script("arguments[0].click();", btn)
                         print(f"  ✓ 已点击检索按钮")
-                        time.sleep(5)  # 等待结果加载
+                        # 提交表单后整页跳转：等旧页面卸载、新页面解析完成
+                        self.waits.stale(driver, page, "检索跳转")
+                        self.waits.dom_ready(driver, "检索结果页")
                         return True
                 except:
                     continue
@@ -111,25 +118,6 @@ class JapaneseOfficialQAScraper:
             print(f"  ✗ 搜索失败: {e}")
             return False
     
-    def add_qa_to_file(self, qa):
-        """将单条QA追加到文件"""
-        if qa['id'] in self.existing_ids:
-            return False
-        
-        try:
-            with open(self.output_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except:
-            data = []
-        
-        data.append(qa)
-        
-        with open(self.output_file, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        
-        self.existing_ids.add(qa['id'])
-        return True
-    
     def has_next_page(self, driver):
         """检查是否有下一页"""
         try:
@@ -152,16 +140,17 @@ class JapaneseOfficialQAScraper:
             if next_btn:
                 # 滚动到按钮位置
                 driver.execute_script("arguments[0].scrollIntoView(true);", next_btn)
-                time.sleep(0.5)
+                current_page = driver.find_element(By.CSS_SELECTOR, '.pageBtn.current').text
                 
                 # 使用JavaScript点击
                 driver.execute_script("arguments[0].click();", next_btn)
                 print(f"    ✓ 已点击下一页")
-                time.sleep(4)  # 等待页面加载
+                self.waits.value_changes(
+                    driver, lambda d: d.find_element(By.CSS_SELECTOR, '.pageBtn.current').text, current_page, "翻页"
+                )
                 
                 # 滚动到顶部
                 driver.execute_script("window.scrollTo(0, 0);")
-                time.sleep(1)
                 return True
             return False
         except Exception as e:
@@ -170,55 +159,88 @@ class JapaneseOfficialQAScraper:
     
     def scrape_prodid_all_pages(self, driver, prod):
         """爬取单个収録弾的所有页面"""
+        return self.save_prodid_qa(prod, self.collect_prodid_qa(driver, prod))
+    
+    def collect_prodid_qa(self, driver, prod):
+        """提取当前检索结果页的QA并添加収録弾信息"""
         # 滚动页面确保内容加载
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(2)
         driver.execute_script("window.scrollTo(0, 0);")
-        time.sleep(1)
         
         # 提取QA（所有QA都在一页上）
         qa_list = self.extract_qa_items(driver)
-        
+        for qa in qa_list:
+            qa['id'] = qa['qa_number']  # 直接使用QA编号
+            qa['prodid'] = prod['value']
+            qa['prod_name'] = prod['text']
+        return qa_list
+    
+    def save_prodid_qa(self, prod, qa_list):
+        """跳过内容未变的已有QA，新增/变化的追加到日志，返回新增条数"""
         if not qa_list:
-            print(f"  ✗ 未提取到QA")
+            print(f"  ✗ {prod['text']}: 未提取到QA")
             return 0
         
-        print(f"  ✓ 提取到 {len(qa_list)} 条QA")
+        print(f"  ✓ {prod['text']}: 提取到 {len(qa_list)} 条QA")
         
-        # 逐条保存
         new_count = 0
-        skip_count = 0
-        
+        changed_count = 0
         for qa in qa_list:
-            qa_id = qa['qa_number']  # 直接使用QA编号
-            
-            # 如果ID已存在，跳过
-            if qa_id in self.existing_ids:
-                skip_count += 1
+            old = self.qa_records.get(qa['id'])
+            status = self.tracker.check(old, qa)
+            if status == UNCHANGED:
                 continue
-            
-            # 添加収録弾信息
-            qa['id'] = qa_id
-            qa['prodid'] = prod['value']
-            qa['prod_name'] = prod['text']
-            
-            # 保存到文件
-            if self.add_qa_to_file(qa):
+            if status == NEW:
                 new_count += 1
                 print(f"    ✓ 新增: {qa['qa_number']} - {qa['question'][:50]}...")
             else:
-                skip_count += 1
+                # 保留最初收录该QA的収録弾
+                qa = dict(qa, prodid=old.get('prodid'), prod_name=old.get('prod_name'))
+                changed_count += 1
+                print(f"    ✎ 更新: {qa['qa_number']} (内容变化)")
+            self.qa_records[qa['id']] = qa
+            self.journal.put(qa['id'], qa)
+            self.existing_ids.add(qa['id'])
+        if self.journal.pending >= self.journal.compact_every:
+            self.flush()
         
-        print(f"  统计: 新增 {new_count} 条, 跳过 {skip_count} 条")
+        print(f"  统计: 新增 {new_count} 条, 更新 {changed_count} 条, "
+              f"跳过 {len(qa_list) - new_count - changed_count} 条")
         return new_count
     
+    def scrape_parallel(self, prodid_options):
+        """多个浏览器并行爬取各収録弾，结果在锁内依次合并写入，返回新增条数"""
+        def create_worker():
+            driver = self.setup_driver(headless=True)
+            driver.get(self.base_url)
+            self.waits.present(driver, 'select[name="prodid"] option', "収録弾選択")
+            return driver
+        
+        def scrape_prod(driver, prod):
+            if not self.search_by_prodid(driver, prod['value']):
+                raise RuntimeError("检索失败")
+            return self.collect_prodid_qa(driver, prod)
+        
+        new_counts = {}
+        pool = BrowserWorkerPool(create_worker, lambda driver: driver.quit(),
+                                 workers=self.workers, per_host=self.per_host)
+        _, failed = pool.run(
+            prodid_options, scrape_prod,
+            host_of=lambda prod: "digimoncard.com",
+            on_result=lambda prod, qa_list: new_counts.update({prod['value']: self.save_prodid_qa(prod, qa_list)}),
+            label=lambda prod: prod['text'],
+        )
+        if failed:
+            print(f"⚠️ 以下収録弾重试后仍失败: {[prod['text'] for prod in failed]}")
+        return sum(new_counts.values())
+    
     def extract_qa_items(self, driver):
         """提取QA条目"""
         qa_list = []
         
         try:
-            # 等待QA结果加载
-            time.sleep(2)
+            # 等待QA结果加载（该弹没有QA时超时后按空结果处理）
+            self.waits.present(driver, 'dl.qa_box', "QA结果", timeout=5)
             
             # 查找所有qa_box（每个box包含卡牌信息和QA）
             qa_boxes = driver.find_elements(By.CSS_SELECTOR, 'dl.qa_box')
@@ -414,7 +436,7 @@ class JapaneseOfficialQAScraper:
             driver.get(self.base_url)
             
             # 等待页面加载
-            time.sleep(8)
+            self.waits.present(driver, 'select[name="prodid"] option', "収録弾選択")
             
             # 获取所有収録弾選択选项
             print("\n获取収録弾選択列表...")
@@ -430,34 +452,41 @@ class JapaneseOfficialQAScraper:
             total_new = 0
             total_skip = 0
             
-            for idx, prod in enumerate(prodid_options, 1):
-                print(f"\n{'='*60}")
-                print(f"[{idx}/{len(prodid_options)}] {prod['text']}")
-                print(f"{'='*60}")
+            if self.workers > 1:
+                print(f"\n使用 {self.workers} 个浏览器并行爬取")
+                total_new = self.scrape_parallel(prodid_options)
+            else:
+                for idx, prod in enumerate(prodid_options, 1):
+                    print(f"\n{'='*60}")
+                    print(f"[{idx}/{len(prodid_options)}] {prod['text']}")
+                    print(f"{'='*60}")
                 
-                # 搜索该収録弾的QA
-                if not self.search_by_prodid(driver, prod['value']):
-                    print("  ✗ 搜索失败，跳过")
-                    continue
+                    # 搜索该収録弾的QA
+                    if not self.search_by_prodid(driver, prod['value']):
+                        print("  ✗ 搜索失败，跳过")
+                        continue
                 
-                # 爬取该収録弾的所有页面
-                prod_total = self.scrape_prodid_all_pages(driver, prod)
+                    # 爬取该収録弾的所有页面
+                    prod_total = self.scrape_prodid_all_pages(driver, prod)
                 
-                if prod_total > 0:
-                    print(f"  本弹总计: {prod_total} 条QA")
-                    total_new += prod_total
-                else:
-                    print(f"  本弹未提取到QA")
+                    if prod_total > 0:
+                        print(f"  本弹总计: {prod_total} 条QA")
+                        total_new += prod_total
+                    else:
+                        print(f"  本弹未提取到QA")
                 
-                # 保存当前进度
-                print(f"  累计总计: {len(self.existing_ids)} 条QA")
+                    # 保存当前进度
+                    print(f"  累计总计: {len(self.existing_ids)} 条QA")
             
             # 最终统计
+            self.flush()
             print(f"\n{'='*60}")
             print(f"✓ 爬取完成！")
             print(f"✓ 新增 {total_new} 条QA")
+            print(f"✓ {self.tracker.summary()}")
             print(f"✓ 总计 {len(self.existing_ids)} 条QA")
             print(f"✓ 数据已保存到: {self.output_file}")
+            print(self.waits.summary())
             print(f"{'='*60}")
             
             # 统计収録弾分布
@@ -482,6 +511,8 @@ class JapaneseOfficialQAScraper:
             import traceback
             traceback.print_exc()
         finally:
+            if self.journal.pending:
+                self.flush()
             driver.quit()
 
 
@@ -490,7 +521,13 @@ def main():
     print("数码兽卡牌日文官网QA爬虫")
     print("=" * 60)
     
-    scraper = JapaneseOfficialQAScraper(headless=False)  # 显示浏览器便于调试
+    import argparse
+    parser = argparse.ArgumentParser(description="数码兽卡牌日文官网QA爬虫")
+    parser.add_argument("--workers", type=int, default=1, help="并行浏览器数（>1 时使用无头浏览器并行爬取各収録弾）")
+    parser.add_argument("--per-host", type=int, default=None, help="同时访问官网的浏览器数上限")
+    args = parser.parse_args()
+    
+    scraper = JapaneseOfficialQAScraper(headless=False, workers=args.workers, per_host=args.per_host)  # 显示浏览器便于调试
     scraper.scrape()
 
 
@@ -4,10 +4,14 @@
 """
 import json
 import re
+import sys
 from pathlib import Path
 from typing import Dict, List, Optional
 import time
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app.translation_memory import TranslationMemory
+
 # 可选：使用Google Translate API或其他翻译服务
 try:
     from googletrans import Translator
@@ -47,6 +51,8 @@ class QATranslator:
             self.translator = Translator()
         else:
             self.translator = None
+        # 机器翻译结果缓存（术语替换在机器翻译之后进行，不影响缓存）
+        self.memory = TranslationMemory(prompt_version="googletrans")
     
     def _load_terminology(self) -> Dict[str, str]:
         """加载术语表，构建日文->中文映射"""
@@ -137,8 +143,9 @@ class QATranslator:
         
         try:
             # 翻译日文到中文
-            translated = self.translator.translate(text, src='ja', dest='zh-cn')
-            return translated.text
+            return self.memory.translate(
+                text, lambda t: self.translator.translate(t, src='ja', dest='zh-cn').text
+            )
         except Exception as e:
             print(f"翻译失败: {e}")
             return text
@@ -238,6 +245,7 @@ class QATranslator:
             json.dump(translated_list, f, ensure_ascii=False, indent=2)
         
         print(f"✓ 翻译完成！共翻译 {len(translated_list)} 条QA")
+        print(f"✓ {self.memory.summary()}")
         print(f"✓ 输出文件: {self.output_qa_path}")
 
 
@@ -5,8 +5,17 @@
 """
 import json
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app.config import TRANSLATION_WORKERS
+from app.term_replacer import TermReplacer
+
+# 文本中的卡号 (如 "BT8-018", "EX11-010")
+CARD_NO_PATTERN = re.compile(r'[A-Z]{2,3}\d{1,2}-\d{3}')
 
 
 class LocalQATranslator:
@@ -35,6 +44,15 @@ class LocalQATranslator:
         
         # 构建常见游戏术语映射
         self.game_terms = self._build_game_terms()
+        
+        # 编译一次，处理每条QA时复用：术语表优先于常见游戏术语，长词优先
+        self.term_replacer = TermReplacer(self.terminology, self.game_terms)
+        # {卡号: (日文名, 中文名)}，只保留两种名称都有的卡牌
+        self.card_names: Dict[str, Tuple[str, str]] = {
+            card_no: (info['name_jp'], info['name_cn'])
+            for card_no, info in self.card_mapping.items()
+            if info['name_jp'] and info['name_cn']
+        }
     
     def _load_terminology(self) -> Dict[str, str]:
         """加载术语表，构建日文->中文映射"""
@@ -260,23 +278,7 @@ class LocalQATranslator:
     
     def _replace_terms(self, text: str) -> str:
         """替换文本中的所有术语"""
-        if not text:
-            return text
-        
-        result = text
-        
-        # 合并所有术语
-        all_terms = {**self.game_terms, **self.terminology}
-        
-        # 按长度降序排序，优先匹配长术语
-        sorted_terms = sorted(all_terms.items(), 
-                            key=lambda x: len(x[0]), 
-                            reverse=True)
-        
-        for jp_term, cn_term in sorted_terms:
-            result = result.replace(jp_term, cn_term)
-        
-        return result
+        return self.term_replacer.replace(text)
     
     def _replace_card_names(self, text: str, card_no: Optional[str] = None) -> str:
         """替换文本中的卡牌名称"""
@@ -285,29 +287,13 @@ class LocalQATranslator:
         
         result = text
         
-        # 如果提供了卡号，优先使用该卡牌的名称
-        if card_no and card_no in self.card_mapping:
-            card_info = self.card_mapping[card_no]
-            jp_name = card_info['name_jp']
-            cn_name = card_info['name_cn']
-            if jp_name and cn_name:
-                result = result.replace(jp_name, cn_name)
-        
-        # 查找文本中的卡号模式 (如 "BT8-018", "EX11-010")
-        card_no_pattern = r'([A-Z]{2,3}\d{1,2}-\d{3})'
-        matches = re.findall(card_no_pattern, text)
-        
-        for matched_card_no in matches:
-            if matched_card_no in self.card_mapping:
-                card_info = self.card_mapping[matched_card_no]
-                jp_name = card_info['name_jp']
-                cn_name = card_info['name_cn']
-                if jp_name and cn_name:
-                    # 替换 "卡号 卡名" 格式
-                    result = result.replace(f"{matched_card_no} {jp_name}", 
-                                          f"{matched_card_no} {cn_name}")
-                    # 也替换单独的卡名
-                    result = result.replace(jp_name, cn_name)
+        # 该QA所属卡牌优先，其次是文本中出现的卡号（"卡号 卡名" 格式和单独的卡名一并替换）
+        card_nos = [card_no] if card_no else []
+        card_nos.extend(CARD_NO_PATTERN.findall(text))
+        for matched_card_no in dict.fromkeys(card_nos):
+            names = self.card_names.get(matched_card_no)
+            if names:
+                result = result.replace(*names)
         
         return result
     
@@ -356,8 +342,30 @@ class LocalQATranslator:
         
         return processed
     
-    def translate_all(self):
-        """处理所有QA条目"""
+    def _translate_or_keep(self, qa_item: Dict) -> Dict:
+        try:
+            return self.translate_qa_item(qa_item)
+        except Exception as e:
+            print(f"处理QA {qa_item.get('qa_number', '')} 时出错: {e}")
+            # 保留原始数据
+            return qa_item
+    
+    def iter_translated(self, qa_list: List[Dict], workers: int = TRANSLATION_WORKERS) -> Iterator[Dict]:
+        """按原顺序逐条产出处理结果；workers > 1 时分块交给进程池处理"""
+        if workers <= 1:
+            yield from map(self._translate_or_keep, qa_list)
+            return
+        
+        chunksize = max(1, len(qa_list) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as pool:
+            yield from pool.map(_translate_in_worker, qa_list, chunksize=chunksize)
+    
+    def translate_all(self, workers: int = TRANSLATION_WORKERS):
+        """
+        处理所有QA条目
+        
+        处理结果按原顺序逐条追加到 .jsonl 文件，全部完成后再写出 JSON
+        """
         # 加载日文QA
         print(f"\n正在加载日文QA: {self.input_qa_path}")
         with open(self.input_qa_path, 'r', encoding='utf-8') as f:
@@ -368,26 +376,21 @@ class LocalQATranslator:
         # 处理
         processed_list = []
         total = len(qa_list)
+        jsonl_path = self.output_qa_path.with_suffix('.jsonl')
+        self.output_qa_path.parent.mkdir(parents=True, exist_ok=True)
         
-        print(f"\n开始处理...")
-        for i, qa_item in enumerate(qa_list, 1):
-            try:
-                processed = self.translate_qa_item(qa_item)
+        print(f"\n开始处理 ({workers} 个进程)...")
+        with open(jsonl_path, 'w', encoding='utf-8') as log:
+            for i, processed in enumerate(self.iter_translated(qa_list, workers), 1):
+                log.write(json.dumps(processed, ensure_ascii=False) + "\n")
                 processed_list.append(processed)
                 
                 # 显示进度
-                if i % 50 == 0 or i == total:
+                if i % 500 == 0 or i == total:
                     print(f"进度: {i}/{total} ({i*100//total}%)")
-                    
-            except Exception as e:
-                print(f"处理第 {i} 条QA时出错: {e}")
-                # 保留原始数据
-                processed_list.append(qa_item)
         
         # 保存结果
         print(f"\n正在保存处理结果: {self.output_qa_path}")
-        self.output_qa_path.parent.mkdir(parents=True, exist_ok=True)
-        
         with open(self.output_qa_path, 'w', encoding='utf-8') as f:
             json.dump(processed_list, f, ensure_ascii=False, indent=2)
         
@@ -406,6 +409,19 @@ class LocalQATranslator:
             print(f"\n处理后答案:\n{example.get('answer', '')}")
 
 
+# 进程池中的翻译器（每个进程初始化一次）
+_worker_translator: Optional[LocalQATranslator] = None
+
+
+def _init_worker(translator: LocalQATranslator):
+    global _worker_translator
+    _worker_translator = translator
+
+
+def _translate_in_worker(qa_item: Dict) -> Dict:
+    return _worker_translator._translate_or_keep(qa_item)
+
+
 def main():
     """主函数"""
     # 设置路径
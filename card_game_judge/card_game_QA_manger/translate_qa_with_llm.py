@@ -2,13 +2,20 @@
 使用大语言模型进行高质量日文QA翻译
 确保翻译信达雅，通俗易懂，同时保持专有名词准确
 """
+import asyncio
 import json
 import os
-import time
+import sys
 from pathlib import Path
 from typing import Dict, List, Optional
 from dotenv import load_dotenv
 
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app.config import TRANSLATION_BATCH_ITEMS, TRANSLATION_CONCURRENCY, TRANSLATION_RPM
+from app.translation_batch import BatchTranslator
+from app.translation_engine import TranslationEngine
+from app.translation_memory import TranslationMemory, file_version, text_version
+
 # 尝试导入Google Gemini
 try:
     import google.generativeai as genai
@@ -18,6 +25,8 @@ except ImportError:
     print("警告: google-generativeai未安装")
     print("安装方法: pip install google-generativeai")
 
+GEMINI_MODEL = 'gemini-2.0-flash-exp'
+
 
 class LLMQATranslator:
     def __init__(self, 
@@ -25,7 +34,9 @@ class LLMQATranslator:
                  card_data_path: str,
                  input_qa_path: str,
                  output_qa_path: str,
-                 api_key: Optional[str] = None):
+                 api_key: Optional[str] = None,
+                 rpm: float = TRANSLATION_RPM["gemini"],
+                 concurrency: int = TRANSLATION_CONCURRENCY):
         """
         初始化LLM翻译器
         
@@ -35,11 +46,15 @@ class LLMQATranslator:
             input_qa_path: 输入的日文QA JSON路径
             output_qa_path: 输出的中文QA JSON路径
             api_key: Gemini API密钥（可选，从环境变量读取）
+            rpm: 每分钟最多请求数（Gemini 配额）
+            concurrency: 同时进行的请求数
         """
         self.terminology_path = Path(terminology_path)
         self.card_data_path = Path(card_data_path)
         self.input_qa_path = Path(input_qa_path)
         self.output_qa_path = Path(output_qa_path)
+        # 断点文件：每翻译完一条追加一行
+        self.checkpoint_path = self.output_qa_path.with_suffix('.checkpoint.jsonl')
         
         # 加载数据
         self.terminology = self._load_terminology()
@@ -57,10 +72,22 @@ class LLMQATranslator:
             raise ImportError("请安装google-generativeai: pip install google-generativeai")
         
         genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.0-flash-exp')
+        self.model = genai.GenerativeModel(GEMINI_MODEL)
         
         # 构建翻译提示词
         self.translation_prompt = self._build_translation_prompt()
+        
+        self.engine = TranslationEngine(rpm=rpm, concurrency=concurrency)
+        self.memory = TranslationMemory(
+            prompt_version=text_version(GEMINI_MODEL, self.translation_prompt),
+            terminology_version=file_version(self.terminology_path, self.card_data_path),
+        )
+        # 多个QA的问题和答案合并为一次请求
+        self.batcher = BatchTranslator(
+            lambda prompt: self.engine.call(self._generate, prompt),
+            self.translation_prompt,
+            memory=self.memory,
+        )
     
     def _load_terminology(self) -> Dict[str, str]:
         """加载术语表"""
@@ -149,40 +176,50 @@ class LLMQATranslator:
         card_info = self.card_mapping[card_no]
         return f"\n\n卡牌信息：\n- 卡号: {card_no}\n- 日文名: {card_info['name_jp']}\n- 中文名: {card_info['name_cn']}"
     
+    def _build_full_prompt(self, text: str, card_no: Optional[str] = None) -> str:
+        card_context = self._get_card_context(card_no)
+        return f"{self.translation_prompt}{card_context}\n\n---\n\n{text}"
+    
+    def _generate(self, prompt: str) -> str:
+        response = self.model.generate_content(prompt)
+        return response.text.strip()
+    
     def translate_text(self, text: str, card_no: Optional[str] = None) -> str:
         """使用LLM翻译文本"""
         if not text:
             return text
         
-        # 构建完整提示
-        card_context = self._get_card_context(card_no)
-        full_prompt = f"{self.translation_prompt}{card_context}\n\n---\n\n{text}"
-        
         try:
-            response = self.model.generate_content(full_prompt)
-            return response.text.strip()
+            # 提示词带有卡牌信息，相同原文在不同卡牌下分别缓存
+            return self.memory.translate(
+                text, lambda t: self._generate(self._build_full_prompt(t, card_no)),
+                context=self._get_card_context(card_no).strip()
+            )
         except Exception as e:
             print(f"翻译失败: {e}")
             return text
     
-    def translate_qa_item(self, qa_item: Dict) -> Dict:
-        """翻译单个QA条目"""
+    async def translate_text_async(self, text: str, card_no: Optional[str] = None) -> str:
+        """
+        限流并发翻译，同时提交的文本自动合并为一次请求（卡牌信息作为该条的参考）
+        多次重试仍失败时抛出异常（由引擎记为失败）
+        """
+        if not text:
+            return text
+        return await self.batcher.translate(text, context=self._get_card_context(card_no).strip())
+    
+    def _build_translated_item(self, qa_item: Dict, question: str, answer: str) -> Dict:
+        """组装译文条目"""
         translated = qa_item.copy()
         card_no = qa_item.get('card_no', '')
         
-        # 翻译问题
-        question = qa_item.get('question', '')
-        if question:
-            translated_question = self.translate_text(question, card_no)
-            translated['question'] = translated_question
-            translated['question_original'] = question
+        if qa_item.get('question', ''):
+            translated['question'] = question
+            translated['question_original'] = qa_item['question']
         
-        # 翻译答案
-        answer = qa_item.get('answer', '')
-        if answer:
-            translated_answer = self.translate_text(answer, card_no)
-            translated['answer'] = translated_answer
-            translated['answer_original'] = answer
+        if qa_item.get('answer', ''):
+            translated['answer'] = answer
+            translated['answer_original'] = qa_item['answer']
         
         # 更新卡牌名称
         if 'card_name' in qa_item and card_no and card_no in self.card_mapping:
@@ -197,15 +234,30 @@ class LLMQATranslator:
         
         return translated
     
-    def translate_all(self, batch_size: int = 5, delay: float = 2.0, 
-                     start_from: int = 0, max_count: Optional[int] = None):
+    def translate_qa_item(self, qa_item: Dict) -> Dict:
+        """翻译单个QA条目"""
+        card_no = qa_item.get('card_no', '')
+        question = self.translate_text(qa_item.get('question', ''), card_no)
+        answer = self.translate_text(qa_item.get('answer', ''), card_no)
+        return self._build_translated_item(qa_item, question, answer)
+    
+    async def translate_qa_item_async(self, qa_item: Dict) -> Dict:
+        """翻译单个QA条目，问题和答案同时请求"""
+        card_no = qa_item.get('card_no', '')
+        question, answer = await asyncio.gather(
+            self.translate_text_async(qa_item.get('question', ''), card_no),
+            self.translate_text_async(qa_item.get('answer', ''), card_no),
+        )
+        return self._build_translated_item(qa_item, question, answer)
+    
+    def translate_all(self, start_from: int = 0, max_count: Optional[int] = None):
         """
-        翻译所有QA条目
+        并发翻译所有QA条目，速度只受 rpm 配额限制
+        
+        每翻译完一条即追加到断点文件，中断后重新运行会跳过已完成的条目
         
         Args:
-            batch_size: 每批处理的数量
-            delay: 每批之间的延迟（秒）
-            start_from: 从第几条开始（用于断点续传）
+            start_from: 从第几条开始
             max_count: 最多翻译多少条（None表示全部）
         """
         # 加载日文QA
@@ -215,52 +267,31 @@ class LLMQATranslator:
         
         print(f"✓ 加载了 {len(qa_list)} 条QA")
         
-        # 加载已翻译的数据（如果存在）
-        translated_list = []
-        if self.output_qa_path.exists() and start_from > 0:
-            with open(self.output_qa_path, 'r', encoding='utf-8') as f:
-                translated_list = json.load(f)
-            print(f"✓ 加载了 {len(translated_list)} 条已翻译的QA")
-        
         # 确定翻译范围
         end_at = len(qa_list) if max_count is None else min(start_from + max_count, len(qa_list))
-        to_translate = qa_list[start_from:end_at]
+        items = [(str(i), qa_list[i]) for i in range(start_from, end_at)]
         
+        # 每条QA 2 段文本（问题+答案），每次请求最多合并 TRANSLATION_BATCH_ITEMS 段
+        requests = len(items) * 2 / TRANSLATION_BATCH_ITEMS
         print(f"\n开始翻译 (从第 {start_from+1} 条到第 {end_at} 条)...")
-        print(f"预计时间: {len(to_translate) * delay / 60:.1f} 分钟")
+        print(f"并发: {self.engine.concurrency}, 限流: {self.engine.rpm:g} 次/分钟, "
+              f"每次请求最多 {TRANSLATION_BATCH_ITEMS} 段")
+        print(f"预计时间: {requests / self.engine.rpm:.1f} 分钟")
         
-        # 翻译
-        for i, qa_item in enumerate(to_translate, start_from+1):
-            try:
-                print(f"\n[{i}/{end_at}] 翻译中...", end='')
-                
-                translated = self.translate_qa_item(qa_item)
-                translated_list.append(translated)
-                
-                print(f" ✓")
-                
-                # 显示翻译结果
-                if i % 10 == 0:
-                    print(f"\n示例 - QA #{qa_item.get('qa_number', 'N/A')}:")
-                    print(f"原文: {qa_item.get('question', '')[:60]}...")
-                    print(f"译文: {translated.get('question', '')[:60]}...")
-                
-                # 定期保存
-                if i % batch_size == 0:
-                    self._save_progress(translated_list)
-                    if i < end_at:
-                        print(f"\n等待 {delay} 秒...")
-                        time.sleep(delay)
-                    
-            except Exception as e:
-                print(f" ✗ 错误: {e}")
-                # 保留原始数据
-                translated_list.append(qa_item)
+        results, failures = self.engine.run(
+            items, self.translate_qa_item_async, checkpoint=self.checkpoint_path
+        )
         
-        # 最终保存
+        # 按原顺序组装：断点中所有已完成的条目 + 本次失败的条目（保留原文，下次运行重试）
+        indices = sorted(set(map(int, results)) | set(map(int, failures)))
+        translated_list = [results.get(str(i), qa_list[i]) for i in indices]
         self._save_progress(translated_list)
         
-        print(f"\n✓ 翻译完成！共翻译 {len(translated_list)} 条QA")
+        print(f"\n✓ 翻译完成！共 {len(results)} 条QA已翻译，{len(failures)} 条失败")
+        print(f"✓ {self.memory.summary()}, LLM 请求 {self.engine.request_count} 次")
+        print(f"✓ {self.batcher.summary()}")
+        if failures:
+            print(f"  重新运行即可只重试失败的条目")
         print(f"✓ 输出文件: {self.output_qa_path}")
     
     def _save_progress(self, translated_list: List[Dict]):
@@ -305,24 +336,23 @@ def main():
     print("\n翻译模式:")
     print("1. 测试模式 (翻译前10条)")
     print("2. 完整翻译 (翻译全部4634条)")
-    print("3. 断点续传 (从指定位置继续)")
+    print("3. 断点续传 (跳过断点文件中已完成的条目)")
     
     choice = input("\n请选择 (1/2/3): ").strip()
     
     if choice == '1':
         # 测试模式
-        translator.translate_all(batch_size=5, delay=2.0, start_from=0, max_count=10)
+        translator.translate_all(start_from=0, max_count=10)
     elif choice == '2':
         # 完整翻译
-        confirm = input("\n完整翻译需要约2-3小时，确认继续? (y/n): ").strip().lower()
+        confirm = input("\n确认翻译全部QA? (y/n): ").strip().lower()
         if confirm == 'y':
-            translator.translate_all(batch_size=5, delay=2.0)
+            translator.translate_all()
         else:
             print("已取消")
     elif choice == '3':
-        # 断点续传
-        start = int(input("从第几条开始? "))
-        translator.translate_all(batch_size=5, delay=2.0, start_from=start)
+        # 断点续传：已完成的条目记录在断点文件中，直接跳过
+        translator.translate_all()
     else:
         print("无效选择")
 
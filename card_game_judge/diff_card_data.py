@@ -0,0 +1,51 @@
+"""
+生成卡牌数据变更集
+比较卡牌数据目录与上次处理时保存的快照，输出新增/删除/勘误的卡牌和变化的文件，
+供 digimon_data/translate_cards.py 和 rebuild_vectordb.py 的 --changes 只处理变化部分
+
+用法:
+  python diff_card_data.py                                  # 与上次快照比较，并更新快照
+  python diff_card_data.py --no-update                      # 只输出变更集，不更新快照
+  python diff_card_data.py --old old_dir_or_snapshot.json --new ../digimon_card_data
+"""
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from app.config import CARD_CHANGES_FILE, CARD_DATA_DIR, CARD_SNAPSHOT_FILE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成卡牌数据变更集")
+    parser.add_argument("--old", type=str, default=CARD_SNAPSHOT_FILE, help="旧快照文件或卡牌目录")
+    parser.add_argument("--new", type=str, default=CARD_DATA_DIR, help="新卡牌目录或快照文件")
+    parser.add_argument("--output", type=str, default=CARD_CHANGES_FILE, help="变更集输出路径")
+    parser.add_argument("--no-update", action="store_true", help="不更新快照（默认把 --new 目录的快照写入 --old 快照文件）")
+    args = parser.parse_args()
+
+    from app.card_changes import diff_snapshots, load_snapshot, save_json, summary
+
+    old = load_snapshot(args.old)
+    new = load_snapshot(args.new)
+    if not old["cards"]:
+        print(f"⚠️ 旧快照为空（{args.old}），全部卡牌视为新增")
+
+    changes = diff_snapshots(old, new)
+    save_json(changes, args.output)
+
+    print("=" * 50)
+    print(f"卡牌: {len(old['cards'])} → {len(new['cards'])} 张")
+    print(summary(changes))
+    for card_no, fields in list(changes["errata"].items())[:20]:
+        print(f"  勘误 {card_no}: {', '.join(fields)}")
+    print(f"变更集已保存到: {args.output}")
+
+    if not args.no_update and Path(args.new).is_dir() and not Path(args.old).is_dir():
+        save_json(new, args.old)
+        print(f"快照已更新: {args.old}")
+
+
+if __name__ == "__main__":
+    main()
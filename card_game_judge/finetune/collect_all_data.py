@@ -58,12 +58,16 @@ def collect_all_training_data():
         print("   请将卡牌数据文件放置到 origin_data/cards.json")
         print("   跳过卡牌数据收集")
     
-    # 4. 显示统计
-    print("\n【步骤 4】数据统计")
+    # 4. 去重（重印卡生成的问答几乎相同）
+    print("\n【步骤 4】去除重复问答...")
+    collector.deduplicate()
+    
+    # 5. 显示统计
+    print("\n【步骤 5】数据统计")
     collector.print_statistics()
     
-    # 5. 导出数据
-    print("\n【步骤 5】导出训练数据")
+    # 6. 导出数据
+    print("\n【步骤 6】导出训练数据")
     stats = collector.get_statistics()
     
     if stats['total_count'] > 0:
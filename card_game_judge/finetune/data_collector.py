@@ -8,14 +8,26 @@ DTCG 规则微调数据收集脚本
 2. 预留官方 Q&A 上传接口
 3. 支持自定义问答添加
 4. 导出为 JSONL 格式（适合微调）
+5. 流式导出：问答对产生后立即去重（完全重复 + MinHash 近似重复）并写入文件，内存只保留计数
 """
 import json
+import os
 import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 from dataclasses import dataclass, field
 
+# 复用 app 中的规则书条款解析
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app.rulebook_parser import parse_rulebook, chapter_titles, clause_block
+
+sys.path.insert(0, str(Path(__file__).parent))
+from qa_dedupe import MinHasher, NearDuplicateFilter, UNIQUE, normalize_text
+
 
 @dataclass
 class QAPair:
@@ -48,6 +60,87 @@ class QAPair:
         }
 
 
+class QAStreamWriter:
+    """
+    流式导出：问答对去重后立即写入 JSONL（微调格式 / 对话格式）和 JSON（含元数据），
+    只保留来源、标签计数
+    """
+
+    def __init__(self, output_dir: Path, jsonl_file: Optional[str] = None,
+                 json_file: Optional[str] = None, conversation_file: Optional[str] = None,
+                 dedupe: Optional[NearDuplicateFilter] = None):
+        self.dedupe = dedupe
+        self.paths = [output_dir / name for name in (jsonl_file, json_file, conversation_file) if name]
+        self._jsonl = open(output_dir / jsonl_file, 'w', encoding='utf-8') if jsonl_file else None
+        self._json = open(output_dir / json_file, 'w', encoding='utf-8') if json_file else None
+        self._conversation = open(output_dir / conversation_file, 'w', encoding='utf-8') if conversation_file else None
+        if self._json:
+            self._json.write("[")
+        self.written = 0
+        self.source_counts: Dict[str, int] = {}
+        self.tag_counts: Dict[str, int] = {}
+
+    def write(self, qa: QAPair, signature: Optional[Tuple[int, ...]] = None) -> bool:
+        """写出一条问答；重复时返回 False"""
+        if self.dedupe and self.dedupe.check(qa.input, qa.output, signature) != UNIQUE:
+            return False
+        if self._jsonl:
+            self._jsonl.write(json.dumps(qa.to_finetune_format(), ensure_ascii=False) + '\n')
+        if self._json:
+            prefix = "\n" if self.written == 0 else ",\n"
+            self._json.write(prefix + json.dumps(qa.to_dict(), ensure_ascii=False))
+        if self._conversation:
+            conversation = {
+                "conversations": [
+                    {"role": "system", "content": qa.instruction},
+                    {"role": "user", "content": qa.input},
+                    {"role": "assistant", "content": qa.output}
+                ]
+            }
+            self._conversation.write(json.dumps(conversation, ensure_ascii=False) + '\n')
+        self.written += 1
+        self.source_counts[qa.source] = self.source_counts.get(qa.source, 0) + 1
+        for tag in qa.tags:
+            if tag:
+                self.tag_counts[tag] = self.tag_counts.get(tag, 0) + 1
+        return True
+
+    def close(self):
+        if self._json:
+            self._json.write("\n]\n")
+        for f in (self._jsonl, self._json, self._conversation):
+            if f:
+                f.close()
+
+
+class _QASink:
+    """流式模式下替代 *_qa_pairs 列表：append 直接写出，len 为写出（去重后保留）的条数"""
+
+    def __init__(self, writer: QAStreamWriter):
+        self.writer = writer
+        self.count = 0
+
+    def append(self, qa: QAPair, signature: Optional[Tuple[int, ...]] = None):
+        if self.writer.write(qa, signature):
+            self.count += 1
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self):
+        return iter(())
+
+
+def _card_qa_chunk(cards: List[Dict], hasher: Optional[MinHasher]) -> List[Tuple[QAPair, Optional[Tuple[int, ...]]]]:
+    """子进程：一批卡牌的信息和效果问答，以及去重用的 MinHash 签名"""
+    results = []
+    for card in cards:
+        for qa in DTCGDataCollector._card_info_qa(card) + DTCGDataCollector._card_effect_qa(card):
+            signature = hasher.signature(normalize_text(qa.output)) if hasher else None
+            results.append((qa, signature))
+    return results
+
+
 class DTCGDataCollector:
     """DTCG 微调数据收集器"""
     
@@ -70,6 +163,7 @@ class DTCGDataCollector:
         self.official_qa_pairs: List[QAPair] = []
         self.custom_qa_pairs: List[QAPair] = []
         self.card_qa_pairs: List[QAPair] = []  # 新增：卡牌数据问答
+        self._writer: Optional[QAStreamWriter] = None
         
         # 规则书章节标题映射
         self.chapter_titles = {
@@ -105,19 +199,23 @@ class DTCGDataCollector:
         with open(rulebook_path, 'r', encoding='utf-8') as f:
             content = f.read()
         
+        # 按条款编号解析一次，各提取步骤共用
+        clauses = parse_rulebook(content)
+        self.chapter_titles.update(chapter_titles(clauses))
+        
         extracted_count = 0
         
         # 1. 提取带示例的规则条款
-        extracted_count += self._extract_rules_with_examples(content)
+        extracted_count += self._extract_rules_with_examples(clauses)
         
         # 2. 提取关键词效果定义
-        extracted_count += self._extract_keyword_effects(content)
+        extracted_count += self._extract_keyword_effects(clauses)
         
         # 3. 提取效果时机定义
-        extracted_count += self._extract_effect_timings(content)
+        extracted_count += self._extract_effect_timings(clauses)
         
         # 4. 提取基础术语定义
-        extracted_count += self._extract_basic_terms(content)
+        extracted_count += self._extract_basic_terms(clauses)
         
         # 5. 提取游戏流程相关规则
         extracted_count += self._extract_game_flow_rules(content)
@@ -128,19 +226,21 @@ class DTCGDataCollector:
         print(f"✅ 从规则书提取了 {extracted_count} 条问答对")
         return extracted_count
     
-    def _extract_rules_with_examples(self, content: str) -> int:
+    def _extract_rules_with_examples(self, clauses: List[Dict]) -> int:
         """提取带示例的规则条款"""
         count = 0
         
         # 匹配格式: X-X-X. 规则内容（例：示例内容）
-        pattern = r'(\d+-\d+(?:-\d+)*(?:-\d+)*)\.\s*([^（\n]+)（例[：:]\s*([^）]+)）'
-        matches = re.findall(pattern, content)
-        
-        for rule_id, rule_text, example in matches:
-            rule_text = rule_text.strip()
-            example = example.strip()
-            chapter = rule_id.split('-')[0]
-            chapter_name = self.chapter_titles.get(chapter, "")
+        pattern = re.compile(r'([^（]+)（例[：:]\s*([^）]+)）')
+        
+        for clause in clauses:
+            match = pattern.match(clause["title"])
+            if not match:
+                continue
+            rule_id = clause["rule_id"]
+            rule_text = match.group(1).strip()
+            example = match.group(2).strip()
+            chapter_name = self.chapter_titles.get(clause["chapter"], "")
             
             # 问答1: 规则解释
             qa1 = QAPair(
@@ -168,28 +268,26 @@ class DTCGDataCollector:
         
         return count
     
-    def _extract_keyword_effects(self, content: str) -> int:
+    def _extract_keyword_effects(self, clauses: List[Dict]) -> int:
         """提取关键词效果定义"""
         count = 0
         
-        # 匹配关键词效果定义
-        # 格式: 16-X. ≪关键词≫ 或 16-X-1. ≪关键词≫是"..."的关键词效果
-        patterns = [
-            # 完整定义格式
-            r'(16-\d+(?:-\d+)?)\.\s*≪([^≫]+)≫是"([^"]+)"的关键词效果',
-            # 简化格式
-            r'(16-\d+)\.\s*≪([^≫]+)≫\n(16-\d+-1)\.\s*≪\2≫是"([^"]+)"的关键词效果',
-        ]
+        # 格式: 16-X. ≪关键词≫ / 16-X-1. ≪关键词≫是“...”的关键词效果
+        definition_pattern = re.compile(r'≪([^≫]+)≫是["“]([^"”]+)["”]的关键词效果')
+        heading_pattern = re.compile(r'≪([^≫]+)≫')
+        headings = {c["rule_id"]: c["title"] for c in clauses}
         
-        for pattern in patterns:
-            matches = re.findall(pattern, content)
-            for match in matches:
-                if len(match) == 3:
-                    rule_id, keyword, definition = match
-                elif len(match) == 4:
-                    rule_id, keyword, _, definition = match
-                else:
-                    continue
+        for i, clause in enumerate(clauses):
+            if clause["chapter"] != "16":
+                continue
+            
+            match = definition_pattern.match(clause["title"])
+            if match:
+                keyword, definition = match.groups()
+                # 定义写在子条款中时，引用关键词所在的节
+                rule_id = clause["rule_id"]
+                if headings.get(clause["parent"]) == f"≪{keyword}≫":
+                    rule_id = clause["parent"]
                 
                 # 问答1: 关键词解释
                 qa1 = QAPair(
@@ -202,27 +300,23 @@ class DTCGDataCollector:
                 )
                 self.rule_qa_pairs.append(qa1)
                 count += 1
-        
-        # 提取更详细的关键词效果说明
-        keyword_sections = re.findall(
-            r'(16-\d+)\.\s*≪([^≫]+)≫\n((?:16-\d+-\d+\.[^\n]+\n?)+)',
-            content
-        )
-        
-        for section_id, keyword, details in keyword_sections:
-            # 提取所有子规则
-            sub_rules = re.findall(r'(16-\d+-\d+)\.\s*([^\n]+)', details)
-            if sub_rules:
+                continue
+            
+            # 提取更详细的关键词效果说明（标题只有关键词的节及其所有子条款）
+            match = heading_pattern.fullmatch(clause["title"])
+            sub_rules = clause_block(clauses, i)[1:]
+            if match and sub_rules:
+                keyword = match.group(1)
                 full_explanation = f"≪{keyword}≫的详细规则：\n\n"
-                for sub_id, sub_text in sub_rules:
-                    full_explanation += f"• {sub_text}\n"
+                for sub_rule in sub_rules:
+                    full_explanation += f"• {sub_rule['title']}\n"
                 
                 qa = QAPair(
                     instruction=self.SYSTEM_INSTRUCTIONS["keyword"],
                     input=f"请详细解释≪{keyword}≫的所有规则细节。",
                     output=full_explanation.strip(),
                     source="keyword_detail",
-                    rule_id=section_id,
+                    rule_id=clause["rule_id"],
                     tags=["关键词效果", keyword, "详细规则"]
                 )
                 self.rule_qa_pairs.append(qa)
@@ -230,16 +324,22 @@ class DTCGDataCollector:
         
         return count
     
-    def _extract_effect_timings(self, content: str) -> int:
+    def _extract_effect_timings(self, clauses: List[Dict]) -> int:
         """提取效果时机定义"""
         count = 0
         
         # 匹配效果时机定义
         # 格式: 15-16-X. 【时机】效果是...
-        pattern = r'(15-16-\d+(?:-\d+)?)\.\s*【([^】]+)】效果是[，,]?([^。]+)。'
-        matches = re.findall(pattern, content)
+        pattern = re.compile(r'【([^】]+)】效果是[，,]?([^。]+)。')
         
-        for rule_id, timing, definition in matches:
+        for clause in clauses:
+            if not clause["rule_id"].startswith("15-16-"):
+                continue
+            match = pattern.match(clause["title"])
+            if not match:
+                continue
+            rule_id = clause["rule_id"]
+            timing, definition = match.groups()
             qa = QAPair(
                 instruction=self.SYSTEM_INSTRUCTIONS["timing"],
                 input=f"【{timing}】效果是什么时候触发的？如何处理？",
@@ -253,34 +353,34 @@ class DTCGDataCollector:
         
         return count
     
-    def _extract_basic_terms(self, content: str) -> int:
+    def _extract_basic_terms(self, clauses: List[Dict]) -> int:
         """提取基础术语定义"""
         count = 0
         
-        # 提取第4章的术语定义
-        term_patterns = [
-            # 格式: 4-X. 术语名\n4-X-1. 定义
-            r'(4-\d+)\.\s*([^\n]+)\n\1-1\.\s*"?\1?"?是指([^。]+)。',
-            # 格式: 4-X-1. "术语"是指...
-            r'(4-\d+-1)\.\s*"([^"]+)"是指([^。]+)。',
-        ]
+        # 第4章: 4-X. 术语名 / 4-X-1. “术语”是指…。
+        pattern = re.compile(r'(?:["“]([^"”]{1,15})["”]|([^，。“"]{1,15}?))(?:是指|指)([^。]+)。')
+        titles = {c["rule_id"]: c["title"] for c in clauses}
         
-        for pattern in term_patterns:
-            matches = re.findall(pattern, content)
-            for match in matches:
-                if len(match) == 3:
-                    rule_id, term, definition = match
-                    
-                    qa = QAPair(
-                        instruction=self.SYSTEM_INSTRUCTIONS["general"],
-                        input=f"在DTCG中，「{term}」是什么意思？",
-                        output=f"「{term}」是指{definition}。\n\n（参考规则 {rule_id}）",
-                        source="basic_term",
-                        rule_id=rule_id,
-                        tags=["基础术语", term]
-                    )
-                    self.rule_qa_pairs.append(qa)
-                    count += 1
+        for clause in clauses:
+            rule_id = clause["rule_id"]
+            if clause["chapter"] != "4" or not re.fullmatch(r'4-\d+-1', rule_id):
+                continue
+            match = pattern.match(clause["title"])
+            if not match:
+                continue
+            term = match.group(1) or titles.get(clause["parent"], match.group(2))
+            definition = match.group(3)
+            
+            qa = QAPair(
+                instruction=self.SYSTEM_INSTRUCTIONS["general"],
+                input=f"在DTCG中，「{term}」是什么意思？",
+                output=f"「{term}」是指{definition}。\n\n（参考规则 {rule_id}）",
+                source="basic_term",
+                rule_id=rule_id,
+                tags=["基础术语", term]
+            )
+            self.rule_qa_pairs.append(qa)
+            count += 1
         
         return count
     
@@ -475,15 +575,17 @@ class DTCGDataCollector:
     
     # ==================== 卡牌数据处理 ====================
     
-    def load_card_data(self, card_data_path: str) -> int:
+    def load_card_data(self, card_data_path: str, workers: int = 1, chunk_size: int = 200) -> int:
         """
         从卡牌数据文件加载并生成训练数据
         
         Args:
             card_data_path: 卡牌数据 JSON 文件路径
+            workers: 生成卡牌信息/效果问答的进程数（流式去重时签名也在子进程中计算）
+            chunk_size: 每个子任务的卡牌数
         
         Returns:
-            生成的问答数量
+            生成的问答数量（去重前）
         """
         card_data_path = Path(card_data_path)
         if not card_data_path.exists():
@@ -497,122 +599,147 @@ class DTCGDataCollector:
         print(f"✅ 加载了 {len(cards)} 张卡牌")
         
         count = 0
-        count += self._generate_card_info_qa(cards)
-        count += self._generate_card_effect_qa(cards)
+        if workers > 1:
+            count += self._generate_card_qa_parallel(cards, workers, chunk_size)
+        else:
+            count += self._generate_card_info_qa(cards)
+            count += self._generate_card_effect_qa(cards)
         count += self._generate_card_search_qa(cards)
         count += self._generate_card_comparison_qa(cards)
         
         print(f"✅ 从卡牌数据生成了 {count} 条问答对")
         return count
     
+    def _generate_card_qa_parallel(self, cards: List[Dict], workers: int, chunk_size: int) -> int:
+        """多进程生成卡牌信息和效果问答，按卡牌顺序依次写出"""
+        dedupe = self._writer.dedupe if self._writer else None
+        hasher = dedupe.hasher if dedupe and dedupe.threshold is not None else None
+        chunks = [cards[i:i + chunk_size] for i in range(0, len(cards), chunk_size)]
+        count = 0
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for results in executor.map(_card_qa_chunk, chunks, [hasher] * len(chunks)):
+                for qa, signature in results:
+                    if self._writer:
+                        self.card_qa_pairs.append(qa, signature)
+                    else:
+                        self.card_qa_pairs.append(qa)
+                    count += 1
+        return count
+    
     def _generate_card_info_qa(self, cards: List[Dict]) -> int:
         """生成卡牌基本信息问答"""
         count = 0
-        
         for card in cards:
-            card_no = card.get("card_no", "")
-            name_cn = card.get("name_cn", "")
-            name_jp = card.get("name_jp", "")
-            
-            if not card_no or not name_cn:
-                continue
-            
+            for qa in self._card_info_qa(card):
+                self.card_qa_pairs.append(qa)
+                count += 1
+        return count
+    
+    @classmethod
+    def _card_info_qa(cls, card: Dict) -> List[QAPair]:
+        """单张卡牌的基本信息问答"""
+        pairs = []
+        card_no = card.get("card_no", "")
+        name_cn = card.get("name_cn", "")
+        name_jp = card.get("name_jp", "")
+        
+        if card_no and name_cn:
             # 构建卡牌完整信息
-            card_info = self._format_card_info(card)
+            card_info = cls._format_card_info(card)
             
             # 问答1: 通过卡号查询卡牌信息
             qa1 = QAPair(
-                instruction=self.SYSTEM_INSTRUCTIONS["card"],
+                instruction=cls.SYSTEM_INSTRUCTIONS["card"],
                 input=f"{card_no} 是什么卡？请提供详细信息。",
                 output=card_info,
                 source="card_data",
                 card_no=card_no,
                 tags=["卡牌信息", card.get("type", "")]
             )
-            self.card_qa_pairs.append(qa1)
-            count += 1
+            pairs.append(qa1)
             
             # 问答2: 通过卡名查询卡牌信息
             qa2 = QAPair(
-                instruction=self.SYSTEM_INSTRUCTIONS["card"],
+                instruction=cls.SYSTEM_INSTRUCTIONS["card"],
                 input=f"请介绍一下「{name_cn}」这张卡。",
                 output=card_info,
                 source="card_data",
                 card_no=card_no,
                 tags=["卡牌信息", card.get("type", "")]
             )
-            self.card_qa_pairs.append(qa2)
-            count += 1
+            pairs.append(qa2)
             
             # 如果有日文名，也生成日文名查询
             if name_jp and name_jp != name_cn:
                 qa3 = QAPair(
-                    instruction=self.SYSTEM_INSTRUCTIONS["card"],
+                    instruction=cls.SYSTEM_INSTRUCTIONS["card"],
                     input=f"「{name_jp}」是什么卡？",
                     output=f"「{name_jp}」的中文名是「{name_cn}」。\n\n{card_info}",
                     source="card_data",
                     card_no=card_no,
                     tags=["卡牌信息", "日文名"]
                 )
-                self.card_qa_pairs.append(qa3)
-                count += 1
-        
-        return count
+                pairs.append(qa3)
+            
+        return pairs
     
     def _generate_card_effect_qa(self, cards: List[Dict]) -> int:
         """生成卡牌效果相关问答"""
         count = 0
-        
         for card in cards:
-            card_no = card.get("card_no", "")
-            name_cn = card.get("name_cn", "")
-            effect = card.get("effect", "")
-            inherited_effect = card.get("inherited_effect", "")
-            security_effect = card.get("security_effect", "")
-            
-            if not card_no or not name_cn:
-                continue
-            
+            for qa in self._card_effect_qa(card):
+                self.card_qa_pairs.append(qa)
+                count += 1
+        return count
+    
+    @classmethod
+    def _card_effect_qa(cls, card: Dict) -> List[QAPair]:
+        """单张卡牌的效果问答"""
+        pairs = []
+        card_no = card.get("card_no", "")
+        name_cn = card.get("name_cn", "")
+        effect = card.get("effect", "")
+        inherited_effect = card.get("inherited_effect", "")
+        security_effect = card.get("security_effect", "")
+        
+        if card_no and name_cn:
             # 问答1: 卡牌效果查询
             if effect:
                 qa1 = QAPair(
-                    instruction=self.SYSTEM_INSTRUCTIONS["card"],
+                    instruction=cls.SYSTEM_INSTRUCTIONS["card"],
                     input=f"{card_no} {name_cn} 的效果是什么？",
                     output=f"【{card_no}】{name_cn}\n\n效果：{effect}",
                     source="card_effect",
                     card_no=card_no,
                     tags=["卡牌效果"]
                 )
-                self.card_qa_pairs.append(qa1)
-                count += 1
-            
+                pairs.append(qa1)
+                
             # 问答2: 进化源效果查询
             if inherited_effect:
                 qa2 = QAPair(
-                    instruction=self.SYSTEM_INSTRUCTIONS["card"],
+                    instruction=cls.SYSTEM_INSTRUCTIONS["card"],
                     input=f"{card_no} {name_cn} 的进化源效果是什么？",
                     output=f"【{card_no}】{name_cn}\n\n进化源效果：{inherited_effect}",
                     source="card_effect",
                     card_no=card_no,
                     tags=["进化源效果"]
                 )
-                self.card_qa_pairs.append(qa2)
-                count += 1
-            
+                pairs.append(qa2)
+                
             # 问答3: 安防效果查询
             if security_effect:
                 qa3 = QAPair(
-                    instruction=self.SYSTEM_INSTRUCTIONS["card"],
+                    instruction=cls.SYSTEM_INSTRUCTIONS["card"],
                     input=f"{card_no} {name_cn} 的安防效果是什么？",
                     output=f"【{card_no}】{name_cn}\n\n安防效果：{security_effect}",
                     source="card_effect",
                     card_no=card_no,
                     tags=["安防效果"]
                 )
-                self.card_qa_pairs.append(qa3)
-                count += 1
-        
-        return count
+                pairs.append(qa3)
+            
+        return pairs
     
     def _generate_card_search_qa(self, cards: List[Dict]) -> int:
         """生成卡牌搜索相关问答"""
@@ -730,7 +857,8 @@ class DTCGDataCollector:
         
         return count
     
-    def _format_card_info(self, card: Dict) -> str:
+    @staticmethod
+    def _format_card_info(card: Dict) -> str:
         """格式化卡牌完整信息"""
         info = f"【{card.get('card_no', '')}】{card.get('name_cn', '')}"
         
@@ -775,8 +903,51 @@ class DTCGDataCollector:
     
     # ==================== 数据导出 ====================
     
+    @contextmanager
+    def stream(self, jsonl_file: Optional[str] = "dtcg_finetune_data.jsonl",
+               json_file: Optional[str] = None, conversation_file: Optional[str] = None,
+               dedupe_threshold: Optional[float] = 0.85, dedupe: bool = True):
+        """
+        流式导出：with 块内产生的问答对去重后直接写入文件，不再保存在内存中
+        
+        用法:
+            with collector.stream("dtcg_finetune_data.jsonl", dedupe_threshold=0.85):
+                collector.extract_from_rulebook(path)
+                collector.load_card_data(card_path, workers=4)
+            collector.print_statistics()
+        
+        Args:
+            dedupe_threshold: 近似重复的 Jaccard 相似度阈值，为空时只去除完全重复
+            dedupe: 为 False 时不去重
+        """
+        filter_ = NearDuplicateFilter(threshold=dedupe_threshold) if dedupe else None
+        self._writer = QAStreamWriter(self.output_dir, jsonl_file, json_file, conversation_file, filter_)
+        self.rule_qa_pairs = _QASink(self._writer)
+        self.official_qa_pairs = _QASink(self._writer)
+        self.custom_qa_pairs = _QASink(self._writer)
+        self.card_qa_pairs = _QASink(self._writer)
+        try:
+            yield self._writer
+        finally:
+            self._writer.close()
+            for path in self._writer.paths:
+                print(f"✅ 导出 {self._writer.written} 条数据到: {path}")
+            if filter_:
+                print(f"🧹 去重: {filter_.summary()}")
+    
+    def deduplicate(self, threshold: Optional[float] = 0.85) -> Dict[str, int]:
+        """非流式模式：导出前去除已收集问答中的完全重复和近似重复（保留先出现的）"""
+        dedupe = NearDuplicateFilter(threshold=threshold)
+        for name in ("rule_qa_pairs", "official_qa_pairs", "custom_qa_pairs", "card_qa_pairs"):
+            pairs = getattr(self, name)
+            setattr(self, name, [qa for qa in pairs if dedupe.check(qa.input, qa.output) == UNIQUE])
+        print(f"🧹 去重: {dedupe.summary()}")
+        return dict(dedupe.counts)
+    
     def get_all_qa_pairs(self) -> List[QAPair]:
         """获取所有问答对"""
+        if self._writer:
+            raise RuntimeError("流式模式下问答对已直接写入文件，不在内存中保存")
         return self.rule_qa_pairs + self.official_qa_pairs + self.custom_qa_pairs + self.card_qa_pairs
     
     def export_jsonl(self, filename: str = None, 
@@ -849,6 +1020,17 @@ class DTCGDataCollector:
     
     def get_statistics(self) -> Dict:
         """获取数据统计"""
+        if self._writer:
+            return {
+                "rule_qa_count": len(self.rule_qa_pairs),
+                "official_qa_count": len(self.official_qa_pairs),
+                "custom_qa_count": len(self.custom_qa_pairs),
+                "card_qa_count": len(self.card_qa_pairs),
+                "total_count": self._writer.written,
+                "source_distribution": dict(self._writer.source_counts),
+                "tag_distribution": dict(self._writer.tag_counts)
+            }
+        
         all_qa = self.get_all_qa_pairs()
         
         # 统计各来源数量
@@ -945,6 +1127,12 @@ def main():
                         help="创建 Q&A 模板文件")
     parser.add_argument("--no-cards", action="store_true",
                         help="不加载卡牌数据")
+    parser.add_argument("--workers", type=int, default=max(1, min(8, os.cpu_count() or 1)),
+                        help="生成卡牌问答的进程数")
+    parser.add_argument("--dedupe-threshold", type=float, default=0.85,
+                        help="近似重复的相似度阈值（MinHash 估计的 Jaccard 相似度）")
+    parser.add_argument("--no-dedupe", action="store_true",
+                        help="不去重")
     
     args = parser.parse_args()
     
@@ -956,44 +1144,41 @@ def main():
     # 初始化收集器
     collector = DTCGDataCollector(output_dir=args.output_dir)
     
-    # 1. 从规则书提取
-    rulebook_path = Path(__file__).parent / args.rulebook
-    if rulebook_path.exists():
-        collector.extract_from_rulebook(str(rulebook_path))
-    else:
-        print(f"⚠️ 规则书不存在: {rulebook_path}")
-    
-    # 2. 加载官方 Q&A
-    if args.qa_file:
-        collector.load_official_qa_from_file(args.qa_file)
-    else:
-        # 尝试加载默认位置的 Q&A 文件
-        default_qa = Path(__file__).parent / "training_data" / "official_qa.json"
-        if default_qa.exists():
-            collector.load_official_qa_from_file(str(default_qa))
-    
-    # 3. 加载卡牌数据
-    if not args.no_cards:
-        card_data_path = Path(__file__).parent / args.card_data
-        if card_data_path.exists():
-            collector.load_card_data(str(card_data_path))
+    # 问答对边产生边去重、写出
+    with collector.stream(
+        jsonl_file="dtcg_finetune_data.jsonl" if args.format in ["jsonl", "all"] else None,
+        json_file="dtcg_finetune_data.json" if args.format in ["json", "all"] else None,
+        conversation_file="dtcg_conversation.jsonl" if args.format in ["conversation", "all"] else None,
+        dedupe_threshold=args.dedupe_threshold, dedupe=not args.no_dedupe
+    ):
+        # 1. 从规则书提取
+        rulebook_path = Path(__file__).parent / args.rulebook
+        if rulebook_path.exists():
+            collector.extract_from_rulebook(str(rulebook_path))
         else:
-            print(f"⚠️ 卡牌数据不存在: {card_data_path}")
-            print(f"   提示：使用 --card-data 指定卡牌数据路径，或使用 --no-cards 跳过")
+            print(f"⚠️ 规则书不存在: {rulebook_path}")
+        
+        # 2. 加载官方 Q&A
+        if args.qa_file:
+            collector.load_official_qa_from_file(args.qa_file)
+        else:
+            # 尝试加载默认位置的 Q&A 文件
+            default_qa = Path(__file__).parent / "training_data" / "official_qa.json"
+            if default_qa.exists():
+                collector.load_official_qa_from_file(str(default_qa))
+        
+        # 3. 加载卡牌数据
+        if not args.no_cards:
+            card_data_path = Path(__file__).parent / args.card_data
+            if card_data_path.exists():
+                collector.load_card_data(str(card_data_path), workers=args.workers)
+            else:
+                print(f"⚠️ 卡牌数据不存在: {card_data_path}")
+                print(f"   提示：使用 --card-data 指定卡牌数据路径，或使用 --no-cards 跳过")
     
     # 4. 显示统计
     collector.print_statistics()
-    
-    # 5. 导出数据
-    stats = collector.get_statistics()
-    if stats['total_count'] > 0:
-        if args.format in ["jsonl", "all"]:
-            collector.export_jsonl("dtcg_finetune_data.jsonl")
-        if args.format in ["json", "all"]:
-            collector.export_json("dtcg_finetune_data.json")
-        if args.format in ["conversation", "all"]:
-            collector.export_conversation_format("dtcg_conversation.jsonl")
-    else:
+    if collector.get_statistics()['total_count'] == 0:
         print("⚠️ 没有数据可导出")
 
 
@@ -2,9 +2,23 @@
 """
 DTCG 规则微调脚本 - 使用 LoRA 微调 Qwen2
 支持 Qwen2-1.5B, Qwen2-7B, Qwen2.5 等模型
+
+补齐方式（--padding）:
+  max_length       每条样本补齐到 max_length（旧行为）
+  dynamic          按批内最长样本动态补齐（默认）
+  group_by_length  长度相近的样本分到同一批，再动态补齐
+  packing          多条样本拼接成一条序列；position_ids 在每条样本处归零，
+                   注意力掩码为块对角因果掩码，样本之间互不可见
+
+分词（及打包）结果以 Arrow 格式缓存在 dataset_cache_dir/<指纹>/，指纹由训练数据文件哈希、分词器
+（名称、版本、词表）、max_length、data_format 和补齐方式决定；只调整 LoRA / 训练超参数时直接复用。
 """
 import os
 import json
+import math
+import random
+import hashlib
+import shutil
 import torch
 from pathlib import Path
 from dataclasses import dataclass, field
@@ -27,11 +41,130 @@ from peft import (
     TaskType,
     PeftModel
 )
-from datasets import Dataset
+from datasets import Dataset, load_from_disk
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+PADDING_MODES = ("max_length", "dynamic", "group_by_length", "packing")
+IGNORE_INDEX = -100
+# 分词/打包逻辑变化时递增，使旧缓存失效
+TOKENIZE_CACHE_VERSION = 1
+
+
+def pack_sequences(lengths: List[int], max_length: int) -> List[List[int]]:
+    """首次适应递减（FFD）装箱：把样本下标分组，每组总长度不超过 max_length"""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    bins, free = [], []
+    for i in order:
+        for b, space in enumerate(free):
+            if lengths[i] <= space:
+                bins[b].append(i)
+                free[b] -= lengths[i]
+                break
+        else:
+            bins.append([i])
+            free.append(max_length - lengths[i])
+    return bins
+
+
+def padding_ratio(lengths: List[int], batch_size: int, max_length: int, mode: str,
+                  pad_to_multiple_of: int = 8, seed: int = 42) -> float:
+    """
+    估算补齐 token 占全部 token 的比例
+    lengths 为每条训练序列的长度（packing 时为装箱后每条序列的总长度）；
+    group_by_length 与 Trainer 的 LengthGroupedSampler 一样，在每 50 批的大批内按长度排序
+    """
+    if not lengths:
+        return 0.0
+    if mode == "max_length":
+        return 1 - sum(lengths) / (len(lengths) * max_length)
+
+    order = list(range(len(lengths)))
+    random.Random(seed).shuffle(order)
+    if mode == "group_by_length":
+        mega = batch_size * 50
+        order = [i for k in range(0, len(order), mega)
+                 for i in sorted(order[k:k + mega], key=lambda i: lengths[i], reverse=True)]
+
+    real = padded = 0
+    for k in range(0, len(order), batch_size):
+        batch = [lengths[i] for i in order[k:k + batch_size]]
+        longest = math.ceil(max(batch) / pad_to_multiple_of) * pad_to_multiple_of
+        real += sum(batch)
+        padded += longest * len(batch)
+    return 1 - real / padded
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tokenize_examples(examples: Dict, tokenizer, max_length: int, padding: str) -> Dict:
+    """
+    分词（datasets.map 的批处理函数）
+    放在模块级并通过 fn_kwargs 传参，num_proc > 1 时子进程不需要序列化整个训练器（包括模型）
+    """
+    columns = [key for key in ("instruction", "input", "output") if key in examples]
+    texts = [DTCGFineTuner.format_example(dict(zip(columns, row)))
+             for row in zip(*(examples[key] for key in columns))]
+
+    # 除 max_length 方式外不在这里补齐：补齐交给 collator（动态补齐）或打包
+    tokenized = tokenizer(
+        texts, truncation=True, max_length=max_length,
+        padding="max_length" if padding == "max_length" else False, return_tensors=None
+    )
+    tokenized["labels"] = [
+        [token if mask else IGNORE_INDEX for token, mask in zip(ids, attention)]
+        for ids, attention in zip(tokenized["input_ids"], tokenized["attention_mask"])
+    ]
+    return tokenized
+
+
+class PackedDataCollator:
+    """
+    打包序列的批处理：右侧补齐到本批最长（pad_to_multiple_of 的倍数）
+
+    use_4d_mask=True 时生成 [batch, 1, L, L] 的加性注意力掩码（块对角 + 因果），
+    eager / sdpa 注意力均适用；flash_attention_2 下不传掩码，由归零的 position_ids 区分样本。
+    补齐位置各自成段、只看自己，不会出现整行被屏蔽的 NaN。
+    """
+
+    def __init__(self, pad_token_id: int, use_4d_mask: bool = True,
+                 dtype: torch.dtype = torch.float16, pad_to_multiple_of: int = 8):
+        self.pad_token_id = pad_token_id
+        self.use_4d_mask = use_4d_mask
+        self.dtype = dtype
+        self.pad_to_multiple_of = pad_to_multiple_of
+
+    def __call__(self, features: List[Dict]) -> Dict[str, torch.Tensor]:
+        longest = max(len(f["input_ids"]) for f in features)
+        seq_len = math.ceil(longest / self.pad_to_multiple_of) * self.pad_to_multiple_of
+        batch_size = len(features)
+
+        input_ids = torch.full((batch_size, seq_len), self.pad_token_id, dtype=torch.long)
+        labels = torch.full((batch_size, seq_len), IGNORE_INDEX, dtype=torch.long)
+        position_ids = torch.zeros((batch_size, seq_len), dtype=torch.long)
+        for row, feature in enumerate(features):
+            n = len(feature["input_ids"])
+            input_ids[row, :n] = torch.tensor(feature["input_ids"])
+            labels[row, :n] = torch.tensor(feature["labels"])
+            position_ids[row, :n] = torch.tensor(feature["position_ids"])
+
+        batch = {"input_ids": input_ids, "labels": labels, "position_ids": position_ids}
+        if self.use_4d_mask:
+            segments = (position_ids == 0).cumsum(dim=-1)
+            same_segment = segments[:, :, None] == segments[:, None, :]
+            causal = torch.tril(torch.ones(seq_len, seq_len, dtype=torch.bool))
+            allowed = (same_segment & causal)[:, None, :, :]
+            mask = torch.zeros(allowed.shape, dtype=self.dtype)
+            batch["attention_mask"] = mask.masked_fill(~allowed, torch.finfo(self.dtype).min)
+        return batch
+
 
 @dataclass
 class FinetuneConfig:
@@ -41,6 +174,14 @@ class FinetuneConfig:
     eval_data_path: Optional[str] = None
     max_length: int = 1024
     data_format: str = "instruction"
+    padding: str = "dynamic"  # 见 PADDING_MODES
+    pad_to_multiple_of: int = 8
+    attn_implementation: Optional[str] = None  # eager / sdpa / flash_attention_2，为空时由 transformers 决定
+    model_revision: Optional[str] = None  # 模型/分词器的版本（分支、tag 或 commit）
+
+    # 分词缓存
+    dataset_cache_dir: Optional[str] = "output/tokenized_cache"  # 为空时不缓存
+    num_proc: int = max(1, min(8, (os.cpu_count() or 1) // 2))
     
     # LoRA 配置
     lora_r: int = 64
@@ -85,7 +226,8 @@ class DTCGFineTuner:
     def load_tokenizer(self):
         logger.info(f"📥 加载分词器: {self.config.model_name}")
         self.tokenizer = AutoTokenizer.from_pretrained(
-            self.config.model_name, trust_remote_code=True, padding_side="right"
+            self.config.model_name, trust_remote_code=True, padding_side="right",
+            revision=self.config.model_revision
         )
         if self.tokenizer.pad_token is None:
             self.tokenizer.pad_token = self.tokenizer.eos_token
@@ -111,7 +253,10 @@ class DTCGFineTuner:
             quantization_config=bnb_config,
             device_map="auto",
             trust_remote_code=True,
-            torch_dtype=torch.float16
+            torch_dtype=torch.float16,
+            revision=self.config.model_revision,
+            **({"attn_implementation": self.config.attn_implementation}
+               if self.config.attn_implementation else {})
         )
         
         if self.config.use_4bit:
@@ -149,35 +294,148 @@ class DTCGFineTuner:
         self.dataset = Dataset.from_list(data_list)
         return self.dataset
     
-    def format_example(self, example: Dict) -> str:
-        system = example.get("instruction", self.DEFAULT_SYSTEM)
+    @classmethod
+    def format_example(cls, example: Dict) -> str:
+        """单条样本 → ChatML 训练文本（tokenize_examples 逐条调用）"""
+        system = example.get("instruction", cls.DEFAULT_SYSTEM)
         user = example.get("input", "")
         assistant = example.get("output", "")
-        return self.CHATML_TEMPLATE.format(system=system, user=user, assistant=assistant)
-    
-    def tokenize_function(self, examples):
-        texts = [self.format_example({"instruction": i, "input": inp, "output": o}) 
-                 for i, inp, o in zip(
-                     examples.get("instruction", [self.DEFAULT_SYSTEM]*len(examples["input"])),
-                     examples["input"], examples["output"])]
-        
-        tokenized = self.tokenizer(
-            texts, truncation=True, max_length=self.config.max_length,
-            padding="max_length", return_tensors=None
+        return cls.CHATML_TEMPLATE.format(system=system, user=user, assistant=assistant)
+
+    def pack_dataset(self, tokenized_dataset: Dataset) -> Dataset:
+        """
+        把分词后的样本装箱拼接成不超过 max_length 的序列
+        每条样本的 position_ids 从 0 开始；样本首个 token 的 label 置为 IGNORE_INDEX，
+        避免用上一条样本的末尾去预测下一条样本的开头
+        """
+        all_ids = tokenized_dataset["input_ids"]
+        all_labels = tokenized_dataset["labels"]
+        bins = pack_sequences([len(ids) for ids in all_ids], self.config.max_length)
+
+        packed = {"input_ids": [], "labels": [], "position_ids": []}
+        for group in bins:
+            input_ids, labels, position_ids = [], [], []
+            for i in group:
+                input_ids.extend(all_ids[i])
+                labels.extend([IGNORE_INDEX] + list(all_labels[i][1:]))
+                position_ids.extend(range(len(all_ids[i])))
+            packed["input_ids"].append(input_ids)
+            packed["labels"].append(labels)
+            packed["position_ids"].append(position_ids)
+        return Dataset.from_dict(packed)
+
+    def dataset_fingerprint(self) -> str:
+        """分词结果的指纹：数据文件内容、分词器和影响分词/打包结果的配置"""
+        if not Path(self.config.train_data_path).exists():
+            raise FileNotFoundError(f"训练数据不存在: {self.config.train_data_path}")
+        vocab = json.dumps(sorted(self.tokenizer.get_vocab().items()), ensure_ascii=False)
+        key = {
+            "version": TOKENIZE_CACHE_VERSION,
+            "data_sha256": file_sha256(self.config.train_data_path),
+            "tokenizer": self.tokenizer.name_or_path,
+            "tokenizer_class": type(self.tokenizer).__name__,
+            "revision": self.config.model_revision,
+            "vocab_sha256": hashlib.sha256(vocab.encode('utf-8')).hexdigest(),
+            "pad_token": self.tokenizer.pad_token,
+            "template": self.CHATML_TEMPLATE,
+            "default_system": self.DEFAULT_SYSTEM,
+            "max_length": self.config.max_length,
+            "data_format": self.config.data_format,
+            "padding": self.config.padding,
+        }
+        text = json.dumps(key, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+    def build_train_dataset(self, fingerprint: Optional[str] = None):
+        """分词（多进程）并按需打包，返回 (训练数据集, 每条样本的 token 数)"""
+        if self.dataset is None: self.load_dataset()
+
+        num_proc = max(1, min(self.config.num_proc, len(self.dataset)))
+        logger.info(f"🔄 处理训练数据... (num_proc={num_proc})")
+        tokenized_dataset = self.dataset.map(
+            tokenize_examples, batched=True, num_proc=num_proc,
+            fn_kwargs={"tokenizer": self.tokenizer, "max_length": self.config.max_length,
+                       "padding": self.config.padding},
+            remove_columns=self.dataset.column_names,
+            new_fingerprint=fingerprint
         )
-        tokenized["labels"] = tokenized["input_ids"].copy()
-        return tokenized
+        example_lengths = [sum(mask) for mask in tokenized_dataset["attention_mask"]]
+        if self.config.padding == "packing":
+            tokenized_dataset = self.pack_dataset(tokenized_dataset)
+        return tokenized_dataset, example_lengths
+
+    def prepare_train_dataset(self):
+        """
+        读取或生成分词后的训练数据集，返回 (训练数据集, 每条样本的 token 数)
+        缓存目录先写到临时目录再改名，中断不会留下不完整的缓存
+        """
+        if self.tokenizer is None: self.load_tokenizer()
+        if not self.config.dataset_cache_dir:
+            return self.build_train_dataset()
+
+        fingerprint = self.dataset_fingerprint()
+        cache_path = Path(self.config.dataset_cache_dir) / fingerprint
+        meta_file = cache_path / "tokenize_meta.json"
+        if meta_file.exists():
+            logger.info(f"♻️ 复用已分词的数据: {cache_path}")
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            return load_from_disk(str(cache_path / "dataset")), meta["example_lengths"]
+
+        tokenized_dataset, example_lengths = self.build_train_dataset(fingerprint)
+
+        tmp_path = cache_path.with_name(f"{fingerprint}.tmp")
+        if tmp_path.exists():
+            shutil.rmtree(tmp_path)
+        tokenized_dataset.save_to_disk(str(tmp_path / "dataset"))
+        with open(tmp_path / "tokenize_meta.json", 'w', encoding='utf-8') as f:
+            json.dump({"train_data_path": self.config.train_data_path, "model_name": self.config.model_name,
+                       "max_length": self.config.max_length, "padding": self.config.padding,
+                       "example_lengths": example_lengths}, f, ensure_ascii=False)
+        if cache_path.exists():
+            shutil.rmtree(cache_path)
+        os.replace(tmp_path, cache_path)
+        logger.info(f"💾 分词结果已缓存: {cache_path}")
+        # 从磁盘重新打开（内存映射），与复用缓存时一致
+        return load_from_disk(str(cache_path / "dataset")), example_lengths
+
+    def report_padding(self, example_lengths: List[int], train_lengths: List[int]):
+        """补齐比例：每条补齐到 max_length（旧行为）vs 当前方式"""
+        batch_size = self.config.per_device_train_batch_size
+        before = padding_ratio(example_lengths, batch_size, self.config.max_length, "max_length")
+        mode = "dynamic" if self.config.padding == "packing" else self.config.padding
+        after = padding_ratio(train_lengths, batch_size, self.config.max_length, mode,
+                              self.config.pad_to_multiple_of, self.config.seed)
+        real_tokens = sum(example_lengths)
+        logger.info(f"📊 样本 {len(example_lengths)} 条, 平均 {real_tokens / max(1, len(example_lengths)):.0f} tokens; "
+                    f"训练序列 {len(train_lengths)} 条")
+        logger.info(f"📊 补齐比例: max_length {before:.1%} → {self.config.padding} {after:.1%} "
+                    f"(每 epoch 需要计算的 token 数约减少为 1/{(1 - after) / max(1e-9, 1 - before):.1f})")
 
     def train(self):
+        if self.config.padding not in PADDING_MODES:
+            raise ValueError(f"未知的补齐方式: {self.config.padding}（可选 {', '.join(PADDING_MODES)}）")
+
         if self.tokenizer is None: self.load_tokenizer()
+        # 先分词再加载模型：分词子进程不需要复制已加载模型的进程
+        tokenized_dataset, example_lengths = self.prepare_train_dataset()
         if self.model is None: self.load_model()
-        if self.dataset is None: self.load_dataset()
-        
-        logger.info("🔄 处理训练数据...")
-        tokenized_dataset = self.dataset.map(
-            self.tokenize_function, batched=True,
-            remove_columns=self.dataset.column_names
-        )
+
+        if self.config.padding == "packing":
+            train_lengths = [len(ids) for ids in tokenized_dataset["input_ids"]]
+            flash = self.config.attn_implementation == "flash_attention_2"
+            data_collator = PackedDataCollator(
+                self.tokenizer.pad_token_id, use_4d_mask=not flash,
+                pad_to_multiple_of=self.config.pad_to_multiple_of
+            )
+        else:
+            train_lengths = example_lengths
+            data_collator = DataCollatorForSeq2Seq(
+                tokenizer=self.tokenizer, model=self.model, padding=True,
+                pad_to_multiple_of=self.config.pad_to_multiple_of,
+                label_pad_token_id=IGNORE_INDEX
+            )
+        self.report_padding(example_lengths, train_lengths)
         
         training_args = TrainingArguments(
             output_dir=self.config.output_dir,
@@ -194,13 +452,10 @@ class DTCGFineTuner:
             lr_scheduler_type="cosine",
             report_to="tensorboard",
             gradient_checkpointing=self.config.gradient_checkpointing,
+            group_by_length=self.config.padding == "group_by_length",
             remove_unused_columns=False
         )
         
-        data_collator = DataCollatorForSeq2Seq(
-            tokenizer=self.tokenizer, model=self.model, padding=True
-        )
-        
         trainer = Trainer(
             model=self.model, args=training_args,
             train_dataset=tokenized_dataset, data_collator=data_collator
@@ -261,7 +516,16 @@ def main():
     parser.add_argument("--epochs", type=int, default=3)
     parser.add_argument("--batch_size", type=int, default=2)
     parser.add_argument("--lora_r", type=int, default=64)
+    parser.add_argument("--max_length", type=int, default=1024)
+    parser.add_argument("--padding", type=str, default="dynamic", choices=PADDING_MODES,
+                        help="补齐方式: max_length / dynamic / group_by_length / packing")
+    parser.add_argument("--attn_implementation", type=str, default=None,
+                        choices=["eager", "sdpa", "flash_attention_2"])
     parser.add_argument("--no_4bit", action="store_true")
+    parser.add_argument("--revision", type=str, default=None, help="模型/分词器版本（分支、tag 或 commit）")
+    parser.add_argument("--num_proc", type=int, default=FinetuneConfig.num_proc, help="分词进程数")
+    parser.add_argument("--cache_dir", type=str, default="output/tokenized_cache", help="分词结果缓存目录")
+    parser.add_argument("--no_cache", action="store_true", help="不读写分词缓存")
     parser.add_argument("--merge", action="store_true")
     
     args = parser.parse_args()
@@ -273,6 +537,12 @@ def main():
         num_train_epochs=args.epochs,
         per_device_train_batch_size=args.batch_size,
         lora_r=args.lora_r,
+        max_length=args.max_length,
+        padding=args.padding,
+        attn_implementation=args.attn_implementation,
+        model_revision=args.revision,
+        dataset_cache_dir=None if args.no_cache else args.cache_dir,
+        num_proc=args.num_proc,
         use_4bit=not args.no_4bit
     )
     
@@ -284,6 +554,7 @@ def main():
     print(f"输出: {config.output_dir}")
     print(f"轮数: {config.num_train_epochs}")
     print(f"LoRA rank: {config.lora_r}")
+    print(f"补齐方式: {config.padding} (max_length={config.max_length})")
     print(f"4-bit 量化: {config.use_4bit}")
     print("=" * 60)
     
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+问答对去重
+
+- 完全重复：规范化文本（问题 + 回答）的 sha256 相同
+- 近似重复：回答的字符 n-gram MinHash 签名经 LSH 分桶找候选，回答（签名估计）和问题（n-gram 精确计算）
+  的 Jaccard 相似度都达到阈值才算重复；同一张卡换一种问法（回答相同）的问答会保留
+
+规范化时卡号替换为占位符、去掉空白，因此只有重印卡（除卡号外效果、数值完全相同）生成的问答会按完全重复合并。
+近似重复只在涉及相同卡号（不含平行卡后缀）的问答之间判断，不同的卡即使问法相同、效果相近也不会合并。
+纯标准库实现；签名计算可以放在生成问答的子进程里完成（MinHasher 可序列化）。
+"""
+import hashlib
+import random
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 卡号（含平行卡后缀 _P1 等）；前后可能紧跟中日文字符，不能用 \b
+CARD_NO_PATTERN = re.compile(r'(?<![A-Za-z0-9])[A-Z]{1,4}\d{0,2}-\d{2,3}(?:_P\d+)?(?![0-9])')
+EXACT = "exact"
+NEAR = "near"
+UNIQUE = "unique"
+
+
+def normalize_text(text: str) -> str:
+    text = CARD_NO_PATTERN.sub("#", text)
+    return re.sub(r'\s+', '', text).lower()
+
+
+def card_numbers(text: str) -> frozenset:
+    """文本中出现的卡号（平行卡 _P1 等视为同一张卡）"""
+    return frozenset(m.split("_P")[0] for m in CARD_NO_PATTERN.findall(text))
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / max(1, len(a | b))
+
+
+class MinHasher:
+    """字符 n-gram 的 MinHash 签名（64 位哈希与随机掩码异或后取最小值）"""
+
+    def __init__(self, num_perm: int = 64, ngram: int = 4, seed: int = 42):
+        self.num_perm = num_perm
+        self.ngram = ngram
+        rnd = random.Random(seed)
+        self.masks = [rnd.getrandbits(64) for _ in range(num_perm)]
+
+    def shingles(self, text: str) -> set:
+        if len(text) <= self.ngram:
+            return {text}
+        return {text[i:i + self.ngram] for i in range(len(text) - self.ngram + 1)}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        """text 应为 normalize_text 的结果"""
+        hashes = [int.from_bytes(hashlib.blake2b(s.encode('utf-8'), digest_size=8).digest(), 'little')
+                  for s in self.shingles(text)]
+        return tuple(min(map(mask.__xor__, hashes)) for mask in self.masks)
+
+
+class NearDuplicateFilter:
+    """
+    用法:
+        dedupe = NearDuplicateFilter(threshold=0.85)
+        for qa in pairs:
+            if dedupe.check(qa.input, qa.output) == UNIQUE:
+                keep(qa)
+        print(dedupe.summary())
+
+    threshold 为空时只去除完全重复。bands × rows 必须等于 num_perm；
+    默认 8 × 8，相似度约 0.77 以上的文本大概率成为候选，再按 threshold 确认。
+    """
+
+    def __init__(self, threshold: Optional[float] = 0.85, hasher: Optional[MinHasher] = None, bands: int = 8):
+        self.threshold = threshold
+        self.hasher = hasher or MinHasher()
+        if self.hasher.num_perm % bands:
+            raise ValueError(f"num_perm ({self.hasher.num_perm}) 必须是 bands ({bands}) 的整数倍")
+        self.bands = bands
+        self.rows = self.hasher.num_perm // bands
+        self._exact = set()
+        self._signatures: List[Tuple[int, ...]] = []
+        self._questions: List[str] = []
+        self._card_numbers: List[frozenset] = []
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [{} for _ in range(bands)]
+        self.counts = {UNIQUE: 0, EXACT: 0, NEAR: 0}
+
+    def _band_keys(self, signature: Sequence[int]):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def _is_near_duplicate(self, question: str, signature: Sequence[int], cards: frozenset) -> bool:
+        question_shingles = None
+        seen = set()
+        for band, key in self._band_keys(signature):
+            for candidate in self._buckets[band].get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                if self._card_numbers[candidate] != cards:
+                    continue
+                other = self._signatures[candidate]
+                similarity = sum(a == b for a, b in zip(signature, other)) / len(signature)
+                if similarity < self.threshold:
+                    continue
+                if question_shingles is None:
+                    question_shingles = self.hasher.shingles(question)
+                if jaccard(question_shingles, self.hasher.shingles(self._questions[candidate])) >= self.threshold:
+                    return True
+        return False
+
+    def check(self, question: str, answer: str, signature: Optional[Sequence[int]] = None) -> str:
+        """
+        判断并记录：unique（保留，加入索引）/ exact / near
+        signature 为预先计算的 hasher.signature(normalize_text(answer))
+        """
+        cards = card_numbers(question) | card_numbers(answer)
+        question, answer = normalize_text(question), normalize_text(answer)
+        key = hashlib.sha256(f"{question}\n{answer}".encode('utf-8')).digest()
+        if key in self._exact:
+            self.counts[EXACT] += 1
+            return EXACT
+        self._exact.add(key)
+
+        if self.threshold is not None:
+            signature = signature or self.hasher.signature(answer)
+            if self._is_near_duplicate(question, signature, cards):
+                self.counts[NEAR] += 1
+                return NEAR
+            doc_id = len(self._signatures)
+            self._signatures.append(tuple(signature))
+            self._questions.append(question)
+            self._card_numbers.append(cards)
+            for band, band_key in self._band_keys(signature):
+                self._buckets[band].setdefault(band_key, []).append(doc_id)
+
+        self.counts[UNIQUE] += 1
+        return UNIQUE
+
+    def summary(self) -> str:
+        total = sum(self.counts.values())
+        removed = self.counts[EXACT] + self.counts[NEAR]
+        return (f"输入 {total} 条, 完全重复 {self.counts[EXACT]} 条, 近似重复 {self.counts[NEAR]} 条, "
+                f"保留 {self.counts[UNIQUE]} 条 (减少 {removed / max(1, total):.1%})")
@@ -6,6 +6,7 @@
   python rebuild_vectordb.py                    # 重建全部数据
   python rebuild_vectordb.py --import-rules     # 导入规则书（弹出文件选择框）
   python rebuild_vectordb.py --import-rules path/to/file.pdf  # 导入指定规则书
+  python rebuild_vectordb.py --changes ../data/card_changes.json  # 只更新变更集中变化的卡牌文件（不清空）
 """
 import os
 import shutil
@@ -120,6 +121,90 @@ def import_rule_files(file_paths=None):
     print(f"规则书导入完成: 成功 {success}, 失败 {failed}, 总计 {total_chunks} chunks")
 
 
+# 卡牌数据目录（导入时以该相对路径作为分块的 source，按文件更新时据此删除旧分块）
+CARD_DATA_PATH = Path('../digimon_card_data')
+
+
+def import_card_files(files, replace=False):
+    """
+    导入卡牌数据文件
+    
+    Args:
+        files: 文件路径列表
+        replace: 先删除这些文件之前导入的分块（增量更新）
+    """
+    import sys
+    sys.path.insert(0, '.')
+    from app.vector_store import vector_store
+    from app.pdf_processor import extract_text_from_bytes
+    from app.models import DocumentType, DocumentMetadata
+    
+    success = 0
+    failed = 0
+    total_chunks = 0
+    
+    with tqdm(files, desc="卡牌数据", unit="file", ncols=80) as pbar:
+        for file_path in pbar:
+            try:
+                title = file_path.stem
+                if title.startswith('digimon_cards_'):
+                    title = title[len('digimon_cards_'):]
+                
+                # 更新进度条描述
+                short_title = title[:20] + "..." if len(title) > 20 else title
+                pbar.set_postfix_str(short_title)
+                
+                if replace:
+                    vector_store.delete_by_source(str(file_path), DocumentType.RULE)
+                
+                content = file_path.read_bytes()
+                text = extract_text_from_bytes(content, file_path.name)
+                
+                if not text.strip():
+                    continue
+                
+                metadata = DocumentMetadata(
+                    doc_type=DocumentType.RULE,
+                    title=title,
+                    source=str(file_path),
+                    tags=['dtcg卡牌数据库']
+                )
+                
+                result = vector_store.add_document(text, metadata)
+                total_chunks += result['chunk_count']
+                success += 1
+            except Exception as e:
+                failed += 1
+                tqdm.write(f"  ✗ {file_path.name}: {e}")
+    
+    print(f"\n卡牌数据导入完成: 成功 {success}, 失败 {failed}, 总计 {total_chunks} chunks")
+
+
+def apply_card_changes(changes_file):
+    """按变更集更新向量库中的卡牌数据：删除已删除文件的分块，重新导入变化的文件"""
+    import sys
+    sys.path.insert(0, '.')
+    from app.card_changes import is_empty, load_changes, summary
+    from app.vector_store import vector_store
+    from app.models import DocumentType
+    
+    changes = load_changes(changes_file)
+    print(f"变更集: {summary(changes)}")
+    if is_empty(changes):
+        print("没有变化，无需更新")
+        return
+    
+    for name in changes.get("removed_files", []):
+        deleted = vector_store.delete_by_source(str(CARD_DATA_PATH / name), DocumentType.RULE)
+        print(f"  已删除 {name}: {deleted} chunks")
+    
+    files = [CARD_DATA_PATH / name for name in changes.get("changed_files", [])]
+    files = [file_path for file_path in files if file_path.exists()]
+    if files:
+        print(f"重新导入 {len(files)} 个变化的文件\n")
+        import_card_files(files, replace=True)
+
+
 def rebuild_all():
     """重建全部向量数据库"""
     # 清空现有向量库 - 使用项目根目录的 data/chroma_db
@@ -223,47 +308,10 @@ def rebuild_all():
 
     # 3. 导入卡牌数据
     print("\n[3/3] 导入卡牌数据...")
-    card_data_dir = Path('../digimon_card_data')
-    if card_data_dir.exists():
-        files = list(card_data_dir.glob('*.json'))
+    if CARD_DATA_PATH.exists():
+        files = list(CARD_DATA_PATH.glob('*.json'))
         print(f"找到 {len(files)} 个文件\n")
-        
-        success = 0
-        failed = 0
-        total_chunks = 0
-        
-        with tqdm(files, desc="卡牌数据", unit="file", ncols=80) as pbar:
-            for file_path in pbar:
-                try:
-                    title = file_path.stem
-                    if title.startswith('digimon_cards_'):
-                        title = title[len('digimon_cards_'):]
-                    
-                    # 更新进度条描述
-                    short_title = title[:20] + "..." if len(title) > 20 else title
-                    pbar.set_postfix_str(short_title)
-                    
-                    content = file_path.read_bytes()
-                    text = extract_text_from_bytes(content, file_path.name)
-                    
-                    if not text.strip():
-                        continue
-                    
-                    metadata = DocumentMetadata(
-                        doc_type=DocumentType.RULE,
-                        title=title,
-                        source=str(file_path),
-                        tags=['dtcg卡牌数据库']
-                    )
-                    
-                    result = vector_store.add_document(text, metadata)
-                    total_chunks += result['chunk_count']
-                    success += 1
-                except Exception as e:
-                    failed += 1
-                    tqdm.write(f"  ✗ {file_path.name}: {e}")
-        
-        print(f"\n卡牌数据导入完成: 成功 {success}, 失败 {failed}, 总计 {total_chunks} chunks")
+        import_card_files(files)
     else:
         print("  卡牌数据目录不存在")
 
@@ -275,10 +323,15 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="向量数据库管理工具")
     parser.add_argument("--import-rules", nargs='*', metavar="FILE",
                         help="导入规则书文件（不指定文件则弹出选择框）")
+    parser.add_argument("--changes", metavar="FILE",
+                        help="变更集文件（diff_card_data.py 生成），只更新变化的卡牌文件")
     
     args = parser.parse_args()
     
-    if args.import_rules is not None:
+    if args.changes:
+        # 增量更新卡牌数据
+        apply_card_changes(args.changes)
+    elif args.import_rules is not None:
         # 导入规则书模式
         import_rule_files(args.import_rules if args.import_rules else None)
     else:
@@ -0,0 +1,184 @@
+"""
+规则书增量翻译
+新版日文规则书与上一版对齐，未变化的条款/段落沿用已有译文，新增、修改和找不到旧译文的部分交给 LLM
+（先查翻译记忆库），并生成变更报告
+
+用法:
+  python translation/retranslate_rulebook.py --old-ja 旧版日文.pdf --new-ja 新版日文.pdf \\
+      --old-zh 上一版中文翻译.txt --output 新版中文翻译.txt
+  python translation/retranslate_rulebook.py ... --dry-run   # 只生成变更报告，不调用 LLM
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# 共用模块（从 card_game_judge 目录运行）
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app.config import RULEBOOK_TEXT_FILE, TERMINOLOGY_FILE, TRANSLATION_CONCURRENCY, TRANSLATION_RPM
+from app.rulebook_diff import (
+    ADDED, MODIFIED, REMOVED, diff_rulebooks, format_change_report, previous_translations
+)
+from app.translation_batch import BatchTranslator
+from app.translation_engine import TranslationEngine
+from app.translation_memory import TranslationMemory, file_version, text_version
+
+TRANSLATE_MODELS = {"gemini": "gemini-2.5-flash", "openai": "gpt-4o-mini"}
+
+# 记忆库的提示词版本由提示词模板和模型决定，修改提示词后旧译文自动失效
+INSTRUCTIONS = """请将以下日文游戏规则（数码宝贝卡牌对战 综合规则）翻译成中文。
+
+重要要求：
+1. 必须使用提供的术语对照表中的中文术语
+2. 保持专业、准确的翻译风格
+3. 条款中引用的其他条款编号、数字、符号保持不变
+4. 确保游戏规则的逻辑清晰
+
+术语对照表参考：
+{terminology}"""
+
+
+def read_source(path: str) -> str:
+    """PDF 或文本文件"""
+    if Path(path).suffix.lower() == ".pdf":
+        from app.pdf_processor import extract_text_from_pdf
+        return extract_text_from_pdf(path)
+    return Path(path).read_text(encoding='utf-8')
+
+
+def load_terminology() -> str:
+    from app.pdf_processor import format_terminology_json
+    path = Path(TERMINOLOGY_FILE)
+    if not path.exists():
+        return ""
+    with open(path, 'r', encoding='utf-8') as f:
+        return format_terminology_json(json.load(f))
+
+
+def make_request_fn(provider: str):
+    """返回 prompt → 模型输出 的同步函数"""
+    model = TRANSLATE_MODELS[provider]
+    if provider == "gemini":
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        gemini = genai.GenerativeModel(model)
+        return lambda prompt: gemini.generate_content(prompt).text
+
+    from openai import OpenAI
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL") or None)
+
+    def request(prompt: str) -> str:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": "你是专业的日中游戏规则翻译专家，精通DTCG卡牌游戏。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=8000
+        )
+        return response.choices[0].message.content
+    return request
+
+
+def reuse_translations(diff: Dict, old_ja_text: str, old_zh_text: str) -> Dict[str, str]:
+    """未变化/仅编号变化的条款或段落沿用上一版译文 {新版 key: 译文}"""
+    previous = previous_translations(old_ja_text, old_zh_text, diff["mode"])
+    return {
+        c["key"]: previous[c["old_key"]]
+        for c in diff["changes"]
+        if c["status"] not in (MODIFIED, ADDED, REMOVED) and c["old_key"] in previous
+    }
+
+
+def translate_segments(texts: List[str], provider: str) -> Dict[str, str]:
+    """合并请求翻译（先查翻译记忆库），返回 {原文: 译文}"""
+    memory = TranslationMemory(
+        prompt_version=text_version(INSTRUCTIONS, TRANSLATE_MODELS[provider]),
+        terminology_version=file_version(TERMINOLOGY_FILE),
+    )
+    engine = TranslationEngine(rpm=TRANSLATION_RPM[provider], concurrency=TRANSLATION_CONCURRENCY)
+    request_fn = make_request_fn(provider)
+    batcher = BatchTranslator(
+        lambda prompt: engine.call(request_fn, prompt),
+        INSTRUCTIONS.format(terminology=load_terminology()),
+        memory=memory,
+    )
+    results = asyncio.run(batcher.translate_many(texts))
+    print(f"✓ {memory.summary()}")
+    print(f"✓ {batcher.summary()}")
+    return results
+
+
+def assemble(diff: Dict, translations: Dict[str, str]) -> str:
+    """按新版顺序拼接译文，翻译失败的片段保留日文原文"""
+    segments = [c for c in diff["changes"] if c["status"] != REMOVED]
+    if diff["mode"] == "rule":
+        return "\n".join(f"{c['rule_id']}. {translations.get(c['key'], c['text'])}" for c in segments)
+    return "\n\n".join(translations.get(c["key"], c["text"]) for c in segments)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="规则书增量翻译（只翻译新增和修改的条款/段落）")
+    parser.add_argument("--old-ja", required=True, help="上一版日文规则书（PDF 或文本）")
+    parser.add_argument("--new-ja", required=True, help="新版日文规则书（PDF 或文本）")
+    parser.add_argument("--old-zh", default=RULEBOOK_TEXT_FILE, help="上一版的中文翻译文本")
+    parser.add_argument("--output", default="数码宝贝卡牌对战_综合规则_最新版_中文翻译_增量.txt", help="译文输出路径")
+    parser.add_argument("--report", default=None, help="变更报告路径（默认: 输出文件名.changes.md）")
+    parser.add_argument("--provider", choices=sorted(TRANSLATE_MODELS), default="gemini")
+    parser.add_argument("--mode", choices=["auto", "rule", "paragraph"], default="auto",
+                        help="对齐方式：按条款编号 / 按段落（默认自动判断）")
+    parser.add_argument("--keep-unaligned", action="store_true",
+                        help="未变化但找不到旧译文的片段保留日文原文（默认一并交给 LLM）")
+    parser.add_argument("--dry-run", action="store_true", help="只生成变更报告，不调用 LLM")
+    args = parser.parse_args()
+
+    print("[1/4] 读取新旧两版日文规则书...")
+    old_ja, new_ja = read_source(args.old_ja), read_source(args.new_ja)
+    old_zh_path = Path(args.old_zh)
+    old_zh = old_zh_path.read_text(encoding='utf-8') if old_zh_path.exists() else ""
+
+    print("[2/4] 对齐新旧版本...")
+    diff = diff_rulebooks(old_ja, new_ja, None if args.mode == "auto" else args.mode)
+    translations = reuse_translations(diff, old_ja, old_zh)
+    reused = len(translations)
+    changed = (MODIFIED, ADDED)
+    unaligned = [c for c in diff["changes"]
+                 if c["status"] not in changed + (REMOVED,) and c["key"] not in translations]
+    pending = [c for c in diff["changes"] if c["status"] in changed]
+    if not args.keep_unaligned:
+        pending.extend(unaligned)
+    print(f"✓ 对齐方式: {diff['mode']}, 沿用译文 {reused} 条, 待翻译 {len(pending)} 条")
+    if unaligned:
+        action = "保留日文原文" if args.keep_unaligned else "一并翻译（--keep-unaligned 可保留日文原文）"
+        print(f"⚠️ {len(unaligned)} 条未变化的片段找不到对应的旧译文，{action}")
+
+    if pending and not args.dry_run:
+        print("[3/4] 翻译新增、修改和找不到旧译文的部分...")
+        results = translate_segments([c["text"] for c in pending], args.provider)
+        translations.update({c["key"]: results[c["text"]] for c in pending if c["text"] in results})
+        failed = sum(1 for c in pending if c["key"] not in translations)
+        if failed:
+            print(f"⚠️ {failed} 条翻译失败（保留日文原文），重新运行即可只重试这些条目")
+    else:
+        print("[3/4] 跳过翻译")
+
+    print("[4/4] 生成译文和变更报告...")
+    report_path = Path(args.report) if args.report else Path(args.output).with_suffix('.changes.md')
+    report_path.write_text(format_change_report(
+        diff, translations, sent=0 if args.dry_run else len(pending), reused=reused), encoding='utf-8')
+    if not args.dry_run:
+        Path(args.output).write_text(assemble(diff, translations), encoding='utf-8')
+        print(f"✅ 译文: {args.output}")
+    print(f"✅ 变更报告: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ with the existing Chinese rulebook.
 
 import os
 import re
+import sys
 from pathlib import Path
 from typing import Dict, List, Tuple
 from pypdf import PdfReader
@@ -14,6 +15,48 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# 共用的翻译记忆库（从 card_game_judge 目录运行）
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app.config import TRANSLATION_RPM
+from app.rulebook_translation import RulebookTranslationRunner, cached_terminology
+from app.translation_memory import TranslationMemory, text_version
+
+TERMINOLOGY_MODEL = "gpt-4"
+TRANSLATE_MODEL = "gpt-4"
+
+# 记忆库的提示词版本由提示词模板和模型决定，修改提示词后旧译文自动失效
+TERMINOLOGY_PROMPT = """从以下中文游戏规则书中提取专有名词术语对照表。
+请识别游戏中的关键术语，包括但不限于：
+- 卡牌类型（如：数码蛋、数码兽、驯兽师等）
+- 游戏区域（如：育成区、战斗区、手牌等）
+- 游戏动作（如：进化、孵化、攻击等）
+- 卡牌属性和状态
+- 游戏阶段和回合
+
+以JSON格式返回，格式为 {{"日文术语": "中文术语"}}
+
+中文规则书内容（前3000字）：
+{chinese_text}
+"""
+
+TRANSLATION_PROMPT = """请将以下日文游戏规则翻译成中文。
+
+重要要求：
+1. 必须使用提供的术语对照表中的中文术语
+2. 保持专业、准确的翻译风格
+3. 保留原文的格式和结构
+4. 数字、符号保持不变
+5. 确保游戏规则的逻辑清晰
+
+术语对照表参考：
+{terminology_ref}
+
+待翻译的日文内容：
+{japanese_text}
+
+请直接输出翻译后的中文内容，不要添加额外说明。
+"""
+
 
 class RulebookTranslator:
     def __init__(self, chinese_ref_path: str, japanese_path: str):
@@ -21,6 +64,7 @@ class RulebookTranslator:
         self.japanese_path = japanese_path
         self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.terminology_dict = {}
+        self._memories: Dict[str, TranslationMemory] = {}
         
     def extract_pdf_text(self, pdf_path: str) -> str:
         """Extract text from PDF file"""
@@ -38,22 +82,18 @@ class RulebookTranslator:
         """
         print("Building terminology dictionary from Chinese reference...")
         
-        prompt = f"""从以下中文游戏规则书中提取专有名词术语对照表。
-请识别游戏中的关键术语，包括但不限于：
-- 卡牌类型（如：数码蛋、数码兽、驯兽师等）
-- 游戏区域（如：育成区、战斗区、手牌等）
-- 游戏动作（如：进化、孵化、攻击等）
-- 卡牌属性和状态
-- 游戏阶段和回合
-
-以JSON格式返回，格式为 {{"日文术语": "中文术语"}}
-
-中文规则书内容（前3000字）：
-{chinese_text[:3000]}
-"""
+        result = cached_terminology(
+            chinese_text[:3000], self._request_terminology, text_version(TERMINOLOGY_PROMPT, TERMINOLOGY_MODEL)
+        )
+        print(f"Extracted terminology preview:\n{result[:500]}...\n")
+        
+        return result
+    
+    def _request_terminology(self, chinese_text: str) -> str:
+        prompt = TERMINOLOGY_PROMPT.format(chinese_text=chinese_text)
         
         response = self.client.chat.completions.create(
-            model="gpt-4",
+            model=TERMINOLOGY_MODEL,
             messages=[
                 {"role": "system", "content": "你是一个专业的游戏术语提取专家。"},
                 {"role": "user", "content": prompt}
@@ -62,37 +102,22 @@ class RulebookTranslator:
         )
         
         # Parse the response to extract terminology
-        result = response.choices[0].message.content
-        print(f"Extracted terminology preview:\n{result[:500]}...\n")
-        
-        return result
+        return response.choices[0].message.content
     
-    def translate_chunk(self, japanese_text: str, terminology_ref: str, chunk_num: int, total_chunks: int) -> str:
-        """
-        Translate a chunk of Japanese text to Chinese using terminology reference.
-        """
-        print(f"Translating chunk {chunk_num}/{total_chunks}...")
-        
-        prompt = f"""请将以下日文游戏规则翻译成中文。
-
-重要要求：
-1. 必须使用提供的术语对照表中的中文术语
-2. 保持专业、准确的翻译风格
-3. 保留原文的格式和结构
-4. 数字、符号保持不变
-5. 确保游戏规则的逻辑清晰
-
-术语对照表参考：
-{terminology_ref}
-
-待翻译的日文内容：
-{japanese_text}
-
-请直接输出翻译后的中文内容，不要添加额外说明。
-"""
+    def _memory(self, terminology_ref: str) -> TranslationMemory:
+        """按术语参考区分的翻译记忆库"""
+        if terminology_ref not in self._memories:
+            self._memories[terminology_ref] = TranslationMemory(
+                prompt_version=text_version(TRANSLATION_PROMPT, TRANSLATE_MODEL),
+                terminology_version=text_version(terminology_ref),
+            )
+        return self._memories[terminology_ref]
+    
+    def _request_translation(self, japanese_text: str, terminology_ref: str) -> str:
+        prompt = TRANSLATION_PROMPT.format(terminology_ref=terminology_ref, japanese_text=japanese_text)
         
         response = self.client.chat.completions.create(
-            model="gpt-4",
+            model=TRANSLATE_MODEL,
             messages=[
                 {"role": "system", "content": "你是一个专业的日中游戏规则翻译专家，精通DTCG卡牌游戏。"},
                 {"role": "user", "content": prompt}
@@ -103,6 +128,17 @@ class RulebookTranslator:
         
         return response.choices[0].message.content
     
+    def translate_chunks(self, chunks: List[str], terminology_ref: str, output_path: str) -> List[str]:
+        """Translate all chunks concurrently; finished chunks are checkpointed next to the output file"""
+        runner = RulebookTranslationRunner(
+            lambda text: self._request_translation(text, terminology_ref),
+            memory=self._memory(terminology_ref),
+            rpm=TRANSLATION_RPM["openai"],
+            checkpoint=Path(output_path).with_suffix('.chunks.jsonl'),
+        )
+        translated_chunks, _ = runner.translate(chunks)
+        return translated_chunks
+    
     def split_text_into_chunks(self, text: str, max_chars: int = 2000) -> List[str]:
         """Split text into manageable chunks for translation"""
         # Try to split by paragraphs or sections
@@ -147,10 +183,7 @@ class RulebookTranslator:
         chunks = self.split_text_into_chunks(japanese_text)
         print(f"Split into {len(chunks)} chunks for translation")
         
-        translated_chunks = []
-        for i, chunk in enumerate(chunks, 1):
-            translated = self.translate_chunk(chunk, terminology_ref, i, len(chunks))
-            translated_chunks.append(translated)
+        translated_chunks = self.translate_chunks(chunks, terminology_ref, output_path)
         
         # Combine all translated chunks
         final_translation = "\n\n".join(translated_chunks)
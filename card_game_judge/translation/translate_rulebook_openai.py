@@ -4,7 +4,9 @@ DTCG Rulebook Translator (OpenAI Version - Optimized)
 """
 
 import os
-from typing import List
+import sys
+from pathlib import Path
+from typing import Dict, List
 from pypdf import PdfReader
 from openai import OpenAI
 from dotenv import load_dotenv
@@ -13,6 +15,48 @@ import httpx
 
 load_dotenv()
 
+# 共用的翻译记忆库（从 card_game_judge 目录运行）
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from app.config import TRANSLATION_RPM
+from app.rulebook_translation import RulebookTranslationRunner, cached_terminology
+from app.translation_memory import TranslationMemory, text_version
+
+TERMINOLOGY_MODEL = "gpt-3.5-turbo"  # 使用更快更便宜的模型提取术语
+TRANSLATE_MODEL = "gpt-4o-mini"  # 使用性价比高的模型
+
+# 记忆库的提示词版本由提示词模板和模型决定，修改提示词后旧译文自动失效
+TERMINOLOGY_PROMPT = """从以下中文游戏规则书中提取专有名词术语。
+请识别游戏中的关键术语，包括：
+- 卡牌类型（如：数码蛋、数码兽、驯兽师、选项卡）
+- 游戏区域（如：育成区、战斗区、安全区、废弃区、手牌、卡组）
+- 游戏动作（如：进化、孵化、攻击、休眠、激活、抽牌）
+- 卡牌属性（如：进化费用、DP、进化源）
+- 游戏阶段（如：抽牌阶段、育成阶段、主要阶段）
+
+以简洁的列表形式返回，每行一个术语。
+
+中文规则书内容（前4000字）：
+{chinese_text}
+"""
+
+TRANSLATION_PROMPT = """请将以下日文游戏规则翻译成中文。
+
+重要要求：
+1. 使用提供的术语对照表中的中文术语
+2. 保持专业、准确的翻译风格
+3. 保留原文的格式和结构
+4. 数字、符号保持不变
+5. 确保游戏规则的逻辑清晰
+
+术语参考：
+{terminology_ref}
+
+待翻译的日文内容：
+{japanese_text}
+
+请直接输出翻译后的中文内容。
+"""
+
 # 配置代理
 proxy_host = os.getenv("PROXY_HOST", "127.0.0.1")
 proxy_port = os.getenv("PROXY_PORT", "7890")
@@ -44,6 +88,8 @@ class RulebookTranslatorOpenAI:
         else:
             self.client = OpenAI(api_key=api_key, http_client=http_client)
         
+        self._memories: Dict[str, TranslationMemory] = {}
+        
     def extract_pdf_text(self, pdf_path: str) -> str:
         """Extract text from PDF file"""
         text = ""
@@ -57,32 +103,10 @@ class RulebookTranslatorOpenAI:
         """Extract terminology from Chinese reference rulebook"""
         print("正在从中文规则书提取术语...")
         
-        prompt = f"""从以下中文游戏规则书中提取专有名词术语。
-请识别游戏中的关键术语，包括：
-- 卡牌类型（如：数码蛋、数码兽、驯兽师、选项卡）
-- 游戏区域（如：育成区、战斗区、安全区、废弃区、手牌、卡组）
-- 游戏动作（如：进化、孵化、攻击、休眠、激活、抽牌）
-- 卡牌属性（如：进化费用、DP、进化源）
-- 游戏阶段（如：抽牌阶段、育成阶段、主要阶段）
-
-以简洁的列表形式返回，每行一个术语。
-
-中文规则书内容（前4000字）：
-{chinese_text[:4000]}
-"""
-        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",  # 使用更快更便宜的模型提取术语
-                messages=[
-                    {"role": "system", "content": "你是一个专业的游戏术语提取专家。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=1000
+            result = cached_terminology(
+                chinese_text[:4000], self._request_terminology, text_version(TERMINOLOGY_PROMPT, TERMINOLOGY_MODEL)
             )
-            
-            result = response.choices[0].message.content
             print(f"提取的术语示例:\n{result[:300]}...\n")
             return result
             
@@ -98,44 +122,55 @@ class RulebookTranslatorOpenAI:
 抽牌阶段、育成阶段、主要阶段
             """
     
-    def translate_chunk(self, japanese_text: str, terminology_ref: str, chunk_num: int, total_chunks: int) -> str:
-        """Translate a chunk of Japanese text to Chinese"""
-        print(f"正在翻译第 {chunk_num}/{total_chunks} 块...")
-        
-        prompt = f"""请将以下日文游戏规则翻译成中文。
-
-重要要求：
-1. 使用提供的术语对照表中的中文术语
-2. 保持专业、准确的翻译风格
-3. 保留原文的格式和结构
-4. 数字、符号保持不变
-5. 确保游戏规则的逻辑清晰
-
-术语参考：
-{terminology_ref}
-
-待翻译的日文内容：
-{japanese_text}
-
-请直接输出翻译后的中文内容。
-"""
-        
-        try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # 使用性价比高的模型
-                messages=[
-                    {"role": "system", "content": "你是专业的日中游戏规则翻译专家，精通DTCG卡牌游戏。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=4000
+    def _request_terminology(self, chinese_text: str) -> str:
+        prompt = TERMINOLOGY_PROMPT.format(chinese_text=chinese_text)
+        
+        response = self.client.chat.completions.create(
+            model=TERMINOLOGY_MODEL,
+            messages=[
+                {"role": "system", "content": "你是一个专业的游戏术语提取专家。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=1000
+        )
+        
+        return response.choices[0].message.content
+    
+    def _memory(self, terminology_ref: str) -> TranslationMemory:
+        """按术语参考区分的翻译记忆库"""
+        if terminology_ref not in self._memories:
+            self._memories[terminology_ref] = TranslationMemory(
+                prompt_version=text_version(TRANSLATION_PROMPT, TRANSLATE_MODEL),
+                terminology_version=text_version(terminology_ref),
             )
-            
-            return response.choices[0].message.content
-            
-        except Exception as e:
-            print(f"翻译第 {chunk_num} 块时出错: {e}")
-            return f"[翻译失败 - Chunk {chunk_num}]\n{japanese_text}"
+        return self._memories[terminology_ref]
+    
+    def _request_translation(self, japanese_text: str, terminology_ref: str) -> str:
+        prompt = TRANSLATION_PROMPT.format(terminology_ref=terminology_ref, japanese_text=japanese_text)
+        
+        response = self.client.chat.completions.create(
+            model=TRANSLATE_MODEL,
+            messages=[
+                {"role": "system", "content": "你是专业的日中游戏规则翻译专家，精通DTCG卡牌游戏。"},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.3,
+            max_tokens=4000
+        )
+        
+        return response.choices[0].message.content
+    
+    def translate_chunks(self, chunks: List[str], terminology_ref: str, output_path: str) -> List[str]:
+        """并发翻译所有分块，已完成的分块保存在输出文件旁的断点文件中"""
+        runner = RulebookTranslationRunner(
+            lambda text: self._request_translation(text, terminology_ref),
+            memory=self._memory(terminology_ref),
+            rpm=TRANSLATION_RPM["openai"],
+            checkpoint=Path(output_path).with_suffix('.chunks.jsonl'),
+        )
+        translated_chunks, _ = runner.translate(chunks)
+        return translated_chunks
     
     def split_text_into_chunks(self, text: str, max_chars: int = 2500) -> List[str]:
         """Split text into manageable chunks"""
@@ -177,10 +212,7 @@ class RulebookTranslatorOpenAI:
         chunks = self.split_text_into_chunks(japanese_text)
         print(f"分为 {len(chunks)} 块进行翻译\n")
         
-        translated_chunks = []
-        for i, chunk in enumerate(chunks, 1):
-            translated = self.translate_chunk(chunk, terminology_ref, i, len(chunks))
-            translated_chunks.append(translated)
+        translated_chunks = self.translate_chunks(chunks, terminology_ref, output_path)
         
         final_translation = "\n\n".join(translated_chunks)
         
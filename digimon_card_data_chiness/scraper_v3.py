@@ -1,20 +1,26 @@
 """
 数码兽卡牌中文数据爬虫 V3
 支持增量保存和单卡更新
+增量爬取：内容未变化的卡牌不重复写入；可设置连续若干页都是已有卡牌时停止翻页
 """
 
-import json
 import re
 import time
 import os
+import sys
 from datetime import datetime
-from selenium import webdriver
+from pathlib import Path
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
+
+# 爬虫共用工具（仓库根目录的 scraper_common）
+sys.path.append(str(Path(__file__).parent.parent))
+from scraper_common.browser_driver import PageWaits, build_chrome_options, create_chrome_driver
+from scraper_common.incremental import CHANGED, NEW, UNCHANGED, ChangeTracker, content_hash
+from scraper_common.json_journal import JsonJournal
+
+# 卡牌详情页渲染完成的标志（parse_card_info 读取的字段）
+CARD_DETAIL_READY_PATTERN = r'编\s*号'
+CARD_LINK_SELECTOR = 'a[href*="/Cards/"]'
 
 
 # 默认数据文件路径
@@ -27,22 +33,19 @@ class DigimonCardDatabase:
     def __init__(self, data_file=DEFAULT_DATA_FILE):
         self.data_file = data_file
         self.cards = {}  # 以card_no为key存储
+        # 逐张保存只追加日志，定期及爬取结束时合并回 data_file
+        self.journal = JsonJournal(data_file, key_field='card_no')
         self.load()
     
     def load(self):
-        """加载现有数据"""
-        if os.path.exists(self.data_file):
+        """加载现有数据（快照 + 上次未合并的日志）"""
+        if os.path.exists(self.data_file) or self.journal.journal_file.exists():
             try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    # 转换为字典格式，以card_no为key
-                    if isinstance(data, list):
-                        for card in data:
-                            if card.get('card_no'):
-                                self.cards[card['card_no']] = card
-                    elif isinstance(data, dict):
-                        self.cards = data
+                self.cards = self.journal.load()
                 print(f"已加载 {len(self.cards)} 张卡牌数据")
+                if self.journal.pending:
+                    print(f"  从日志恢复 {self.journal.pending} 条未合并的更新")
+                    self.save()
             except Exception as e:
                 print(f"加载数据失败: {e}")
                 self.cards = {}
@@ -51,26 +54,41 @@ class DigimonCardDatabase:
             self.cards = {}
     
     def save(self):
-        """保存数据到文件"""
+        """保存数据到文件（原子替换，并清空日志）"""
         # 转换为列表格式保存
-        data_list = list(self.cards.values())
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(data_list, f, ensure_ascii=False, indent=2)
+        self.journal.compact(list(self.cards.values()))
+    
+    def card_status(self, card_info):
+        """与已有数据比较：new / changed / unchanged（忽略 updated_at）"""
+        existing = self.cards.get(card_info.get('card_no'))
+        if existing is None:
+            return NEW
+        return UNCHANGED if content_hash(existing) == content_hash(card_info) else CHANGED
     
     def add_card(self, card_info, save_immediately=True):
-        """添加或更新单张卡牌"""
+        """添加或更新单张卡牌（save_immediately 时写入日志，不重写整个文件；内容未变化时不写入）"""
         card_no = card_info.get('card_no')
         if not card_no:
             print("  ⚠ 卡牌编号为空，跳过")
             return False
         
+        if self.card_status(card_info) == UNCHANGED:
+            return True
+        
         self.cards[card_no] = card_info
         
         if save_immediately:
-            self.save()
+            self.journal.put(card_no, card_info)
+            if self.journal.pending >= self.journal.compact_every:
+                self.save()
         
         return True
     
+    def flush(self):
+        """把日志中的更新合并回数据文件"""
+        if self.journal.pending:
+            self.save()
+    
     def get_card(self, card_no):
         """获取单张卡牌"""
         return self.cards.get(card_no)
@@ -89,32 +107,26 @@ class DigimonCardDatabase:
 
 
 class DigimonCardScraperV3:
-    def __init__(self, headless=False, max_pages=None, data_file=DEFAULT_DATA_FILE):
+    def __init__(self, headless=False, max_pages=None, data_file=DEFAULT_DATA_FILE, stop_after_known_pages=None):
+        """
+        stop_after_known_pages: 连续这么多页都是已有卡牌时停止翻页（增量更新，需要搜索结果新卡在前）；
+                                None 时翻完所有页
+        """
         self.base_url = "https://app.digicamoe.cn/search"
         self.headless = headless
         self.max_pages = max_pages
+        self.stop_after_known_pages = stop_after_known_pages
         self.db = DigimonCardDatabase(data_file)
+        self.waits = PageWaits(timeout=20)
         
     def setup_driver(self):
-        chrome_options = Options()
-        if self.headless:
-            chrome_options.add_argument('--headless=new')
-        chrome_options.add_argument('--no-sandbox')
-        chrome_options.add_argument('--disable-dev-shm-usage')
-        chrome_options.add_argument('--window-size=1920,1080')
-        
-        try:
-            service = Service(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=chrome_options)
-        except:
-            driver = webdriver.Chrome(options=chrome_options)
-        
-        return driver
+        # 详情页按 innerText 的换行解析，保留 CSS
+        return create_chrome_driver(build_chrome_options(self.headless))
     
     def click_search_button(self, driver):
         """点击搜索按钮"""
         print("查找并点击搜索按钮...")
-        time.sleep(3)
+        self.waits.present(driver, "button.ant-btn-primary, button[type='submit']", "搜索按钮")
         
         selectors = [
             (By.XPATH, "//button[contains(text(), '搜索')]"),
@@ -131,17 +143,14 @@ class DigimonCardScraperV3:
                     btn_text = btn.text.strip()
                     if '搜索' in btn_text or btn_text == '':
                         driver.execute_script("arguments[0].scrollIntoView(true);", btn)
-                        time.sleep(0.5)
                         try:
                             btn.click()
                             print(f"  ✓ 成功点击按钮")
-                            time.sleep(3)
                             return True
                         except:
                             try:
                                 driver.execute_script("arguments[0].click();", btn)
                                 print(f"  ✓ 使用JS成功点击按钮")
-                                time.sleep(3)
                                 return True
                             except:
                                 continue
@@ -154,7 +163,7 @@ class DigimonCardScraperV3:
     def get_card_links(self, driver):
         """获取当前页面的所有卡牌链接"""
         card_links = []
-        time.sleep(2)
+        self.waits.present(driver, CARD_LINK_SELECTOR, "搜索结果")
         
         all_links = driver.find_elements(By.TAG_NAME, "a")
         
@@ -273,7 +282,7 @@ class DigimonCardScraperV3:
     def extract_card_detail(self, driver):
         """提取卡牌详情"""
         try:
-            time.sleep(2)
+            self.waits.text_matches(driver, CARD_DETAIL_READY_PATTERN, "卡牌详情页", timeout=10)
             page_title = driver.title
             url = driver.current_url
             body = driver.find_element(By.TAG_NAME, 'body')
@@ -284,6 +293,12 @@ class DigimonCardScraperV3:
         except Exception as e:
             return {'error': str(e), 'url': driver.current_url}
     
+    def first_card_link(self, driver):
+        """当前列表第一张卡牌的链接（用于判断翻页完成）"""
+        return driver.execute_script(
+            "var a = document.querySelector(arguments[0]); return a ? a.href : null;", CARD_LINK_SELECTOR
+        )
+    
     def has_next_page(self, driver):
         """检查下一页"""
         try:
@@ -304,7 +319,11 @@ class DigimonCardScraperV3:
             card_info = self.extract_card_detail(driver)
             
             if card_info.get('card_no'):
+                if self.db.card_status(card_info) == UNCHANGED:
+                    print(f"⏭ 内容未变化: {card_info.get('card_no')} - {card_info.get('name_cn')}")
+                    return card_info
                 self.db.add_card(card_info)
+                self.db.flush()
                 print(f"✓ 已保存: {card_info.get('card_no')} - {card_info.get('name_cn')}")
                 return card_info
             else:
@@ -322,11 +341,11 @@ class DigimonCardScraperV3:
         driver = self.setup_driver()
         new_cards = 0
         skipped_cards = 0
+        tracker = ChangeTracker(self.stop_after_known_pages)
         
         try:
             print(f"正在访问: {self.base_url}")
             driver.get(self.base_url)
-            time.sleep(5)
             
             if not self.click_search_button(driver):
                 print("\n无法点击搜索按钮，等待15秒手动操作...")
@@ -346,8 +365,7 @@ class DigimonCardScraperV3:
                 card_links = self.get_card_links(driver)
                 
                 if not card_links:
-                    print("未找到卡牌，等待5秒后重试...")
-                    time.sleep(5)
+                    print("未找到卡牌，重试...")
                     card_links = self.get_card_links(driver)
                     if not card_links:
                         print("仍未找到卡牌，退出")
@@ -361,6 +379,7 @@ class DigimonCardScraperV3:
                         if self.db.has_card(card_no_from_url):
                             print(f"[{idx}/{len(card_links)}] {card_no_from_url} ⏭ 已存在，跳过")
                             skipped_cards += 1
+                            tracker.record(UNCHANGED)
                             continue
                         
                         print(f"[{idx}/{len(card_links)}] {card_no_from_url}", end=" ")
@@ -373,13 +392,13 @@ class DigimonCardScraperV3:
                         if card_info.get('card_no'):
                             self.db.add_card(card_info, save_immediately=True)
                             new_cards += 1
+                            tracker.record(NEW)
                             print(f"✓ 新增 {card_info.get('name_cn', '')}")
                         else:
                             print("✗ 解析失败")
                         
                         driver.close()
                         driver.switch_to.window(driver.window_handles[0])
-                        time.sleep(0.5)
                         
                     except Exception as e:
                         print(f"✗ 错误: {e}")
@@ -387,13 +406,19 @@ class DigimonCardScraperV3:
                             driver.close()
                             driver.switch_to.window(driver.window_handles[0])
                 
+                if tracker.end_page():
+                    print(f"\n连续 {self.stop_after_known_pages} 页都是已有卡牌，停止翻页")
+                    break
+                
                 # 下一页
                 next_btn = self.has_next_page(driver)
                 if next_btn:
                     print("\n点击下一页...")
                     try:
+                        first_link = self.first_card_link(driver)
                         next_btn.click()
-                        time.sleep(3)
+                        # 等待列表换成下一页的卡牌
+                        self.waits.value_changes(driver, self.first_card_link, first_link, "翻页")
                         page_num += 1
                     except:
                         break
@@ -401,10 +426,12 @@ class DigimonCardScraperV3:
                     print("\n没有更多页面")
                     break
             
+            self.db.flush()
             print(f"\n{'='*50}")
             print(f"完成！新增 {new_cards} 张，跳过 {skipped_cards} 张已存在卡牌")
             print(f"数据库共 {self.db.count()} 张卡牌")
             print(f"数据已保存到: {self.db.data_file}")
+            print(self.waits.summary())
             print(f"{'='*50}")
             
         except Exception as e:
@@ -412,6 +439,7 @@ class DigimonCardScraperV3:
             import traceback
             traceback.print_exc()
         finally:
+            self.db.flush()
             driver.quit()
 
 
@@ -421,7 +449,7 @@ def update_single_card(card_url, data_file=DEFAULT_DATA_FILE):
     return scraper.scrape_single_card(card_url)
 
 
-def scrape_all_cards(headless=True, max_pages=None, data_file=DEFAULT_DATA_FILE):
+def scrape_all_cards(headless=True, max_pages=None, data_file=DEFAULT_DATA_FILE, stop_after_known_pages=None):
     """
     爬取所有卡牌的便捷函数
     
@@ -429,6 +457,7 @@ def scrape_all_cards(headless=True, max_pages=None, data_file=DEFAULT_DATA_FILE)
         headless: 是否使用无头模式（默认True）
         max_pages: 最大爬取页数（默认None，爬取全部）
         data_file: 数据文件路径
+        stop_after_known_pages: 连续这么多页都是已有卡牌时停止（默认None，翻完所有页）
     
     Returns:
         DigimonCardDatabase: 卡牌数据库对象
@@ -442,8 +471,12 @@ def scrape_all_cards(headless=True, max_pages=None, data_file=DEFAULT_DATA_FILE)
         
         # 显示浏览器窗口
         db = scrape_all_cards(headless=False)
+        
+        # 每周增量更新：连续2页都是已有卡牌即停止
+        db = scrape_all_cards(stop_after_known_pages=2)
     """
-    scraper = DigimonCardScraperV3(headless=headless, max_pages=max_pages, data_file=data_file)
+    scraper = DigimonCardScraperV3(headless=headless, max_pages=max_pages, data_file=data_file,
+                                   stop_after_known_pages=stop_after_known_pages)
     scraper.scrape_all_cards()
     return scraper.db
 
@@ -468,9 +501,16 @@ def main():
     print("数码兽卡牌中文数据爬虫 V3")
     print("=" * 50)
     
+    import argparse
+    parser = argparse.ArgumentParser(description="数码兽卡牌中文数据爬虫 V3")
+    parser.add_argument("--stop-after-known-pages", type=int, default=None,
+                        help="连续这么多页都是已有卡牌时停止翻页（增量更新）")
+    args = parser.parse_args()
+    
     # headless=True 无头模式
     # max_pages=None 爬取所有页面
-    scraper = DigimonCardScraperV3(headless=True, max_pages=None)
+    scraper = DigimonCardScraperV3(headless=True, max_pages=None,
+                                   stop_after_known_pages=args.stop_after_known_pages)
     scraper.scrape_all_cards()
 
 
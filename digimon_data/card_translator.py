@@ -3,11 +3,14 @@ DTCG 卡牌数据翻译器
 将日文卡牌数据翻译成中文
 """
 
+import asyncio
 import json
 import re
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 from dotenv import load_dotenv
 
 # 导入术语表
@@ -24,8 +27,32 @@ from dtcg_terminology import (
     get_all_mappings,
 )
 
+# 共用的翻译记忆库
+sys.path.append(str(Path(__file__).parent.parent / "card_game_judge"))
+from app.card_changes import IGNORED_FIELDS, changed_card_nos, summary as changes_summary
+from app.config import TRANSLATION_CONCURRENCY, TRANSLATION_RPM, TRANSLATION_WORKERS
+from app.term_replacer import TermReplacer
+from app.translation_batch import BatchTranslator
+from app.translation_engine import TranslationEngine
+from app.translation_memory import TranslationMemory, text_version
+
 load_dotenv()
 
+AI_MODELS = {"gemini": "gemini-2.0-flash", "openai": "gpt-4o-mini"}
+
+# 效果文本中的平假名/片假名（术语替换后仍有则需要AI翻译）
+JAPANESE_KANA_PATTERN = re.compile(r'[\u3040-\u309F\u30A0-\u30FF]')
+
+EFFECT_FIELDS = ('effect', 'inherited_effect', 'security_effect')
+
+# 记忆库的提示词版本由提示词模板和模型决定，修改提示词后旧译文自动失效
+EFFECT_INSTRUCTIONS = """请将以下DTCG（数码宝贝卡牌游戏）效果文本翻译成中文。
+注意：
+1. 保持游戏术语的准确性
+2. 已翻译的部分（如【登场时】、≪阻挡者≫等）保持不变
+3. 数字和符号保持不变
+4. 翻译要简洁准确"""
+
 
 class CardTranslator:
     def __init__(self, 
@@ -41,10 +68,20 @@ class CardTranslator:
             ai_provider: AI提供商 ("gemini" 或 "openai")
         """
         self.name_mapping = {}
+        self.name_mapping_path = name_mapping_path
         self.terminology = get_all_mappings()
+        # 关键词效果 > 效果时机 > 游戏术语，编译一次、单次扫描替换
+        self.effect_terms = TermReplacer(KEYWORD_EFFECT_MAPPING, EFFECT_TIMING_MAPPING, GAME_TERM_MAPPING)
         self.use_ai = use_ai
         self.ai_provider = ai_provider
         self.ai_model = None
+        # 整个文件的效果文本合并翻译的结果 {术语替换后的文本: 译文}
+        self._prefetched: Dict[str, str] = {}
+        self._engine: Optional[TranslationEngine] = None
+        self.memory = TranslationMemory(
+            prompt_version=text_version(EFFECT_INSTRUCTIONS, AI_MODELS.get(ai_provider, ai_provider)),
+            terminology_version=text_version(json.dumps(self.terminology, ensure_ascii=False, sort_keys=True)),
+        )
         
         # 加载名称映射
         if name_mapping_path and Path(name_mapping_path).exists():
@@ -60,7 +97,7 @@ class CardTranslator:
             try:
                 import google.generativeai as genai
                 genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-                self.ai_model = genai.GenerativeModel('gemini-2.0-flash')
+                self.ai_model = genai.GenerativeModel(AI_MODELS["gemini"])
                 print("✅ Gemini AI 模型已初始化")
             except Exception as e:
                 print(f"⚠️ Gemini 初始化失败: {e}")
@@ -139,61 +176,95 @@ class CardTranslator:
         if not text:
             return None
         
-        translated = text
-        
-        # 1. 替换关键词效果
-        for jpn, chn in KEYWORD_EFFECT_MAPPING.items():
-            translated = translated.replace(jpn, chn)
-        
-        # 2. 替换效果时机
-        for jpn, chn in EFFECT_TIMING_MAPPING.items():
-            translated = translated.replace(jpn, chn)
-        
-        # 3. 替换游戏术语
-        for jpn, chn in GAME_TERM_MAPPING.items():
-            translated = translated.replace(jpn, chn)
+        translated = self._replace_terms(text)
         
-        # 4. 如果启用AI且文本中仍有日文，使用AI翻译
-        if self.use_ai and self._contains_japanese(translated):
-            translated = self._ai_translate_effect(translated)
+        # 替换后仍有日文：先取合并翻译的结果，没有时（启用AI的情况下）逐条翻译
+        if self._contains_japanese(translated):
+            if translated in self._prefetched:
+                translated = self._prefetched[translated]
+            elif self.use_ai:
+                translated = self._ai_translate_effect(translated)
         
         return translated
     
+    def _replace_terms(self, text: str) -> str:
+        """用术语表替换关键词、时机和游戏术语"""
+        return self.effect_terms.replace(text)
+    
     def _contains_japanese(self, text: str) -> bool:
         """检查文本是否包含日文字符"""
-        # 平假名: \u3040-\u309F
-        # 片假名: \u30A0-\u30FF
-        return bool(re.search(r'[\u3040-\u309F\u30A0-\u30FF]', text))
+        return bool(JAPANESE_KANA_PATTERN.search(text))
     
     def _ai_translate_effect(self, text: str) -> str:
-        """使用AI翻译效果文本"""
-        prompt = f"""请将以下DTCG（数码宝贝卡牌游戏）效果文本翻译成中文。
-注意：
-1. 保持游戏术语的准确性
-2. 已翻译的部分（如【登场时】、≪阻挡者≫等）保持不变
-3. 数字和符号保持不变
-4. 翻译要简洁准确
+        """使用AI翻译效果文本（先查翻译记忆库）"""
+        try:
+            return self.memory.translate(text, self._ai_request)
+        except Exception as e:
+            print(f"⚠️ AI翻译失败: {e}")
+        
+        return text  # 翻译失败返回原文
+    
+    def _ai_request(self, text: str) -> str:
+        """请求AI翻译，失败时抛出异常"""
+        prompt = f"""{EFFECT_INSTRUCTIONS}
 
 效果文本：
 {text}
 
 请直接输出翻译结果，不要添加任何说明。"""
-
-        try:
-            if self.ai_provider == "gemini" and self.ai_model:
-                response = self.ai_model.generate_content(prompt)
-                return response.text.strip()
-            elif self.ai_provider == "openai" and hasattr(self, 'ai_client'):
-                response = self.ai_client.chat.completions.create(
-                    model="gpt-4o-mini",
-                    messages=[{"role": "user", "content": prompt}],
-                    max_tokens=500
-                )
-                return response.choices[0].message.content.strip()
-        except Exception as e:
-            print(f"⚠️ AI翻译失败: {e}")
+        return self._ai_complete(prompt)
+    
+    def _ai_complete(self, prompt: str, max_tokens: int = 500) -> str:
+        """发送提示词，返回模型输出"""
+        if self.ai_provider == "gemini" and self.ai_model:
+            response = self.ai_model.generate_content(prompt)
+            return response.text.strip()
+        elif self.ai_provider == "openai" and hasattr(self, 'ai_client'):
+            response = self.ai_client.chat.completions.create(
+                model=AI_MODELS["openai"],
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=max_tokens
+            )
+            return response.choices[0].message.content.strip()
+        raise RuntimeError(f"AI模型未初始化: {self.ai_provider}")
+    
+    def prefetch_effects(self, cards: List[dict]):
+        """
+        合并翻译一批卡牌的效果文本
+        每次请求打包多条效果（见 TRANSLATION_BATCH_ITEMS），缺失或格式错误的条目拆小重试，
+        仍失败的条目在 translate_card 中逐条翻译
+        """
+        texts = self._untranslated_effects(cards)
+        if not texts:
+            return
         
-        return text  # 翻译失败返回原文
+        print(f"  合并翻译 {len(texts)} 条效果文本...")
+        engine = self._effect_engine()
+        batcher = BatchTranslator(
+            lambda prompt: engine.call(self._ai_complete, prompt, 4000),
+            EFFECT_INSTRUCTIONS,
+            memory=self.memory,
+        )
+        self._prefetched.update(asyncio.run(batcher.translate_many(texts)))
+        print(f"  {batcher.summary()}, 成功 {sum(t in self._prefetched for t in texts)}/{len(texts)} 条")
+    
+    def _untranslated_effects(self, cards: List[dict]) -> List[str]:
+        """术语替换后仍有日文、且还没有译文的效果文本（去重，重印卡只出现一次）"""
+        texts = []
+        for card in cards:
+            for field in EFFECT_FIELDS:
+                if card.get(field):
+                    replaced = self._replace_terms(card[field])
+                    if self._contains_japanese(replaced) and replaced not in self._prefetched:
+                        texts.append(replaced)
+        return list(dict.fromkeys(texts))
+    
+    def _effect_engine(self) -> TranslationEngine:
+        """效果翻译共用的限流引擎（合并翻译和逐条重试共享配额）"""
+        if self._engine is None:
+            self._engine = TranslationEngine(rpm=TRANSLATION_RPM.get(self.ai_provider, 60),
+                                             concurrency=TRANSLATION_CONCURRENCY)
+        return self._engine
     
     def translate_card(self, card: dict) -> dict:
         """翻译单张卡牌"""
@@ -236,18 +307,44 @@ class CardTranslator:
         
         return translated
     
-    def translate_cards_file(self, input_path: str, output_path: str) -> List[dict]:
-        """翻译整个卡牌文件"""
-        print(f"正在翻译: {input_path}")
+    def translate_cards_file(self, input_path: str, output_path: str, verbose: bool = True,
+                             only: Optional[Set[str]] = None) -> List[dict]:
+        """
+        翻译整个卡牌文件
+        only 为需要重新翻译的卡号（变更集中的新增/勘误）时，其余卡牌沿用已有输出文件中的译文
+        """
+        if verbose:
+            print(f"正在翻译: {input_path}")
         
         with open(input_path, 'r', encoding='utf-8') as f:
             cards = json.load(f)
         
+        previous: Dict[str, List[dict]] = {}
+        if only is not None and Path(output_path).exists():
+            with open(output_path, 'r', encoding='utf-8') as f:
+                for translated in json.load(f):
+                    previous.setdefault(translated.get('card_no'), []).append(translated)
+        
+        def reusable(card):
+            return card.get('card_no') not in only and previous.get(card.get('card_no'))
+        
+        if self.use_ai:
+            self.prefetch_effects([card for card in cards if only is None or not reusable(card)])
+        
         translated_cards = []
         total = len(cards)
+        reused = 0
         
         for i, card in enumerate(cards, 1):
-            print(f"  翻译进度: {i}/{total} - {card.get('card_no', 'Unknown')}")
+            if only is not None and reusable(card):
+                # 卡牌内容未变：沿用旧译文，只更新卡包等非翻译字段
+                translated = previous[card['card_no']].pop(0)
+                translated.update({field: card[field] for field in IGNORED_FIELDS if field in card})
+                translated_cards.append(translated)
+                reused += 1
+                continue
+            if verbose:
+                print(f"  翻译进度: {i}/{total} - {card.get('card_no', 'Unknown')}")
             translated = self.translate_card(card)
             translated_cards.append(translated)
         
@@ -255,23 +352,103 @@ class CardTranslator:
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(translated_cards, f, ensure_ascii=False, indent=2)
         
-        print(f"✅ 翻译完成，已保存到: {output_path}")
+        if verbose:
+            if reused:
+                print(f"   沿用已有译文 {reused} 张")
+            print(f"✅ 翻译完成，已保存到: {output_path}")
+            print(f"   {self.memory.summary()}")
         return translated_cards
 
 
-    def translate_all_cards(self, input_dir: str, output_dir: str):
-        """翻译目录下所有卡牌文件"""
+    def translate_all_cards(self, input_dir: str, output_dir: str, workers: int = TRANSLATION_WORKERS,
+                            changes: Optional[Dict] = None):
+        """
+        翻译目录下所有卡牌文件
+        
+        1. 所有文件的效果文本去重后合并翻译（重印卡的效果文本相同，只翻译一次）
+        2. 各文件在进程池中并行处理（术语替换 + 查第 1 步的译文，不再调用AI）
+        
+        changes 为变更集（见 app/card_changes.py）时只处理变化的文件，文件中只重新翻译新增/勘误的卡牌，
+        已删除文件的译文一并删除
+        """
         input_path = Path(input_dir)
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
         # 查找所有卡牌JSON文件
-        card_files = list(input_path.glob("*_cards.json"))
+        card_files = sorted(input_path.glob("*_cards.json"))
+        only = None
+        if changes is not None:
+            print(f"变更集: {changes_summary(changes)}")
+            for name in changes.get("removed_files", []):
+                stale = output_path / f"{Path(name).stem}_cn.json"
+                if stale.exists():
+                    stale.unlink()
+                    print(f"  已删除: {stale.name}")
+            changed_files = set(changes.get("changed_files", []))
+            card_files = [card_file for card_file in card_files if card_file.name in changed_files]
+            only = changed_card_nos(changes)
         print(f"找到 {len(card_files)} 个卡牌文件")
+        jobs = [(str(card_file), str(output_path / f"{card_file.stem}_cn.json")) for card_file in card_files]
+        
+        if self.use_ai:
+            all_cards = []
+            for card_file, _ in jobs:
+                with open(card_file, 'r', encoding='utf-8') as f:
+                    all_cards.extend(json.load(f))
+            if only is not None:
+                all_cards = [card for card in all_cards if card.get('card_no') in only]
+            self.prefetch_effects(all_cards)
+            self._retry_missing_effects(all_cards)
         
-        for card_file in card_files:
-            output_file = output_path / f"{card_file.stem}_cn.json"
-            self.translate_cards_file(str(card_file), str(output_file))
+        if workers <= 1 or len(jobs) <= 1:
+            for card_file, output_file in jobs:
+                self.translate_cards_file(card_file, output_file, only=only)
+            return
+        
+        print(f"使用 {workers} 个进程处理 {len(jobs)} 个文件...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.name_mapping_path, self._prefetched)) as pool:
+            futures = {pool.submit(_translate_file_in_worker, card_file, output_file, only): card_file
+                       for card_file, output_file in jobs}
+            for i, future in enumerate(as_completed(futures), 1):
+                print(f"  [{i}/{len(jobs)}] {Path(futures[future]).name}: {future.result()} 张")
+        print(f"✅ 翻译完成，已保存到: {output_path}")
+    
+    def _retry_missing_effects(self, cards: List[dict]):
+        """
+        合并翻译仍失败的效果文本去重后单条请求，在限流下并发执行（进程池中不再调用AI）
+        仍失败的文本保留术语替换后的结果
+        """
+        texts = self._untranslated_effects(cards)
+        if not texts:
+            return
+        
+        print(f"  单条重试 {len(texts)} 条效果文本...")
+        engine = self._effect_engine()
+        
+        async def translate(text: str) -> str:
+            return await self.memory.translate_async(text, lambda t: engine.call(self._ai_request, t))
+        
+        results, failures = engine.run(enumerate(texts), translate, progress_every=20)
+        for key, translated in results.items():
+            self._prefetched[texts[int(key)]] = translated
+        if failures:
+            print(f"⚠️ {len(failures)} 条效果文本翻译失败，保留术语替换结果")
+
+
+# 进程池中的翻译器（每个进程初始化一次）
+_worker_translator: Optional[CardTranslator] = None
+
+
+def _init_worker(name_mapping_path: Optional[str], prefetched: Dict[str, str]):
+    global _worker_translator
+    _worker_translator = CardTranslator(name_mapping_path=name_mapping_path, use_ai=False)
+    _worker_translator._prefetched = prefetched
+
+
+def _translate_file_in_worker(input_path: str, output_path: str, only: Optional[Set[str]] = None) -> int:
+    return len(_worker_translator.translate_cards_file(input_path, output_path, verbose=False, only=only))
 
 
 def main():
@@ -1,114 +1,259 @@
 """
 数码宝贝图鉴官网名称爬取器 v3
 从 http://digimons.net 爬取官方中日文名称对照
+
+- 详情页并发抓取（httpx.AsyncClient），同时进行的请求数有上限，并按站点用令牌桶限速
+- 每完成一个数码宝贝就写入状态文件（追加式日志），中断后重新运行只抓取未完成的部分
+- 结果合并进已有的名称映射文件（不会丢失文件中已有的条目）
+
+用法:
+  python digimon_name_scraper_v3.py                  # 只抓取状态文件中没有的（新增的数码宝贝）
+  python digimon_name_scraper_v3.py --full           # 忽略状态文件，全部重新抓取
+  python digimon_name_scraper_v3.py --concurrency 8 --rate 5
 """
 
-import requests
-from bs4 import BeautifulSoup
+import asyncio
 import json
-import time
+import os
 import re
+import sys
+import time
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+from bs4 import BeautifulSoup
+
+# 共用的追加式日志（仓库根目录的 scraper_common）
+sys.path.append(str(Path(__file__).parent.parent))
+from scraper_common.json_journal import JsonJournal
+
+DEFAULT_OUTPUT_FILE = Path(__file__).parent / "digimon_name_mapping_v3.json"
+DEFAULT_STATE_FILE = Path(__file__).parent / "digimon_name_scraper_state.json"
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """令牌桶：平均每秒 rate 个请求，最多 burst 个连续请求"""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+def parse_digimon_list(soup: BeautifulSoup) -> List[Tuple[str, str]]:
+    """中文检索页 → [(数码宝贝ID, 中文名)]"""
+    digimon_list = []
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        chn_name = link.get_text(strip=True)
+
+        # 匹配 xxx/index.html 格式的链接
+        match = re.match(r'^([a-z0-9_]+)/index\.html$', href, re.I)
+        if match and chn_name:
+            digimon_id = match.group(1)
+            digimon_list.append((digimon_id, chn_name))
+    return digimon_list
+
+
+def parse_japanese_name(soup: BeautifulSoup) -> Optional[str]:
+    """详情页 → 日文名"""
+    # 从 digimon_name class 元素中提取日文名
+    name_elem = soup.find(class_='digimon_name')
+    if name_elem:
+        text = name_elem.get_text()
+        # 查找 "日本語" 后面的日文名
+        match = re.search(r'日本語\s*([ァ-ヶー・a-zA-Z0-9\s]+?)(?:English|简体中文|$)', text)
+        if match:
+            jpn_name = match.group(1).strip()
+            # 清理名称
+            jpn_name = re.sub(r'\s+', '', jpn_name)
+            return jpn_name
+
+    return None
 
 
 class DigimonNameScraperV3:
-    def __init__(self):
+    def __init__(self, concurrency: int = 8, rate: float = 5.0, burst: int = 5, retries: int = 3,
+                 state_file: str = str(DEFAULT_STATE_FILE)):
+        """
+        concurrency: 同时进行的请求数
+        rate / burst: 每个站点平均每秒请求数 / 允许的突发请求数
+        state_file: 已完成的数码宝贝（断点续爬），每条 {id, chn_name, jpn_name}
+        """
         self.base_url = "http://digimons.net/digimon"
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         }
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.burst = burst
+        self.retries = retries
         self.name_mapping = {}  # 日文名 -> 中文名
-        self.session = requests.Session()
-        
-    def _get_page(self, url: str) -> BeautifulSoup:
-        """获取页面"""
-        try:
-            response = self.session.get(url, headers=self.headers, timeout=30)
-            response.encoding = 'utf-8'
-            return BeautifulSoup(response.text, 'html.parser')
-        except Exception as e:
-            print(f"获取页面失败 {url}: {e}")
-            return None
-
-    def get_digimon_list(self) -> list:
+        self.journal = JsonJournal(state_file, key_field='id', compact_every=100)
+        self.completed: Dict[str, dict] = {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.stats = {"requests": 0, "retries": 0, "failed": 0}
+
+    async def _get_page(self, client: httpx.AsyncClient, url: str) -> Optional[BeautifulSoup]:
+        """获取页面（429/5xx 和网络错误按指数退避重试），失败返回 None"""
+        host = urlsplit(url).netloc
+        bucket = self._buckets.setdefault(host, TokenBucket(self.rate, self.burst))
+        error = ""
+        for attempt in range(self.retries + 1):
+            await bucket.acquire()
+            self.stats["requests"] += 1
+            try:
+                response = await client.get(url)
+                if response.status_code not in RETRY_STATUS:
+                    response.raise_for_status()
+                    return BeautifulSoup(response.content.decode('utf-8', errors='replace'), 'html.parser')
+                error = f"HTTP {response.status_code}"
+            except httpx.HTTPStatusError as e:
+                error = f"HTTP {e.response.status_code}"
+                break
+            except httpx.HTTPError as e:
+                error = f"{type(e).__name__}: {e}"
+            if attempt < self.retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(2 ** attempt)
+        print(f"获取页面失败 {url}: {error}")
+        self.stats["failed"] += 1
+        return None
+
+    async def get_digimon_list(self, client: httpx.AsyncClient) -> list:
         """从中文检索页获取所有数码宝贝列表"""
         print("正在获取数码宝贝列表...")
-        
-        soup = self._get_page(f"{self.base_url}/chn.html")
+
+        soup = await self._get_page(client, f"{self.base_url}/chn.html")
         if not soup:
             return []
-        
-        digimon_list = []
-        for link in soup.find_all('a', href=True):
-            href = link['href']
-            chn_name = link.get_text(strip=True)
-            
-            # 匹配 xxx/index.html 格式的链接
-            match = re.match(r'^([a-z0-9_]+)/index\.html$', href, re.I)
-            if match and chn_name:
-                digimon_id = match.group(1)
-                digimon_list.append((digimon_id, chn_name))
-        
+
+        digimon_list = parse_digimon_list(soup)
         print(f"找到 {len(digimon_list)} 个数码宝贝")
         return digimon_list
 
-    def get_japanese_name(self, digimon_id: str) -> str:
-        """获取数码宝贝的日文名"""
-        soup = self._get_page(f"{self.base_url}/{digimon_id}/index.html")
+    async def get_japanese_name(self, client: httpx.AsyncClient, digimon_id: str) -> Tuple[bool, Optional[str]]:
+        """获取数码宝贝的日文名，返回 (页面是否获取成功, 日文名)"""
+        soup = await self._get_page(client, f"{self.base_url}/{digimon_id}/index.html")
         if not soup:
-            return None
-        
-        # 从 digimon_name class 元素中提取日文名
-        name_elem = soup.find(class_='digimon_name')
-        if name_elem:
-            text = name_elem.get_text()
-            # 查找 "日本語" 后面的日文名
-            match = re.search(r'日本語\s*([ァ-ヶー・a-zA-Z0-9\s]+?)(?:English|简体中文|$)', text)
-            if match:
-                jpn_name = match.group(1).strip()
-                # 清理名称
-                jpn_name = re.sub(r'\s+', '', jpn_name)
-                return jpn_name
-        
-        return None
+            return False, None
+        return True, parse_japanese_name(soup)
+
+    def load_state(self, full: bool = False):
+        """读取断点状态；full 时清空重新开始"""
+        if full:
+            self.journal.compact([])
+            self.completed = {}
+            return
+        # 旧版状态文件中没有日文名的记录不算完成，本次重试
+        self.completed = {key: record for key, record in self.journal.load().items() if record.get('jpn_name')}
+        if self.completed:
+            print(f"已完成 {len(self.completed)} 个（状态文件: {self.journal.data_file}）")
+        for record in self.completed.values():
+            self.name_mapping[record['jpn_name']] = record['chn_name']
 
-    def scrape_all(self, delay: float = 0.2) -> dict:
-        """爬取所有数码宝贝名称"""
-        digimon_list = self.get_digimon_list()
-        
-        total = len(digimon_list)
-        success = 0
-        
-        for i, (digimon_id, chn_name) in enumerate(digimon_list, 1):
-            jpn_name = self.get_japanese_name(digimon_id)
-            
-            if jpn_name:
+    async def scrape_all_async(self, full: bool = False) -> dict:
+        """并发爬取所有（未完成的）数码宝贝名称"""
+        self.load_state(full)
+
+        limits = httpx.Limits(max_connections=self.concurrency)
+        async with httpx.AsyncClient(headers=self.headers, timeout=30, follow_redirects=True,
+                                     limits=limits) as client:
+            digimon_list = await self.get_digimon_list(client)
+            pending = [(digimon_id, chn_name) for digimon_id, chn_name in dict(digimon_list).items()
+                       if digimon_id not in self.completed]
+            total = len(pending)
+            print(f"待抓取 {total} 个（跳过已完成 {len(dict(digimon_list)) - total} 个）")
+
+            semaphore = asyncio.Semaphore(self.concurrency)
+            done = 0
+            success = 0
+
+            async def scrape_one(digimon_id: str, chn_name: str):
+                nonlocal done, success
+                async with semaphore:
+                    fetched, jpn_name = await self.get_japanese_name(client, digimon_id)
+                done += 1
+                if not fetched or not jpn_name:
+                    # 未记入状态文件，下次运行重试
+                    if fetched:
+                        print(f"[{done}/{total}] {digimon_id} ({chn_name}) -> 未找到日文名")
+                    return
+                record = {'id': digimon_id, 'chn_name': chn_name, 'jpn_name': jpn_name}
+                self.completed[digimon_id] = record
+                self.journal.put(digimon_id, record)
+                if self.journal.pending >= self.journal.compact_every:
+                    self.journal.compact(list(self.completed.values()))
                 self.name_mapping[jpn_name] = chn_name
-                print(f"[{i}/{total}] {jpn_name} -> {chn_name}")
                 success += 1
-            else:
-                print(f"[{i}/{total}] {digimon_id} ({chn_name}) -> 未找到日文名")
-            
-            time.sleep(delay)
-        
-        print(f"\n完成！成功获取 {success}/{total} 个名称映射")
+                print(f"[{done}/{total}] {jpn_name} -> {chn_name}")
+
+            start = time.monotonic()
+            try:
+                await asyncio.gather(*(scrape_one(digimon_id, chn_name) for digimon_id, chn_name in pending))
+            finally:
+                self.journal.compact(list(self.completed.values()))
+
+        print(f"\n完成！成功获取 {success}/{total} 个名称映射, 用时 {time.monotonic() - start:.1f}s")
+        print(f"HTTP 请求 {self.stats['requests']} 次, 重试 {self.stats['retries']} 次, "
+              f"失败 {self.stats['failed']} 个页面（下次运行重试）")
         return self.name_mapping
 
+    def scrape_all(self, full: bool = False) -> dict:
+        """爬取所有数码宝贝名称（同步入口）"""
+        return asyncio.run(self.scrape_all_async(full))
+
     def save_mapping(self, output_path: str):
-        """保存名称映射到JSON文件"""
-        sorted_mapping = dict(sorted(self.name_mapping.items()))
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
+        """把名称映射合并进已有的JSON文件（原子替换）"""
+        merged = {}
+        if os.path.exists(output_path):
+            with open(output_path, 'r', encoding='utf-8') as f:
+                merged = json.load(f)
+        added = sum(1 for name in self.name_mapping if name not in merged)
+        merged.update(self.name_mapping)
+        sorted_mapping = dict(sorted(merged.items()))
+
+        tmp_path = f"{output_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
             json.dump(sorted_mapping, f, ensure_ascii=False, indent=2)
-        print(f"名称映射已保存到: {output_path}")
+        os.replace(tmp_path, output_path)
+        print(f"名称映射已保存到: {output_path}（共 {len(sorted_mapping)} 个，新增 {added} 个）")
 
 
 def main():
-    scraper = DigimonNameScraperV3()
-    scraper.scrape_all(delay=0.2)
-    
-    output_dir = Path(__file__).parent
-    scraper.save_mapping(str(output_dir / "digimon_name_mapping_v3.json"))
+    import argparse
+    parser = argparse.ArgumentParser(description="数码宝贝图鉴官网名称爬取器 v3")
+    parser.add_argument("--full", action="store_true", help="忽略断点状态，全部重新抓取")
+    parser.add_argument("--concurrency", type=int, default=8, help="同时进行的请求数")
+    parser.add_argument("--rate", type=float, default=5.0, help="每秒最多请求数（令牌桶）")
+    parser.add_argument("--burst", type=int, default=5, help="允许的突发请求数")
+    parser.add_argument("--output", type=str, default=str(DEFAULT_OUTPUT_FILE), help="名称映射文件")
+    parser.add_argument("--state", type=str, default=str(DEFAULT_STATE_FILE), help="断点状态文件")
+    args = parser.parse_args()
+
+    scraper = DigimonNameScraperV3(concurrency=args.concurrency, rate=args.rate, burst=args.burst,
+                                   state_file=args.state)
+    try:
+        scraper.scrape_all(full=args.full)
+    finally:
+        # 中断时也把已抓取的部分合并进映射文件
+        scraper.save_mapping(args.output)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,14 @@
 """
 DTCG 卡牌翻译主程序
 运行此脚本翻译所有卡牌数据
+
+用法:
+  python translate_cards.py                                  # 翻译全部卡牌
+  python translate_cards.py --changes ../data/card_changes.json  # 只翻译变更集中变化的卡牌
 """
 
+import argparse
+import json
 import sys
 import os
 from pathlib import Path
@@ -15,6 +21,10 @@ from card_translator import CardTranslator
 
 def main():
     """主函数"""
+    parser = argparse.ArgumentParser(description="DTCG 卡牌数据翻译工具")
+    parser.add_argument("--changes", type=str, help="变更集文件（card_game_judge/diff_card_data.py 生成）")
+    args = parser.parse_args()
+    
     print("=" * 60)
     print("DTCG 卡牌数据翻译工具")
     print("=" * 60)
@@ -37,6 +47,12 @@ def main():
     # 创建输出目录
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    changes = None
+    if args.changes:
+        with open(args.changes, 'r', encoding='utf-8') as f:
+            changes = json.load(f)
+        print(f"变更集: {args.changes}")
+    
     # 询问是否使用AI翻译
     use_ai = True
     ai_provider = "gemini"
@@ -74,7 +90,7 @@ def main():
     
     # 翻译所有卡牌
     print("\n开始翻译...")
-    translator.translate_all_cards(str(input_dir), str(output_dir))
+    translator.translate_all_cards(str(input_dir), str(output_dir), changes=changes)
     
     print("\n" + "=" * 60)
     print("✅ 翻译完成！")
@@ -0,0 +1,9 @@
+"""
+各爬虫共用的工具
+
+- browser_driver: Selenium 浏览器驱动（屏蔽资源、eager 加载、显式等待）
+- browser_pool: 浏览器工作池（多个浏览器并行处理分片，失败重试）
+- json_journal: JSON 数据文件 + 追加式日志（增量保存）
+- incremental: 条目内容哈希、变化统计（增量爬取）
+- http_fetcher / page_cache: 并发 HTTP 抓取，ETag / Last-Modified 条件请求与页面缓存
+"""
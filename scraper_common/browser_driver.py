@@ -0,0 +1,162 @@
+"""
+Selenium 浏览器驱动（各爬虫共用）
+
+- 通过 Chrome DevTools（Network.setBlockedURLs）屏蔽图片、字体、音视频等爬虫用不到的资源；
+  CSS 可选屏蔽：只读 textContent/属性的爬虫可以开启，依赖 innerText 换行或需要点击的爬虫保留 CSS
+- pageLoadStrategy=eager：DOMContentLoaded 后即返回，不等待其余资源
+- PageWaits：等待爬虫实际读取的选择器/条件，代替固定 sleep，并记录每类页面的等待耗时
+"""
+import re
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional
+
+from selenium import webdriver
+from selenium.common.exceptions import (
+    NoSuchElementException, StaleElementReferenceException, TimeoutException, WebDriverException
+)
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+try:
+    from webdriver_manager.chrome import ChromeDriverManager
+    USE_WEBDRIVER_MANAGER = True
+except ImportError:
+    USE_WEBDRIVER_MANAGER = False
+
+BLOCKED_RESOURCE_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3",
+]
+STYLESHEET_PATTERNS = ["*.css"]
+
+
+def build_chrome_options(headless: bool = True, arguments: Iterable[str] = ()) -> Options:
+    """各爬虫共同的启动参数，arguments 为各自额外的参数"""
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--window-size=1920,1080")
+    for argument in arguments:
+        options.add_argument(argument)
+    options.page_load_strategy = "eager"
+    return options
+
+
+def block_resource_types(driver, stylesheets: bool = False):
+    """屏蔽重资源请求（需要在打开页面前调用）"""
+    patterns = BLOCKED_RESOURCE_PATTERNS + (STYLESHEET_PATTERNS if stylesheets else [])
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except WebDriverException as e:
+        print(f"⚠️ 无法屏蔽资源请求（继续正常加载）: {str(e)[:100]}")
+    return driver
+
+
+def create_chrome_driver(options: Options, driver_path: Optional[str] = None,
+                         block_resources: bool = True, block_stylesheets: bool = False):
+    """
+    启动 Chrome：指定的 ChromeDriver 路径 → webdriver-manager → 系统 ChromeDriver
+    """
+    service = None
+    if driver_path:
+        service = Service(executable_path=driver_path)
+    elif USE_WEBDRIVER_MANAGER:
+        try:
+            service = Service(ChromeDriverManager().install())
+        except Exception:
+            pass
+
+    driver = webdriver.Chrome(service=service, options=options) if service else webdriver.Chrome(options=options)
+    if block_resources:
+        block_resource_types(driver, stylesheets=block_stylesheets)
+    return driver
+
+
+class PageWaits:
+    """
+    显式等待 + 等待耗时记录
+
+    用法:
+        waits = PageWaits(timeout=20)
+        driver.get(url)
+        waits.present(driver, "dl.qa_box", "QA结果")
+        ...
+        print(waits.summary())
+
+    等待超时不抛异常（返回 None），调用方按原逻辑继续解析页面，与原来固定 sleep 后照常解析一致。
+    """
+
+    def __init__(self, timeout: float = 20, poll: float = 0.2):
+        self.timeout = timeout
+        self.poll = poll
+        self.records: Dict[str, List[float]] = defaultdict(list)
+        self.timeouts: Dict[str, int] = defaultdict(int)
+
+    def until(self, driver, condition: Callable, label: str, timeout: Optional[float] = None):
+        start = time.monotonic()
+        try:
+            return WebDriverWait(driver, timeout or self.timeout, poll_frequency=self.poll).until(condition)
+        except TimeoutException:
+            self.timeouts[label] += 1
+            print(f"  ⚠️ 等待超时: {label}")
+            return None
+        finally:
+            self.records[label].append(time.monotonic() - start)
+
+    def present(self, driver, selector: str, label: str, timeout: Optional[float] = None):
+        """CSS 选择器匹配的第一个元素"""
+        return self.until(driver, EC.presence_of_element_located((By.CSS_SELECTOR, selector)), label, timeout)
+
+    def stale(self, driver, element, label: str, timeout: Optional[float] = None) -> bool:
+        """元素从 DOM 移除（整页跳转）"""
+        return bool(self.until(driver, EC.staleness_of(element), label, timeout))
+
+    def dom_ready(self, driver, label: str, timeout: Optional[float] = None) -> bool:
+        return bool(self.until(
+            driver, lambda d: d.execute_script("return document.readyState") != "loading", label, timeout
+        ))
+
+    def text_matches(self, driver, pattern: str, label: str, selector: str = "body",
+                     timeout: Optional[float] = None):
+        """元素文本中出现 pattern（SPA 渲染完成的标志）"""
+        compiled = re.compile(pattern)
+
+        def condition(d):
+            try:
+                return compiled.search(d.find_element(By.CSS_SELECTOR, selector).text)
+            except (NoSuchElementException, StaleElementReferenceException):
+                return None
+
+        return self.until(driver, condition, label, timeout)
+
+    def value_changes(self, driver, read: Callable, old_value, label: str, timeout: Optional[float] = None):
+        """read(driver) 的结果不再等于 old_value（翻页后列表内容更新）"""
+        def condition(d):
+            try:
+                value = read(d)
+            except (NoSuchElementException, StaleElementReferenceException):
+                return None
+            return value if value is not None and value != old_value else None
+
+        return self.until(driver, condition, label, timeout)
+
+    def summary(self) -> str:
+        if not self.records:
+            return "页面等待: 无"
+        total = sum(sum(v) for v in self.records.values())
+        lines = [f"页面等待: 共 {sum(len(v) for v in self.records.values())} 次, {total:.1f}s"]
+        for label, durations in self.records.items():
+            timeouts = f", 超时 {self.timeouts[label]} 次" if self.timeouts.get(label) else ""
+            lines.append(
+                f"  {label}: {len(durations)} 次, 平均 {sum(durations) / len(durations):.2f}s, "
+                f"最长 {max(durations):.2f}s{timeouts}"
+            )
+        return "\n".join(lines)
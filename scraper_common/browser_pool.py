@@ -0,0 +1,118 @@
+"""
+浏览器工作池
+
+N 个工作线程各自持有一个浏览器（Selenium 是阻塞调用，用线程即可），从任务队列领取分片（卡包、収録弾等）：
+- 同一站点同时处理的分片数不超过 per_host
+- 分片失败时关闭该线程的浏览器（可能已崩溃）并在下一个分片前重新创建，失败分片重新入队，最多重试 retries 次
+- on_result 在锁内依次调用，用于写文件等不能并发执行的收尾
+- 结果按分片原顺序返回
+
+浏览器的创建和关闭由调用方传入。
+"""
+import queue
+import threading
+import time
+from contextlib import nullcontext
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class BrowserWorkerPool:
+    """
+    用法:
+        pool = BrowserWorkerPool(create_worker, lambda w: w.quit(), workers=4, per_host=2)
+        results, failed = pool.run(packs, scrape_pack, host_of=lambda p: "digimoncard.com")
+    """
+
+    def __init__(self, create_worker: Callable, close_worker: Callable, workers: int = 4,
+                 per_host: Optional[int] = None, retries: int = 2):
+        self.create_worker = create_worker
+        self.close_worker = close_worker
+        self.workers = max(1, workers)
+        self.per_host = per_host
+        self.retries = retries
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self.stats = {"done": 0, "retries": 0, "failed": 0}
+
+    def _host_slot(self, host: str):
+        if not self.per_host or not host:
+            return nullcontext()
+        with self._lock:
+            if host not in self._host_slots:
+                self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+            return self._host_slots[host]
+
+    def _close(self, worker):
+        if worker is None:
+            return
+        try:
+            self.close_worker(worker)
+        except Exception as e:
+            print(f"  ⚠️ 关闭浏览器失败: {e}")
+
+    def run(self, shards: List, handle: Callable, host_of: Optional[Callable] = None,
+            on_result: Optional[Callable] = None, label: Callable = str) -> Tuple[List, List]:
+        """
+        handle(worker, shard) → 结果；抛出异常视为失败
+        Returns:
+            (按分片顺序的结果列表（失败的分片为 None）, 重试后仍失败的分片)
+        """
+        tasks = queue.Queue()
+        for index, shard in enumerate(shards):
+            tasks.put((index, shard, 0))
+        results: List = [None] * len(shards)
+        failed: List = []
+        total = len(shards)
+        start = time.monotonic()
+
+        def work():
+            worker = None
+            try:
+                while True:
+                    item = tasks.get()
+                    if item is None:
+                        tasks.task_done()
+                        return
+                    index, shard, attempt = item
+                    try:
+                        if worker is None:
+                            worker = self.create_worker()
+                        with self._host_slot(host_of(shard) if host_of else ""):
+                            result = handle(worker, shard)
+                        with self._lock:
+                            if on_result:
+                                on_result(shard, result)
+                            results[index] = result
+                            self.stats["done"] += 1
+                            print(f"  ✓ [{self.stats['done']}/{total}] {label(shard)}")
+                    except Exception as e:
+                        print(f"  ❌ {label(shard)} 失败（第 {attempt + 1} 次）: {str(e)[:100]}")
+                        self._close(worker)
+                        worker = None
+                        with self._lock:
+                            if attempt < self.retries:
+                                self.stats["retries"] += 1
+                                tasks.put((index, shard, attempt + 1))
+                            else:
+                                self.stats["failed"] += 1
+                                failed.append(shard)
+                    finally:
+                        tasks.task_done()
+            finally:
+                self._close(worker)
+
+        threads = [threading.Thread(target=work, daemon=True) for _ in range(min(self.workers, total))]
+        for thread in threads:
+            thread.start()
+        tasks.join()
+        for _ in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+        print(f"✓ {self.summary()}, 用时 {time.monotonic() - start:.1f}s")
+        return results, failed
+
+    def summary(self) -> str:
+        return (f"工作池: {self.workers} 个浏览器, 完成 {self.stats['done']}, "
+                f"重试 {self.stats['retries']} 次, 失败 {self.stats['failed']}")
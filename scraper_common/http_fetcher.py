@@ -0,0 +1,123 @@
+"""
+并发 HTTP 页面抓取
+
+卡牌列表页和详情页都是服务端渲染的静态 HTML，不需要浏览器：
+- httpx.AsyncClient 复用连接，信号量限制同时进行的请求数
+- 同一站点的相邻两次请求之间至少间隔 delay 秒（礼貌性延迟）
+- 429/5xx 和网络错误按指数退避重试
+- 传入 PageCache 时发送条件请求，304 直接使用缓存（见 page_cache.py）
+"""
+import asyncio
+import time
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from scraper_common.page_cache import PageCache
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    "Accept-Language": "ja,en;q=0.8",
+}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class AsyncPageFetcher:
+    """
+    用法:
+        async with AsyncPageFetcher(concurrency=8, delay=0.5) as fetcher:
+            pages = await fetcher.fetch_many(urls)   # {url: html 或 None}
+    """
+
+    def __init__(self, concurrency: int = 8, delay: float = 0.5, retries: int = 3, timeout: float = 30.0,
+                 cache: Optional[PageCache] = None):
+        self.concurrency = max(1, concurrency)
+        self.delay = delay
+        self.retries = retries
+        self.timeout = timeout
+        self.cache = cache
+        self.client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._host_locks: Dict[str, asyncio.Lock] = {}
+        self._host_last: Dict[str, float] = {}
+        self.stats = {"requests": 0, "retries": 0, "failed": 0, "not_modified": 0}
+
+    async def __aenter__(self):
+        self.client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            timeout=self.timeout,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=self.concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.client.aclose()
+        self.client = None
+
+    async def _wait_turn(self, host: str):
+        """同一站点的请求按 delay 间隔依次发出"""
+        lock = self._host_locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            wait = self._host_last.get(host, 0.0) + self.delay - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._host_last[host] = time.monotonic()
+
+    async def fetch(self, url: str) -> Optional[str]:
+        """返回页面 HTML，重试后仍失败返回 None"""
+        host = urlsplit(url).netloc
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                await self._wait_turn(host)
+                self.stats["requests"] += 1
+                try:
+                    headers = self.cache.validators(url) if self.cache else {}
+                    response = await self.client.get(url, headers=headers)
+                    if response.status_code == 304 and headers:
+                        self.stats["not_modified"] += 1
+                        return self.cache.get(url)
+                    if response.status_code not in RETRY_STATUS:
+                        response.raise_for_status()
+                        if self.cache:
+                            self.cache.store(url, response.text, response.headers.get("ETag"),
+                                             response.headers.get("Last-Modified"))
+                        return response.text
+                    error = f"HTTP {response.status_code}"
+                except httpx.HTTPStatusError as e:
+                    print(f"  ❌ {url}: HTTP {e.response.status_code}")
+                    break
+                except httpx.HTTPError as e:
+                    error = f"{type(e).__name__}: {e}"
+
+                if attempt < self.retries:
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(2 ** attempt)
+                else:
+                    print(f"  ❌ {url}: {error}")
+        self.stats["failed"] += 1
+        return None
+
+    async def fetch_many(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        unique = list(dict.fromkeys(urls))
+        pages = await asyncio.gather(*(self.fetch(url) for url in unique))
+        return dict(zip(unique, pages))
+
+    def summary(self) -> str:
+        summary = f"HTTP 请求 {self.stats['requests']} 次, 重试 {self.stats['retries']} 次, 失败 {self.stats['failed']} 个页面"
+        if self.cache:
+            summary += f", 未修改(304) {self.stats['not_modified']} 个"
+        return summary
+
+
+def fetch_pages(urls: Iterable[str], concurrency: int = 8, delay: float = 0.5,
+                cache: Optional[PageCache] = None) -> Dict[str, Optional[str]]:
+    """同步入口：并发抓取一组页面（cache 的 unchanged 记录内容未变化的 URL）"""
+    async def run():
+        async with AsyncPageFetcher(concurrency=concurrency, delay=delay, cache=cache) as fetcher:
+            pages = await fetcher.fetch_many(urls)
+            print(f"  {fetcher.summary()}")
+            return pages
+    return asyncio.run(run())
@@ -0,0 +1,105 @@
+"""
+增量爬取（各爬虫共用）
+
+- content_hash：条目内容哈希（忽略爬取时间等每次都会变的字段），用来判断条目是新增、变化还是未变
+- ChangeTracker：统计新增/变化/未变条数；连续若干页没有新增或变化时提示可以停止翻页
+- HashIndex：持久化的 {key: 内容哈希}，用于条目本身不落盘、只需要知道"上次见过的内容"的场景
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+# 每次爬取都会变化、不代表内容变化的字段
+VOLATILE_FIELDS = ("scraped_at", "updated_at", "index")
+
+NEW = "new"
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+
+
+def content_hash(record: dict, ignore: Iterable[str] = VOLATILE_FIELDS) -> str:
+    """条目内容的 sha256（键排序，忽略 ignore 中的字段）"""
+    ignore = set(ignore)
+    data = {key: value for key, value in record.items() if key not in ignore}
+    text = json.dumps(data, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class ChangeTracker:
+    """
+    用法:
+        tracker = ChangeTracker(stop_after_known_pages=2)
+        for qa in page_items:
+            status = tracker.check(existing.get(qa['id']), qa)   # new / changed / unchanged
+        if tracker.end_page():
+            break                                               # 连续 2 页全是已知条目
+        print(tracker.summary())
+    """
+
+    def __init__(self, stop_after_known_pages: Optional[int] = None, ignore: Iterable[str] = VOLATILE_FIELDS):
+        """stop_after_known_pages 为空时不提前终止（完整刷新）；ignore 为比较内容时忽略的字段"""
+        self.stop_after_known_pages = stop_after_known_pages
+        self.ignore = tuple(ignore)
+        self.counts = {NEW: 0, CHANGED: 0, UNCHANGED: 0}
+        self.known_streak = 0
+        self._page_changes = 0
+
+    def record(self, status: str) -> str:
+        self.counts[status] += 1
+        if status != UNCHANGED:
+            self._page_changes += 1
+        return status
+
+    def check(self, old: Optional[dict], new: dict) -> str:
+        if old is None:
+            return self.record(NEW)
+        same = content_hash(old, self.ignore) == content_hash(new, self.ignore)
+        return self.record(UNCHANGED if same else CHANGED)
+
+    def end_page(self) -> bool:
+        """一页处理完毕；连续 stop_after_known_pages 页没有新增/变化时返回 True"""
+        self.known_streak = 0 if self._page_changes else self.known_streak + 1
+        self._page_changes = 0
+        return bool(self.stop_after_known_pages) and self.known_streak >= self.stop_after_known_pages
+
+    def summary(self) -> str:
+        return (f"新增 {self.counts[NEW]} 条, 变化 {self.counts[CHANGED]} 条, "
+                f"未变 {self.counts[UNCHANGED]} 条")
+
+
+class HashIndex:
+    """
+    {key: 内容哈希} 索引文件
+
+    status() 只比较不修改；条目确认处理完成（如已保存）后再 update()，
+    中途失败的条目下次仍会被判为新增/变化。
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.hashes: Dict[str, str] = {}
+        if self.path.exists():
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self.hashes = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ 哈希索引读取失败，按全部新增处理: {e}")
+
+    def status(self, key: str, record: dict) -> str:
+        old = self.hashes.get(key)
+        if old is None:
+            return NEW
+        return UNCHANGED if old == content_hash(record) else CHANGED
+
+    def update(self, key: str, record: dict):
+        self.hashes[key] = content_hash(record)
+
+    def save(self):
+        """原子写入"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.hashes, f, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp_file, self.path)
@@ -0,0 +1,108 @@
+"""
+JSON 数据文件 + 追加式日志（各爬虫增量保存共用）
+
+<数据文件>.json 仍是规范快照（其他模块直接读取）；爬取过程中每条新增/更新只追加一行到
+<数据文件>.journal.jsonl 并 fsync，不再每条都重写整个 JSON。日志累计 compact_every 条或
+爬取结束时合并回快照：先写临时文件并 fsync，再 os.replace 原子替换，最后清空日志。
+
+加载 = 读快照 + 按顺序重放日志。日志每行带记录的 key（卡号、QA 编号，无 key 的列表用位置），
+重放是幂等的：合并时在替换快照后、清空日志前崩溃，重放也不会产生重复记录；
+最后一行写到一半的记录直接丢弃。
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class JsonJournal:
+    """
+    用法:
+        journal = JsonJournal("digimon_cards_cn.json", key_field="card_no")
+        cards = journal.load()                 # {card_no: card}
+        journal.put(card_no, card)             # 追加一行日志
+        if journal.pending >= journal.compact_every:
+            journal.compact(list(cards.values()))
+    """
+
+    def __init__(self, data_file: str, key_field: Optional[str] = None, compact_every: int = 500):
+        """key_field 为空时按列表位置作为 key"""
+        self.data_file = Path(data_file)
+        self.journal_file = self.data_file.with_suffix(".journal.jsonl")
+        self.key_field = key_field
+        self.compact_every = compact_every
+        self.pending = 0
+        self._handle = None
+
+    def load(self) -> Dict[Any, dict]:
+        """快照 + 日志重放后的全部记录（保持插入顺序）"""
+        records: Dict[Any, dict] = {}
+        if self.data_file.exists():
+            with open(self.data_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+            if isinstance(snapshot, dict):
+                records.update(snapshot)
+            else:
+                for index, record in enumerate(snapshot):
+                    key = record.get(self.key_field) if self.key_field else index
+                    # 快照中没有 key 的记录原样保留（不会出现在日志里）
+                    records[key if key not in (None, "") else ("#", index)] = record
+
+        self.pending = 0
+        if self.journal_file.exists():
+            with open(self.journal_file, 'rb') as f:
+                content = f.read()
+            complete = content[:content.rfind(b"\n") + 1]
+            if len(complete) < len(content):
+                # 截掉写到一半的最后一行，后续追加才不会接在残行后面
+                print("⚠️ 日志最后一行不完整（上次写入中断），已丢弃")
+                with open(self.journal_file, 'r+b') as f:
+                    f.truncate(len(complete))
+            lines = complete.decode('utf-8').splitlines()
+            for number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"⚠️ 日志第 {number} 行不完整（上次写入中断），已忽略")
+                    continue
+                if entry["op"] == "clear":
+                    records.clear()
+                else:
+                    records[entry["key"]] = entry["data"]
+                self.pending += 1
+        return records
+
+    def _append(self, entry: dict):
+        if self._handle is None:
+            self._handle = open(self.journal_file, 'a', encoding='utf-8')
+        self._handle.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._handle.flush()
+        os.fsync(self._handle.fileno())
+        self.pending += 1
+
+    def put(self, key: Any, record: dict):
+        self._append({"op": "put", "key": key, "data": record})
+
+    def clear(self):
+        self._append({"op": "clear"})
+
+    def compact(self, records: List[dict]):
+        """把当前全部记录原子写入快照并清空日志"""
+        self.close()
+        tmp_file = self.data_file.with_name(self.data_file.name + ".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.data_file)
+        if self.journal_file.exists():
+            with open(self.journal_file, 'w', encoding='utf-8') as f:
+                os.fsync(f.fileno())
+        self.pending = 0
+
+    def close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
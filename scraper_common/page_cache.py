@@ -0,0 +1,86 @@
+"""
+HTTP 页面缓存
+
+按 URL 保存页面 HTML 及其 ETag / Last-Modified / 内容哈希：
+- 再次抓取时带上 If-None-Match / If-Modified-Since，服务器返回 304 时直接使用缓存
+- 返回 200 但内容哈希与上次相同（服务器不支持条件请求）同样视为未变化
+- unchanged 记录本次运行中内容未变化的 URL，爬虫据此跳过重新解析
+
+目录结构: <cache_dir>/index.json + <cache_dir>/pages/<url 的 sha1>.html
+"""
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set
+
+
+class PageCache:
+    """
+    用法:
+        cache = PageCache("output/.page_cache")
+        pages = fetch_pages(urls, cache=cache)
+        if pack_url in cache.unchanged: ...
+        cache.save()
+    """
+
+    def __init__(self, cache_dir: str):
+        self.cache_dir = Path(cache_dir)
+        self.pages_dir = self.cache_dir / "pages"
+        self.index_file = self.cache_dir / "index.json"
+        self.index: Dict[str, Dict] = {}
+        self.unchanged: Set[str] = set()
+        if self.index_file.exists():
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self.index = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠️ 页面缓存索引读取失败，重新抓取全部页面: {e}")
+
+    def _page_file(self, url: str) -> Path:
+        return self.pages_dir / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.html"
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """条件请求头（缓存文件存在时才发送，避免 304 后拿不到内容）"""
+        entry = self.index.get(url)
+        if not entry or not self._page_file(url).exists():
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def get(self, url: str) -> Optional[str]:
+        """服务器返回 304 时读取缓存内容"""
+        page_file = self._page_file(url)
+        if url not in self.index or not page_file.exists():
+            return None
+        self.unchanged.add(url)
+        return page_file.read_text(encoding='utf-8')
+
+    def store(self, url: str, html: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        """保存 200 响应；内容哈希与上次相同时记为未变化"""
+        digest = hashlib.sha256(html.encode('utf-8')).hexdigest()
+        entry = self.index.get(url)
+        if entry and entry.get("sha256") == digest and self._page_file(url).exists():
+            self.unchanged.add(url)
+        else:
+            self.pages_dir.mkdir(parents=True, exist_ok=True)
+            self._page_file(url).write_text(html, encoding='utf-8')
+        self.index[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "sha256": digest,
+            "fetched_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+    def save(self):
+        """原子写入索引"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.index_file.with_name(self.index_file.name + ".tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_file, self.index_file)
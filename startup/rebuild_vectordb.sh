@@ -10,3 +10,6 @@ if [ -f "../venv/bin/activate" ]; then
 fi
 
 python rebuild_vectordb.py
+
+# 重建关键词效果/效果时机倒排索引
+python build_effect_index.py